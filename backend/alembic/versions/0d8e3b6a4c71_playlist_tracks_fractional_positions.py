@@ -0,0 +1,74 @@
+"""playlist_tracks fractional positions
+
+Revision ID: 0d8e3b6a4c71
+Revises: c51e0a7d9f23
+Create Date: 2026-10-18 18:05:12.907331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.positions import generate_n_keys_between
+
+
+# revision identifiers, used by Alembic.
+revision = '0d8e3b6a4c71'
+down_revision = 'c51e0a7d9f23'
+branch_labels = None
+depends_on = None
+
+
+def _ordered_entries(conn):
+    """
+    ID записей каждого плейлиста в текущем порядке.
+    """
+    rows = conn.execute(sa.text(
+        "SELECT id, playlist_id FROM playlist_tracks "
+        "ORDER BY playlist_id, position, created_at, id"
+    )).all()
+    by_playlist = {}
+    for entry_id, playlist_id in rows:
+        by_playlist.setdefault(playlist_id, []).append(entry_id)
+    return by_playlist.values()
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    playlists = _ordered_entries(conn)
+
+    # Целые позиции заменяются дробными ключами (app/utils/positions.py);
+    # порядок ключей - побайтное сравнение (COLLATE "C")
+    op.execute('ALTER TABLE playlist_tracks ALTER COLUMN position TYPE varchar COLLATE "C" USING NULL')
+    for entry_ids in playlists:
+        keys = generate_n_keys_between(None, None, len(entry_ids))
+        conn.execute(
+            sa.text("UPDATE playlist_tracks SET position = :position WHERE id = :id"),
+            [{"id": entry_id, "position": key} for entry_id, key in zip(entry_ids, keys)],
+        )
+
+    op.execute("ALTER TABLE playlist_tracks ALTER COLUMN position SET NOT NULL")
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_playlist_tracks_playlist_id_position "
+        "ON playlist_tracks (playlist_id, position)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_playlists_user_id_created_at_id "
+        "ON playlists (user_id, created_at, id)"
+    )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    playlists = _ordered_entries(conn)
+
+    op.execute("DROP INDEX IF EXISTS ix_playlists_user_id_created_at_id")
+    op.execute("DROP INDEX IF EXISTS uq_playlist_tracks_playlist_id_position")
+    op.execute(
+        "ALTER TABLE playlist_tracks ALTER COLUMN position DROP NOT NULL, "
+        "ALTER COLUMN position TYPE integer USING NULL"
+    )
+    for entry_ids in playlists:
+        conn.execute(
+            sa.text("UPDATE playlist_tracks SET position = :position WHERE id = :id"),
+            [{"id": entry_id, "position": number} for number, entry_id in enumerate(entry_ids)],
+        )
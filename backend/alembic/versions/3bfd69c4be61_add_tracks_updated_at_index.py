@@ -0,0 +1,29 @@
+"""add tracks updated_at index
+
+Revision ID: 3bfd69c4be61
+Revises: 3f35d08c270b
+Create Date: 2026-10-18 13:41:27.305816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3bfd69c4be61'
+down_revision = '3f35d08c270b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tracks_updated_at_id "
+            "ON tracks (updated_at, id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tracks_updated_at_id")
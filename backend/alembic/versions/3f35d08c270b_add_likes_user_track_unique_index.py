@@ -0,0 +1,39 @@
+"""add likes user track unique index
+
+Revision ID: 3f35d08c270b
+Revises: 9b7c2be556e4
+Create Date: 2026-10-18 13:02:41.918354
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f35d08c270b'
+down_revision = '9b7c2be556e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Удаляем дубликаты, оставшиеся от гонки в create_like: оставляем самый ранний лайк
+    op.execute(
+        """
+        DELETE FROM likes a
+        USING likes b
+        WHERE a.user_id = b.user_id
+          AND a.track_id = b.track_id
+          AND (a.created_at, a.id) > (b.created_at, b.id)
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_likes_user_id_track_id "
+            "ON likes (user_id, track_id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_likes_user_id_track_id")
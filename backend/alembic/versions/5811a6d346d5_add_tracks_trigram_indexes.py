@@ -0,0 +1,36 @@
+"""add trigram indexes for track search
+
+Revision ID: 5811a6d346d5
+Revises: bd6b2f4f4062
+Create Date: 2026-10-18 11:04:27.905316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5811a6d346d5'
+down_revision = 'bd6b2f4f4062'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY не блокирует запись в tracks, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tracks_title_trgm "
+            "ON tracks USING gin (title gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tracks_artist_trgm "
+            "ON tracks USING gin (artist gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tracks_artist_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tracks_title_trgm")
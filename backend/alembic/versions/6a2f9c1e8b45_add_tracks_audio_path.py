@@ -0,0 +1,25 @@
+"""add tracks.audio_path
+
+Revision ID: 6a2f9c1e8b45
+Revises: 0d8e3b6a4c71
+Create Date: 2026-10-18 19:11:37.604218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2f9c1e8b45'
+down_revision = '0d8e3b6a4c71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Файл ищется по первичному ключу трека, отдельный индекс не нужен
+    op.execute("ALTER TABLE tracks ADD COLUMN IF NOT EXISTS audio_path varchar")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS audio_path")
@@ -0,0 +1,25 @@
+"""add catalog_version_seq
+
+Revision ID: 8e1d4b7f2a60
+Revises: f3c8a1d27b90
+Create Date: 2026-10-19 10:12:05.481337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1d4b7f2a60'
+down_revision = 'f3c8a1d27b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Общая для всех процессов версия кэша каталога (app/core/cache.py)
+    op.execute("CREATE SEQUENCE IF NOT EXISTS catalog_version_seq")
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE IF EXISTS catalog_version_seq")
@@ -0,0 +1,35 @@
+"""add keyset pagination indexes
+
+Revision ID: 9b7c2be556e4
+Revises: 5811a6d346d5
+Create Date: 2026-10-18 12:31:06.442187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b7c2be556e4'
+down_revision = '5811a6d346d5'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_tracks_created_at_id", "tracks", "created_at, id"),
+    ("ix_users_created_at_id", "users", "created_at, id"),
+    ("ix_likes_user_id_created_at_id", "likes", "user_id, created_at, id"),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,44 @@
+"""add import files manifest
+
+Revision ID: a747e38557cd
+Revises: e44b8cc105c4
+Create Date: 2026-10-18 15:02:18.640277
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a747e38557cd'
+down_revision = 'e44b8cc105c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS import_files (
+            id UUID PRIMARY KEY,
+            content_hash VARCHAR(64) NOT NULL UNIQUE,
+            path VARCHAR,
+            size BIGINT,
+            status VARCHAR NOT NULL,
+            rows_done INTEGER NOT NULL,
+            row_count INTEGER,
+            inserted INTEGER NOT NULL,
+            updated INTEGER NOT NULL,
+            duplicates INTEGER NOT NULL,
+            invalid INTEGER NOT NULL,
+            error TEXT,
+            started_at TIMESTAMP WITHOUT TIME ZONE,
+            finished_at TIMESTAMP WITHOUT TIME ZONE,
+            updated_at TIMESTAMP WITHOUT TIME ZONE
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS import_files")
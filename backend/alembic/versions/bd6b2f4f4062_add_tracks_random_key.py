@@ -0,0 +1,32 @@
+"""add tracks.random_key
+
+Revision ID: bd6b2f4f4062
+Revises:
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bd6b2f4f4062'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS: таблицы могли быть созданы через Base.metadata.create_all
+    # уже с новым столбцом. Значение по умолчанию random() заполняет
+    # существующие строки при добавлении столбца.
+    op.execute(
+        "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS random_key "
+        "double precision NOT NULL DEFAULT random()"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_tracks_random_key ON tracks (random_key)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_tracks_random_key")
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS random_key")
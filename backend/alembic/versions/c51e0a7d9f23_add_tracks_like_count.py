@@ -0,0 +1,45 @@
+"""add tracks.like_count
+
+Revision ID: c51e0a7d9f23
+Revises: a747e38557cd
+Create Date: 2026-10-18 17:20:44.518390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c51e0a7d9f23'
+down_revision = 'a747e38557cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Столбец с константным значением по умолчанию добавляется без
+    # перезаписи таблицы; существующие лайки подсчитываются один раз
+    op.execute(
+        "ALTER TABLE tracks ADD COLUMN IF NOT EXISTS like_count integer NOT NULL DEFAULT 0"
+    )
+    op.execute(
+        """
+        UPDATE tracks SET like_count = counts.likes
+        FROM (
+            SELECT track_id, count(*) AS likes FROM likes
+            WHERE track_id IS NOT NULL GROUP BY track_id
+        ) AS counts
+        WHERE tracks.id = counts.track_id AND tracks.like_count <> counts.likes
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tracks_like_count_id "
+            "ON tracks (like_count, id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tracks_like_count_id")
+    op.execute("ALTER TABLE tracks DROP COLUMN IF EXISTS like_count")
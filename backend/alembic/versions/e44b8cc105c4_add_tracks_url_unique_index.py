@@ -0,0 +1,59 @@
+"""add tracks url unique index
+
+Revision ID: e44b8cc105c4
+Revises: 3bfd69c4be61
+Create Date: 2026-10-18 14:20:53.174092
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e44b8cc105c4'
+down_revision = '3bfd69c4be61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Сливаем треки с одинаковым url в самый ранний: лайки и записи
+    # плейлистов переносим на него, повторные лайки того же пользователя удаляем
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE track_duplicates ON COMMIT DROP AS
+        SELECT id, keeper FROM (
+            SELECT id, first_value(id) OVER (PARTITION BY url ORDER BY created_at, id) AS keeper
+            FROM tracks
+            WHERE url IS NOT NULL
+        ) t
+        WHERE id <> keeper
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM likes l
+        USING (
+            SELECT l.id, row_number() OVER (
+                PARTITION BY l.user_id, coalesce(d.keeper, l.track_id)
+                ORDER BY l.created_at, l.id
+            ) AS rn
+            FROM likes l
+            LEFT JOIN track_duplicates d ON d.id = l.track_id
+        ) ranked
+        WHERE l.id = ranked.id AND ranked.rn > 1
+        """
+    )
+    op.execute("UPDATE likes l SET track_id = d.keeper FROM track_duplicates d WHERE l.track_id = d.id")
+    op.execute(
+        "UPDATE playlist_tracks p SET track_id = d.keeper FROM track_duplicates d WHERE p.track_id = d.id"
+    )
+    op.execute("DELETE FROM tracks t USING track_duplicates d WHERE t.id = d.id")
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_tracks_url ON tracks (url)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_tracks_url")
@@ -0,0 +1,42 @@
+"""add audio_uploads
+
+Revision ID: f3c8a1d27b90
+Revises: 6a2f9c1e8b45
+Create Date: 2026-10-18 21:04:52.317840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d27b90'
+down_revision = '6a2f9c1e8b45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS audio_uploads (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            track_id UUID NOT NULL REFERENCES tracks (id) ON DELETE CASCADE,
+            filename VARCHAR NOT NULL,
+            size BIGINT NOT NULL,
+            received BIGINT NOT NULL,
+            sha256 VARCHAR(64),
+            status VARCHAR NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            updated_at TIMESTAMP WITHOUT TIME ZONE
+        )
+        """
+    )
+    # Таблица новая и пустая: индексы можно строить без CONCURRENTLY
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audio_uploads_user_id ON audio_uploads (user_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audio_uploads_track_id ON audio_uploads (track_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS audio_uploads")
@@ -1,10 +1,13 @@
 from fastapi import APIRouter
 
-from . import users, tracks, playlists, likes, auth
+from . import users, tracks, playlists, likes, auth, flow, media, uploads
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(tracks.router, prefix="/tracks", tags=["tracks"])
 api_router.include_router(playlists.router, prefix="/playlists", tags=["playlists"])
-api_router.include_router(likes.router, prefix="/likes", tags=["likes"]) 
\ No newline at end of file
+api_router.include_router(likes.router, prefix="/likes", tags=["likes"])
+api_router.include_router(flow.router, prefix="/flow", tags=["flow"])
+api_router.include_router(media.router, prefix="/media", tags=["media"])
+api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
@@ -1,60 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from datetime import timedelta
+import uuid
 
-from app.core.database import get_db
-from app.core.security import verify_password, create_access_token, create_refresh_token, get_password_hash
+from app.core.database import get_async_db
+from app.core.security import create_access_token, create_refresh_token
+from app.core.passwords import check_password, hash_password
+from app.core.throttle import client_ip, login_throttle
 from app.core.config import settings
+from app.core.auth_cache import auth_cache
 from app.models.user import User
 from app.schemas.user import UserCreate, User as UserSchema, Token
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserSchema)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Регистрация нового пользователя
     """
     # Проверяем, что пользователя с таким именем еще нет
-    user = db.query(User).filter(User.username == user_in.username).first()
+    user = await db.scalar(select(User).where(User.username == user_in.username))
     if user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь с таким именем уже существует"
         )
     
-    # Создаем нового пользователя
+    # Создаем нового пользователя (bcrypt - в отдельном пуле, не в event loop)
     user = User(
         username=user_in.username,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=await hash_password(user_in.password),
         is_active=True
     )
     
     # Сохраняем в БД
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     OAuth2 совместимый токен, логин для получения токена доступа
     """
+    # Ограничение частоты попыток по IP и имени пользователя (429)
+    ip = client_ip(request)
+    login_throttle.check(ip, form_data.username)
+
     # Проверяем пользователя
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user or not await check_password(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверное имя пользователя или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Успешный вход лимит не расходует
+    login_throttle.refund(ip, form_data.username)
     
     # Создаем access и refresh токены
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -68,7 +80,7 @@ def login_for_access_token(
     
     # Сохраняем refresh token в БД
     user.refresh_token = refresh_token
-    db.commit()
+    await db.commit()
     
     return {
         "access_token": access_token,
@@ -78,9 +90,9 @@ def login_for_access_token(
 
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(
+async def refresh_token(
     refresh_token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновление токена доступа с помощью refresh token
@@ -103,7 +115,7 @@ def refresh_token(
             )
             
         # Получаем пользователя и проверяем токен
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, uuid.UUID(user_id))
         
         if not user or user.refresh_token != refresh_token:
             raise HTTPException(
@@ -124,7 +136,10 @@ def refresh_token(
         
         # Обновляем токен в БД
         user.refresh_token = new_refresh_token
-        db.commit()
+        await db.commit()
+        
+        # Ротация токенов: сбрасываем закэшированные данные пользователя
+        auth_cache.invalidate_user(user.id)
         
         return {
             "access_token": access_token,
@@ -132,7 +147,7 @@ def refresh_token(
             "token_type": "bearer",
         }
         
-    except JWTError:
+    except (JWTError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный токен обновления",
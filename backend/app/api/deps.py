@@ -1,25 +1,35 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.config import settings
+from app.core.auth_cache import auth_cache, UserSnapshot
 from app.models.user import User
 from app.schemas.user import TokenData
 
 # Точка для получения токена через OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token")
+# То же без обязательного токена: для эндпоинтов, доступных анонимно
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/token", auto_error=False)
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme)
-) -> User:
+) -> UserSnapshot:
     """
-    Получение текущего пользователя по JWT токену
+    Получение текущего пользователя по JWT токену.
+    
+    Проверенные токены кэшируются (app/core/auth_cache.py), поэтому
+    повторные запросы с тем же токеном не декодируют JWT и не обращаются к БД.
     """
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return cached.user
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Неверные учетные данные",
@@ -36,19 +46,23 @@ async def get_current_user(
             raise credentials_exception
             
         token_data = TokenData(username=username, user_id=uuid.UUID(user_id))
-    except JWTError:
+    except (JWTError, ValueError):
         raise credentials_exception
         
     # Получаем пользователя из БД
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    generation = auth_cache.generation(token_data.user_id)
+    user = await db.get(User, token_data.user_id)
     
     if user is None or not user.is_active:
         raise credentials_exception
+    
+    snapshot = UserSnapshot.from_user(user)
+    auth_cache.set(token, payload, snapshot, generation)
         
-    return user
+    return snapshot
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: UserSnapshot = Depends(get_current_user)) -> UserSnapshot:
     """
     Получение активного пользователя
     """
@@ -57,4 +71,21 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь неактивен"
         )
-    return current_user 
\ No newline at end of file
+    return current_user
+
+
+async def get_optional_user(
+    db: AsyncSession = Depends(get_async_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme)
+) -> Optional[UserSnapshot]:
+    """
+    Текущий активный пользователь или None для запроса без токена или
+    с недействительным токеном: анонимный эндпоинт не должен отвечать 401.
+    """
+    if token is None:
+        return None
+    try:
+        current_user = await get_current_user(db, token)
+    except HTTPException:
+        return None
+    return current_user if current_user.is_active else None
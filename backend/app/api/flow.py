@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional
+import uuid
+
+from app.core.database import get_async_db
+from app.core.config import settings
+from app import schemas
+from app.models.like import Like
+from app.api.deps import get_current_active_user
+from app.core.auth_cache import UserSnapshot
+from app.core.recommender import flow_recommender, flow_sessions, flow_tracks
+from app.core.sampler import get_sampler, load_tracks
+
+router = APIRouter()
+
+
+@router.get("/next", response_model=List[schemas.Track])
+async def get_flow_next(
+    response: Response,
+    limit: int = Query(20, ge=1, le=50),
+    session: Optional[str] = Query(None, max_length=64, description="ID сессии потока из заголовка X-Flow-Session"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Следующие треки потока: похожие на последние лайки пользователя
+    (по совместным лайкам других пользователей), без повторов в сессии.
+    Если рекомендаций не хватает, поток добирается случайными треками.
+
+    - **limit**: количество треков (от 1 до 50, по умолчанию 20)
+    - **session**: ID сессии; без него начинается новая сессия
+    """
+    session = session or uuid.uuid4().hex
+    response.headers["X-Flow-Session"] = session
+    served = await flow_sessions.get(current_user.id, session)
+
+    # Модель строится в фоне; если её ещё нет, запускаем построение
+    # и отвечаем случайными треками
+    flow_recommender.start()
+    seeds = (await db.execute(
+        select(Like.track_id)
+        .where(Like.user_id == current_user.id)
+        .order_by(Like.created_at.desc(), Like.id.desc())
+        .limit(settings.FLOW_SEED_LIKES)
+    )).scalars().all()
+    track_ids = flow_recommender.recommend(current_user.id, list(seeds), served, limit)
+    tracks = await load_tracks(db, track_ids)
+    flow_tracks.inc(len(tracks), source="model")
+
+    if len(tracks) < limit:
+        seen = served | {t.id for t in tracks} | set(seeds)
+        extra = [t for t in await get_sampler().sample(db, 2 * limit) if t.id not in seen]
+        extra = extra[:limit - len(tracks)]
+        flow_tracks.inc(len(extra), source="random")
+        tracks += extra
+
+    await flow_sessions.add(current_user.id, session, (t.id for t in tracks))
+    return tracks
@@ -1,45 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from sqlalchemy import and_, select, desc, or_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+from typing import List, Optional, Dict
+from uuid import UUID
+from sqlalchemy import and_, delete, select, desc, or_
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app import schemas
 from app.models.like import Like
 from app.models.track import Track
 from app.api.deps import get_current_active_user
-from app.models.user import User
+from app.core.auth_cache import UserSnapshot
+from app.core.like_counts import like_counter
+from app.utils.search import track_search
+from app.utils.pagination import keyset_paginate, set_page_headers
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Like])
-def read_user_likes(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+async def read_user_likes(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True, description="Смещение (устарело, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=500), 
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Получить список лайков текущего пользователя, отсортированный по дате 
     добавления (новые в начале).
     
-    - **skip**: смещение для пагинации
+    - **cursor**: курсор следующей страницы из заголовка X-Next-Cursor
+    - **skip**: смещение для пагинации (устарело)
     - **limit**: максимальное количество возвращаемых записей
     """
-    # Используем joinedload для эффективной загрузки связанных треков
-    likes = db.query(Like).options(joinedload(Like.track))\
-              .filter(Like.user_id == current_user.id)\
-              .order_by(desc(Like.created_at))\
-              .offset(skip).limit(limit).all()
+    # Используем joinedload для эффективной загрузки связанных треков,
+    # страницы читаются по индексу (user_id, created_at, id)
+    likes, next_cursor = await keyset_paginate(
+        db,
+        select(Like).options(joinedload(Like.track)).where(Like.user_id == current_user.id),
+        [Like.created_at, Like.id], limit, cursor=cursor, skip=skip
+    )
+    set_page_headers(response, next_cursor, skip)
     
     return likes
 
 
 @router.post("/", response_model=schemas.Like, status_code=status.HTTP_201_CREATED)
-def create_like(
+async def create_like(
     like_data: schemas.LikeCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Поставить лайк треку.
@@ -47,118 +60,149 @@ def create_like(
     - **track_id**: ID трека для лайка
     - **artwork_url**: URL обложки трека (опционально)
     """
-    # Проверяем существует ли трек
-    track = db.query(Track).filter(Track.id == like_data.track_id).first()
-    if not track:
-        raise HTTPException(status_code=404, detail="Трек не найден")
-    
-    # Проверяем, не поставил ли уже пользователь лайк этому треку
-    existing_like = db.query(Like).filter(
-        and_(Like.user_id == current_user.id, Like.track_id == like_data.track_id)
-    ).first()
-    
-    if existing_like:
-        raise HTTPException(status_code=400, detail="Вы уже поставили лайк этому треку")
-    
-    # Получаем URL обложки трека, если он не был передан
+    # Один запрос: вставка с пропуском дубликата и чтение трека для ответа.
+    # Обложка по умолчанию берётся из трека подзапросом
     artwork_url = like_data.artwork_url
-    if not artwork_url and track.artwork_url:
-        artwork_url = track.artwork_url
-    
-    # Создаем новый лайк
-    db_like = Like(
-        user_id=current_user.id,
-        track_id=like_data.track_id,
-        artwork_url=artwork_url
+    if not artwork_url:
+        artwork_url = select(Track.artwork_url).where(Track.id == like_data.track_id).scalar_subquery()
+    
+    inserted = (
+        pg_insert(Like)
+        .values(user_id=current_user.id, track_id=like_data.track_id, artwork_url=artwork_url)
+        .on_conflict_do_nothing(index_elements=[Like.user_id, Like.track_id])
+        .returning(*Like.__table__.c)
+        .cte("inserted_like")
     )
+    new_like = aliased(Like, inserted)
     
-    db.add(db_like)
-    db.commit()
-    db.refresh(db_like)
+    try:
+        db_like = await db.scalar(
+            select(new_like).join(new_like.track).options(contains_eager(new_like.track))
+        )
+        await db.commit()
+    except IntegrityError:
+        # Уникальный индекс обрабатывается ON CONFLICT, значит нарушен
+        # внешний ключ на tracks - трека не существует
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Трек не найден")
+    
+    if db_like is None:
+        raise HTTPException(status_code=400, detail="Вы уже поставили лайк этому треку")
     
+    # tracks.like_count обновляется пачкой в фоне
+    like_counter.add(like_data.track_id, 1)
     return db_like
 
 
 @router.delete("/{track_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_like(
-    track_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+async def delete_like(
+    track_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Удалить лайк трека.
     
     - **track_id**: ID трека, лайк которого нужно удалить
     """
-    # Находим лайк
-    like = db.query(Like).filter(
-        and_(Like.user_id == current_user.id, Like.track_id == track_id)
-    ).first()
+    # Удаляем лайк одним запросом
+    deleted_id = await db.scalar(
+        delete(Like)
+        .where(and_(Like.user_id == current_user.id, Like.track_id == track_id))
+        .returning(Like.id)
+    )
+    await db.commit()
     
-    if not like:
+    if deleted_id is None:
         raise HTTPException(status_code=404, detail="Лайк не найден")
     
-    # Удаляем лайк
-    db.delete(like)
-    db.commit()
-    
+    like_counter.add(track_id, -1)
     return None
 
 
 @router.get("/check/{track_id}", response_model=bool)
-def check_like(
-    track_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+async def check_like(
+    track_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Проверить, поставил ли пользователь лайк треку.
     
     - **track_id**: ID трека для проверки
     """
-    like = db.query(Like).filter(
+    like_id = await db.scalar(select(Like.id).where(
         and_(Like.user_id == current_user.id, Like.track_id == track_id)
-    ).first()
+    ).limit(1))
+    
+    return like_id is not None
+
+
+@router.post("/check", response_model=Dict[str, bool])
+async def check_likes(
+    check_data: schemas.LikeCheckRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Проверить статус лайка сразу для нескольких треков одним запросом.
     
-    return like is not None
+    - **track_ids**: список ID треков (не больше LIKE_CHECK_MAX_BATCH)
+    
+    Возвращает словарь {track_id: поставлен ли лайк}.
+    """
+    track_ids = list(dict.fromkeys(check_data.track_ids))
+    if not track_ids:
+        return {}
+    
+    # Один запрос на весь список; PostgreSQL выполняет IN (...) как = ANY(...)
+    result = await db.execute(select(Like.track_id).where(
+        Like.user_id == current_user.id,
+        Like.track_id.in_(track_ids)
+    ))
+    liked = set(result.scalars())
+    
+    return {str(track_id): track_id in liked for track_id in track_ids}
 
 
 @router.get("/search", response_model=List[schemas.Like])
-def search_user_likes(
+async def search_user_likes(
+    response: Response,
     query: str = Query(None, min_length=2, description="Поисковый запрос (мин. 2 символа)"),
-    skip: int = 0, 
-    limit: int = 20, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True, description="Смещение (устарело, используйте cursor)"),
+    limit: int = Query(20, ge=1, le=100), 
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Поиск среди лайкнутых треков пользователя по названию или автору.
     
     - **query**: текст для поиска
-    - **skip**: смещение для пагинации
+    - **cursor**: курсор следующей страницы из заголовка X-Next-Cursor
+    - **skip**: смещение для пагинации (устарело)
     - **limit**: максимальное количество результатов
     """
     if not query:
         return []
     
-    # Используем оператор ILIKE для поиска без учета регистра с частичным совпадением
-    search_pattern = f"%{query}%"
+    # Триграммный поиск в PostgreSQL, ILIKE в остальных СУБД (app/utils/search.py)
+    condition, rank = track_search(query, db.get_bind().dialect.name)
     
     try:
-        # Поиск среди лайкнутых треков
-        likes = db.query(Like).options(joinedload(Like.track))\
-                .join(Track, Like.track_id == Track.id)\
-                .filter(
-                    Like.user_id == current_user.id,
-                    or_(
-                        Track.title.ilike(search_pattern),
-                        Track.artist.ilike(search_pattern)
-                    )
-                )\
-                .order_by(desc(Like.created_at))\
-                .offset(skip).limit(limit).all()
+        # Поиск среди лайкнутых треков, лучшие совпадения первыми
+        likes, next_cursor = await keyset_paginate(
+            db,
+            select(Like).options(joinedload(Like.track))
+              .join(Track, Like.track_id == Track.id)
+              .where(Like.user_id == current_user.id, condition),
+            [rank, Like.created_at, Like.id], limit, cursor=cursor, skip=skip
+        )
+        set_page_headers(response, next_cursor, skip)
         
         return likes
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ошибка при поиске лайков: {e}")
         return [] 
\ No newline at end of file
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from uuid import UUID
+import email.utils
+import os
+
+from app.core.database import async_session_scope
+from app.core.config import settings
+from app.models.track import Track
+from app.utils.media import (
+    FileRangeResponse, file_etag, if_range_matches, media_type, none_match, parse_range, resolve_media_path,
+)
+
+router = APIRouter()
+
+
+async def _media_path(track_id: UUID):
+    # Своя короткая сессия, а не Depends(get_async_db): зависимость держала
+    # бы соединение с БД до конца отправки файла
+    async with async_session_scope() as db:
+        audio_path = await db.scalar(select(Track.audio_path).where(Track.id == track_id))
+    path = resolve_media_path(settings.UPLOAD_DIR, audio_path) if audio_path else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Аудио трека не найдено")
+    return path
+
+
+@router.api_route("/{track_id}", methods=["GET", "HEAD"], response_class=Response)
+async def stream_media(track_id: UUID, request: Request):
+    """
+    Аудиофайл трека с поддержкой Range и If-Range (перемотка без повторной
+    загрузки), строгим ETag и долгим Cache-Control.
+    """
+    path = await _media_path(track_id)
+    try:
+        stat = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Аудио трека не найдено")
+
+    etag = file_etag(stat)
+    headers = {
+        "etag": etag,
+        "last-modified": email.utils.formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}",
+        "accept-ranges": "bytes",
+    }
+    if none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    start, end, status_code = 0, stat.st_size - 1, 200
+    if if_range_matches(request.headers.get("if-range"), etag, stat):
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{stat.st_size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+    return FileRangeResponse(
+        path, stat, start, end, status_code, headers,
+        media_type=media_type(str(path)),
+        send_body=request.method != "HEAD",
+        chunk_size=settings.MEDIA_CHUNK_SIZE,
+    )
@@ -1,30 +1,441 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager
+from sqlalchemy import String, cast, column, delete, func, insert, literal, or_, select, true, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import logging
 
-from app.core.database import get_db
+from app.core.database import get_async_db, async_session_scope
+from app.core.config import settings
+from app.core.instrumentation import untracked_sql
+from app.core.metrics import counter
 from app import schemas
+from app.models.playlist import Playlist, PlaylistTrack
+from app.models.track import Track
+from app.api.deps import get_current_active_user, get_optional_user
+from app.core.auth_cache import UserSnapshot
+from app.utils.pagination import keyset_paginate, set_page_headers
+from app.utils.positions import generate_key_between, generate_n_keys_between
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/", response_model=List[schemas.Playlist])
-def read_playlists(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db)
+playlist_rebalances = counter(
+    "soulsync_playlist_rebalances_total",
+    "Пересчёты ключей порядка плейлистов из-за слишком длинных ключей",
+)
+
+
+async def _get_playlist(
+    db: AsyncSession, playlist_id: UUID, current_user: Optional[UserSnapshot], for_update: bool = False
+) -> Playlist:
+    """
+    Плейлист, видимый пользователю, или 404. for_update блокирует строку
+    плейлиста до конца транзакции: изменения одного плейлиста идут по
+    очереди, и два запроса не получат одинаковый ключ порядка.
+    """
+    statement = select(Playlist).where(Playlist.id == playlist_id)
+    if for_update:
+        statement = statement.with_for_update()
+    playlist = await db.scalar(statement)
+    if playlist is None or (
+        not playlist.is_public and (current_user is None or playlist.user_id != current_user.id)
+    ):
+        raise HTTPException(status_code=404, detail="Плейлист не найден")
+    return playlist
+
+
+async def _get_own_playlist(db: AsyncSession, playlist_id: UUID, current_user: UserSnapshot) -> Playlist:
+    playlist = await _get_playlist(db, playlist_id, current_user, for_update=True)
+    if playlist.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Недостаточно прав для изменения плейлиста")
+    return playlist
+
+
+async def _gap(
+    db: AsyncSession,
+    playlist_id: UUID,
+    after: Optional[UUID],
+    before: Optional[UUID],
+    moving: Optional[UUID] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Ключи соседей места вставки: после записи after и/или перед записью
+    before; без обоих - конец плейлиста. Запись moving (перемещаемая) не
+    считается соседом. Каждый ключ читается по индексу (playlist_id, position).
+    """
+    if moving is not None and moving in (after, before):
+        raise HTTPException(status_code=400, detail="Запись не может быть соседом самой себя")
+
+    entries = PlaylistTrack.playlist_id == playlist_id
+    if moving is not None:
+        entries = entries & (PlaylistTrack.id != moving)
+
+    anchors: Dict[UUID, str] = {}
+    if after is not None or before is not None:
+        result = await db.execute(
+            select(PlaylistTrack.id, PlaylistTrack.position)
+            .where(entries, PlaylistTrack.id.in_([i for i in (after, before) if i is not None]))
+        )
+        anchors = dict(result.all())
+        if any(i is not None and i not in anchors for i in (after, before)):
+            raise HTTPException(status_code=404, detail="Запись плейлиста не найдена")
+
+    low = anchors.get(after)
+    high = anchors.get(before)
+    if after is None and before is None:
+        low = await db.scalar(select(func.max(PlaylistTrack.position)).where(entries))
+    elif before is None:
+        high = await db.scalar(select(func.min(PlaylistTrack.position)).where(entries, PlaylistTrack.position > low))
+    elif after is None:
+        low = await db.scalar(select(func.max(PlaylistTrack.position)).where(entries, PlaylistTrack.position < high))
+    elif low >= high:
+        raise HTTPException(status_code=400, detail="Запись after должна стоять раньше записи before")
+    return low, high
+
+
+def _needs_rebalance(keys: List[str]) -> bool:
+    return any(len(key) > settings.PLAYLIST_POSITION_MAX_LENGTH for key in keys)
+
+
+async def rebalance_playlist(playlist_id: UUID) -> None:
+    """
+    Пересчитать ключи порядка плейлиста в короткие равномерные (фоновая задача).
+    Выполняется после ответа, поэтому в статистике SQL запроса не учитывается.
+    """
+    with untracked_sql():
+        try:
+            async with async_session_scope() as db:
+                await db.scalar(select(Playlist.id).where(Playlist.id == playlist_id).with_for_update())
+                entry_ids = (await db.execute(
+                    select(PlaylistTrack.id)
+                    .where(PlaylistTrack.playlist_id == playlist_id)
+                    .order_by(PlaylistTrack.position)
+                )).scalars().all()
+                keys = generate_n_keys_between(None, None, len(entry_ids))
+                entries = PlaylistTrack.playlist_id == playlist_id
+                # Уникальный индекс проверяется построчно, поэтому сначала
+                # временные ключи, не пересекающиеся с новыми ("~" больше любой цифры ключа)
+                await db.execute(
+                    update(PlaylistTrack)
+                    .where(entries)
+                    .values(position=literal("~") + cast(PlaylistTrack.id, String))
+                    .execution_options(synchronize_session=False)
+                )
+                for start in range(0, len(entry_ids), settings.PLAYLIST_MAX_BATCH):
+                    batch = values(
+                        column("id", PG_UUID(as_uuid=True)), column("position", String), name="v"
+                    ).data(list(zip(entry_ids, keys))[start:start + settings.PLAYLIST_MAX_BATCH])
+                    await db.execute(
+                        update(PlaylistTrack)
+                        .where(entries, PlaylistTrack.id == batch.c.id)
+                        .values(position=batch.c.position)
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+            playlist_rebalances.inc()
+        except Exception:
+            logger.exception("Не удалось пересчитать ключи порядка плейлиста %s", playlist_id)
+
+
+async def _summaries(db: AsyncSession, playlists: List[Playlist]) -> List[schemas.PlaylistSummary]:
+    """
+    Сводки плейлистов: два запроса на любое количество плейлистов -
+    число треков и обложки первых треков (LATERAL ... LIMIT по индексу
+    (playlist_id, position), без чтения всех записей плейлиста).
+    """
+    ids = [playlist.id for playlist in playlists]
+    if not ids:
+        return []
+
+    counts = dict((await db.execute(
+        select(PlaylistTrack.playlist_id, func.count())
+        .where(PlaylistTrack.playlist_id.in_(ids))
+        .group_by(PlaylistTrack.playlist_id)
+    )).all())
+
+    first = (
+        select(Track.artwork_url)
+        .join(PlaylistTrack, PlaylistTrack.track_id == Track.id)
+        .where(PlaylistTrack.playlist_id == Playlist.id, Track.artwork_url.isnot(None))
+        .order_by(PlaylistTrack.position)
+        .limit(settings.PLAYLIST_SUMMARY_ARTWORKS)
+        .lateral()
+    )
+    artworks: Dict[UUID, List[str]] = {}
+    for playlist_id, artwork_url in (await db.execute(
+        select(Playlist.id, first.c.artwork_url).join(first, true()).where(Playlist.id.in_(ids))
+    )).all():
+        artworks.setdefault(playlist_id, []).append(artwork_url)
+
+    return [
+        schemas.PlaylistSummary(
+            **schemas.PlaylistInDB.model_validate(playlist).model_dump(),
+            track_count=counts.get(playlist.id, 0),
+            artworks=artworks.get(playlist.id, []),
+        )
+        for playlist in playlists
+    ]
+
+
+async def _entries_page(
+    db: AsyncSession, playlist_id: UUID, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[PlaylistTrack], Optional[str]]:
+    """
+    Страница записей плейлиста по порядку вместе с треками (один запрос с JOIN).
+    """
+    return await keyset_paginate(
+        db,
+        select(PlaylistTrack)
+        .join(PlaylistTrack.track)
+        .options(contains_eager(PlaylistTrack.track))
+        .where(PlaylistTrack.playlist_id == playlist_id),
+        [PlaylistTrack.position], limit, cursor=cursor, descending=False
+    )
+
+
+@router.get("/", response_model=List[schemas.PlaylistSummary])
+async def read_playlists(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True, description="Смещение (устарело, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
-    Получить список плейлистов.
+    Получить список плейлистов текущего пользователя, новые в начале:
+    сводки с количеством треков и обложками первых треков.
+    Три запроса к БД независимо от размера страницы.
     """
-    return []
+    playlists, next_cursor = await keyset_paginate(
+        db,
+        select(Playlist).where(Playlist.user_id == current_user.id),
+        [Playlist.created_at, Playlist.id], limit, cursor=cursor, skip=skip
+    )
+    set_page_headers(response, next_cursor, skip)
+    return await _summaries(db, playlists)
 
 
 @router.post("/", response_model=schemas.Playlist, status_code=status.HTTP_201_CREATED)
-def create_playlist(
-    playlist: schemas.PlaylistCreate, 
-    db: Session = Depends(get_db)
+async def create_playlist(
+    playlist: schemas.PlaylistCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Создать новый плейлист.
     """
-    pass 
\ No newline at end of file
+    # Пустой список треков задаётся сразу, чтобы ответ не загружал связь
+    db_playlist = Playlist(**playlist.model_dump(), user_id=current_user.id, tracks=[])
+    db.add(db_playlist)
+    await db.commit()
+    await db.refresh(db_playlist, ["created_at", "updated_at"])
+    return db_playlist
+
+
+@router.get("/{playlist_id}", response_model=schemas.PlaylistDetail)
+async def read_playlist(
+    playlist_id: UUID,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500, description="Количество треков на первой странице"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user)
+):
+    """
+    Получить плейлист со сводкой и первой страницей треков по порядку.
+    Закрытый плейлист виден только владельцу.
+
+    Курсор следующей страницы треков - в заголовке X-Next-Cursor,
+    следующие страницы - GET /playlists/{playlist_id}/tracks.
+    """
+    playlist = await _get_playlist(db, playlist_id, current_user)
+    summary = (await _summaries(db, [playlist]))[0]
+    entries, next_cursor = await _entries_page(db, playlist_id, limit)
+    set_page_headers(response, next_cursor)
+    return schemas.PlaylistDetail(
+        **summary.model_dump(),
+        tracks=[schemas.PlaylistEntry.model_validate(entry) for entry in entries],
+    )
+
+
+@router.get("/{playlist_id}/tracks", response_model=List[schemas.PlaylistEntry])
+async def read_playlist_tracks(
+    playlist_id: UUID,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user)
+):
+    """
+    Получить страницу треков плейлиста по порядку.
+
+    - **cursor**: курсор следующей страницы из заголовка X-Next-Cursor
+    - **limit**: максимальное количество треков
+    """
+    await _get_playlist(db, playlist_id, current_user)
+    entries, next_cursor = await _entries_page(db, playlist_id, limit, cursor=cursor)
+    set_page_headers(response, next_cursor)
+    return entries
+
+
+@router.patch("/{playlist_id}", response_model=schemas.PlaylistInDB)
+async def update_playlist(
+    playlist_id: UUID,
+    playlist_data: schemas.PlaylistUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Изменить название, описание или видимость плейлиста.
+    """
+    playlist = await _get_own_playlist(db, playlist_id, current_user)
+    for field, value in playlist_data.model_dump(exclude_unset=True).items():
+        setattr(playlist, field, value)
+    await db.commit()
+    await db.refresh(playlist)
+    return playlist
+
+
+@router.delete("/{playlist_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_playlist(
+    playlist_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Удалить плейлист вместе с его записями.
+    """
+    await _get_own_playlist(db, playlist_id, current_user)
+    await db.execute(delete(PlaylistTrack).where(PlaylistTrack.playlist_id == playlist_id))
+    await db.execute(delete(Playlist).where(Playlist.id == playlist_id))
+    await db.commit()
+    return None
+
+
+@router.post("/{playlist_id}/tracks", response_model=List[schemas.PlaylistTrack], status_code=status.HTTP_201_CREATED)
+async def add_playlist_tracks(
+    playlist_id: UUID,
+    tracks_data: schemas.PlaylistTracksAdd,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Добавить треки в плейлист одним запросом INSERT.
+
+    - **track_ids**: треки в нужном порядке (до PLAYLIST_MAX_BATCH)
+    - **after**, **before**: ID записей, между которыми вставить; без них - в конец
+    """
+    await _get_own_playlist(db, playlist_id, current_user)
+    low, high = await _gap(db, playlist_id, tracks_data.after, tracks_data.before)
+    keys = generate_n_keys_between(low, high, len(tracks_data.track_ids))
+
+    try:
+        entries = (await db.scalars(
+            insert(PlaylistTrack).returning(PlaylistTrack),
+            [
+                {"playlist_id": playlist_id, "track_id": track_id, "position": key}
+                for track_id, key in zip(tracks_data.track_ids, keys)
+            ],
+        )).all()
+        await db.commit()
+    except IntegrityError:
+        # Внешний ключ на tracks: одного из треков не существует
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Трек не найден")
+
+    if _needs_rebalance(keys):
+        background_tasks.add_task(rebalance_playlist, playlist_id)
+    return sorted(entries, key=lambda entry: entry.position)
+
+
+@router.patch("/{playlist_id}/tracks/{entry_id}", response_model=schemas.PlaylistTrack)
+async def move_playlist_track(
+    playlist_id: UUID,
+    entry_id: UUID,
+    move_data: schemas.PlaylistTrackMove,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Переместить запись плейлиста: меняется ключ порядка одной строки.
+
+    - **after**, **before**: ID записей, между которыми поставить; без них - в конец
+    """
+    await _get_own_playlist(db, playlist_id, current_user)
+    low, high = await _gap(db, playlist_id, move_data.after, move_data.before, moving=entry_id)
+    key = generate_key_between(low, high)
+
+    entry = await db.scalar(
+        update(PlaylistTrack)
+        .where(PlaylistTrack.id == entry_id, PlaylistTrack.playlist_id == playlist_id)
+        .values(position=key)
+        .returning(PlaylistTrack)
+        .execution_options(synchronize_session=False)
+    )
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Запись плейлиста не найдена")
+    await db.commit()
+
+    if _needs_rebalance([key]):
+        background_tasks.add_task(rebalance_playlist, playlist_id)
+    return entry
+
+
+@router.delete("/{playlist_id}/tracks/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_playlist_track(
+    playlist_id: UUID,
+    entry_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Удалить запись из плейлиста; остальные записи не меняются.
+    """
+    await _get_own_playlist(db, playlist_id, current_user)
+    deleted_id = await db.scalar(
+        delete(PlaylistTrack)
+        .where(PlaylistTrack.id == entry_id, PlaylistTrack.playlist_id == playlist_id)
+        .returning(PlaylistTrack.id)
+    )
+    await db.commit()
+
+    if deleted_id is None:
+        raise HTTPException(status_code=404, detail="Запись плейлиста не найдена")
+    return None
+
+
+@router.post("/{playlist_id}/tracks/remove", response_model=Dict[str, int])
+async def remove_playlist_tracks(
+    playlist_id: UUID,
+    remove_data: schemas.PlaylistTracksRemove,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Удалить из плейлиста много записей одним запросом DELETE.
+
+    - **entry_ids**: ID записей
+    - **track_ids**: треки, все вхождения которых удаляются
+
+    Возвращает {"removed": количество удалённых записей}.
+    """
+    await _get_own_playlist(db, playlist_id, current_user)
+    if not remove_data.entry_ids and not remove_data.track_ids:
+        return {"removed": 0}
+
+    result = await db.execute(
+        delete(PlaylistTrack).where(
+            PlaylistTrack.playlist_id == playlist_id,
+            or_(PlaylistTrack.id.in_(remove_data.entry_ids), PlaylistTrack.track_id.in_(remove_data.track_ids)),
+        )
+    )
+    await db.commit()
+    return {"removed": result.rowcount}
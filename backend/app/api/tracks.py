@@ -1,96 +1,238 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime, timezone
+from uuid import UUID
 from sqlalchemy import func, select, or_
+from sqlalchemy.exc import IntegrityError
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app import schemas
 from app.models.track import Track
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_user, get_optional_user
+from app.core.auth_cache import UserSnapshot
+from app.core.sampler import get_sampler, get_weighted_sampler
+from app.core.cache import catalog_cache, dump_models, json_response, pack_page, unpack_page
+from app.utils.search import track_search
+from app.utils.pagination import keyset_paginate, set_page_headers
+from app.utils.bulk import bulk_create_tracks, parse_bulk_body
+from app.utils.export import MEDIA_TYPES, export_tracks
+from app.utils.media import file_etag, none_match
+from app.utils.peaks import peaks_path, read_level
+from app.core.config import settings
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Track])
-def read_tracks(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db)
+async def read_tracks(
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True, description="Смещение (устарело, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Получить список треков.
+    Получить список треков, новые в начале.
+    
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
     """
-    tracks = db.query(Track).offset(skip).limit(limit).all()
-    return tracks
+    cached, cache_key = await catalog_cache.lookup(
+        "read_tracks", {"cursor": cursor, "skip": skip, "limit": limit}
+    )
+    if cached is None:
+        tracks, next_cursor = await keyset_paginate(
+            db, select(Track), [Track.created_at, Track.id], limit, cursor=cursor, skip=skip
+        )
+        cached = pack_page(dump_models(schemas.Track, tracks), next_cursor)
+        await catalog_cache.store(cache_key, cached)
+    
+    body, next_cursor = unpack_page(cached)
+    page = json_response(body)
+    set_page_headers(page, next_cursor, skip)
+    return page
 
 
 @router.get("/random", response_model=List[schemas.Track])
-def get_random_tracks(
+async def get_random_tracks(
     limit: int = Query(20, ge=1, le=50),
-    db: Session = Depends(get_db)
+    mode: str = Query("uniform", pattern="^(uniform|weighted)$", description="uniform - равновероятно, weighted - чаще популярные"),
+    exclude_liked: bool = Query(False, description="Без треков, лайкнутых текущим пользователем (только mode=weighted с токеном)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[UserSnapshot] = Depends(get_optional_user)
 ):
     """
     Получить случайные треки из базы данных.
     
     - **limit**: количество треков для получения (от 1 до 50, по умолчанию 20)
+    - **mode**: uniform (по умолчанию) или weighted - вероятность по лайкам и их свежести
+    - **exclude_liked**: исключить треки, уже лайкнутые пользователем
     """
-    # Используем PostgreSQL функцию RANDOM() для получения случайных строк
-    random_tracks = db.query(Track).order_by(func.random()).limit(limit).all()
+    if mode == "weighted":
+        # Таблица псевдонимов по лайкам в памяти процесса (см. app/core/sampler.py)
+        user_id = current_user.id if exclude_liked and current_user is not None else None
+        return await get_weighted_sampler().sample(db, limit, user_id=user_id)
+    # Стратегия выборки задаётся настройкой RANDOM_SAMPLER (см. app/core/sampler.py)
+    random_tracks = await get_sampler().sample(db, limit)
     return random_tracks
 
 
+@router.get("/popular", response_model=List[schemas.Track])
+async def read_popular_tracks(
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Чарт: треки с наибольшим количеством лайков.
+    
+    Читается по индексу (like_count, id); like_count обновляется с
+    задержкой до LIKE_COUNT_FLUSH_SECONDS, ответ кэшируется на
+    POPULAR_CACHE_TTL_SECONDS.
+    
+    - **cursor**: курсор следующей страницы из заголовка X-Next-Cursor
+    - **limit**: максимальное количество треков
+    """
+    cached, cache_key = await catalog_cache.lookup("popular_tracks", {"cursor": cursor, "limit": limit})
+    if cached is None:
+        tracks, next_cursor = await keyset_paginate(
+            db, select(Track).where(Track.like_count > 0), [Track.like_count, Track.id], limit, cursor=cursor
+        )
+        cached = pack_page(dump_models(schemas.Track, tracks), next_cursor)
+        await catalog_cache.store(cache_key, cached, ttl=settings.POPULAR_CACHE_TTL_SECONDS)
+    
+    body, next_cursor = unpack_page(cached)
+    page = json_response(body)
+    set_page_headers(page, next_cursor)
+    return page
+
+
 @router.get("/search", response_model=List[schemas.Track])
-def search_tracks(
+async def search_tracks(
     query: str = Query(None, min_length=2, description="Поисковый запрос (мин. 2 символа)"),
-    skip: int = 0, 
-    limit: int = 20, 
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True, description="Смещение (устарело, используйте cursor)"),
+    limit: int = Query(20, ge=1, le=100), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Поиск треков по названию или автору.
+    Поиск треков по названию или автору, лучшие совпадения первыми.
     
     - **query**: текст для поиска
-    - **skip**: смещение для пагинации
+    - **cursor**: курсор следующей страницы из заголовка X-Next-Cursor
+    - **skip**: смещение для пагинации (устарело)
     - **limit**: максимальное количество результатов
     """
     if not query:
         return []
     
-    # Используем оператор ILIKE для поиска без учета регистра
-    # с частичным совпадением (% означает любое количество символов)
-    search_pattern = f"%{query}%"
-    
-    try:
-        tracks = db.query(Track).filter(
-            or_(
-                Track.title.ilike(search_pattern),
-                Track.artist.ilike(search_pattern)
+    cached, cache_key = await catalog_cache.lookup(
+        "search_tracks", {"query": query, "cursor": cursor, "skip": skip, "limit": limit}
+    )
+    if cached is None:
+        # Триграммный поиск в PostgreSQL, ILIKE в остальных СУБД (app/utils/search.py)
+        condition, rank = track_search(query, db.get_bind().dialect.name)
+        
+        try:
+            tracks, next_cursor = await keyset_paginate(
+                db, select(Track).where(condition), [rank, Track.id], limit, cursor=cursor, skip=skip
             )
-        ).offset(skip).limit(limit).all()
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Ошибка при поиске треков: {e}")
+            return []
         
-        return tracks
-    except Exception as e:
-        print(f"Ошибка при поиске треков: {e}")
-        return []
+        cached = pack_page(dump_models(schemas.Track, tracks), next_cursor)
+        await catalog_cache.store(cache_key, cached)
+    
+    body, next_cursor = unpack_page(cached)
+    page = json_response(body)
+    set_page_headers(page, next_cursor, skip)
+    return page
+
+
+@router.get("/export")
+async def export_catalog(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Формат: ndjson или csv"),
+    since: Optional[datetime] = Query(None, description="Только треки с updated_at >= since"),
+    gzip: bool = Query(False, description="Сжать ответ (Content-Encoding: gzip)"),
+):
+    """
+    Выгрузить каталог треков потоком, в порядке (updated_at, id).
+    
+    - **format**: ndjson (по строке JSON на трек) или csv с заголовком
+    - **since**: для инкрементального зеркала - updated_at последнего
+      полученного трека; граница включительная, применяйте строки как upsert по id
+    - **gzip**: сжать поток
+    """
+    if since is not None and since.tzinfo is not None:
+        # updated_at хранится без часового пояса (UTC); сравнение naive и
+        # aware падало бы уже после отправки заголовков ответа
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    headers = {"Content-Disposition": f'attachment; filename="tracks.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_tracks(format, since=since, compress=gzip, batch_size=settings.TRACK_EXPORT_BATCH_SIZE),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
 
 
 @router.get("/{track_id}", response_model=schemas.Track)
-def read_track(
-    track_id: str,
-    db: Session = Depends(get_db)
+async def read_track(
+    track_id: UUID,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить отдельный трек по ID.
     """
-    track = db.query(Track).filter(Track.id == track_id).first()
-    if track is None:
-        raise HTTPException(status_code=404, detail="Трек не найден")
-    return track
+    cached, cache_key = await catalog_cache.lookup("read_track", {"track_id": track_id})
+    if cached is None:
+        track = await db.get(Track, track_id)
+        if track is None:
+            raise HTTPException(status_code=404, detail="Трек не найден")
+        cached = schemas.Track.model_validate(track).model_dump_json().encode()
+        await catalog_cache.store(cache_key, cached)
+    return json_response(cached)
+
+
+@router.get("/{track_id}/peaks", response_class=Response)
+async def read_track_peaks(
+    track_id: UUID,
+    request: Request,
+    res: int = Query(1024, ge=1, description="Желаемое число пар min/max на весь трек"),
+):
+    """
+    Пики формы волны трека: int8 пары [min, max, min, max, ...] на весь
+    трек. Отдаётся ближайший сохранённый уровень не грубее res (или самый
+    подробный); число пар - в X-Peaks-Count, длительность - в
+    X-Audio-Duration. Пики строятся в фоне после загрузки аудио, до
+    этого - 404.
+    """
+    # Запросов к БД нет: файл пиков находится по ID трека
+    found = await run_in_threadpool(read_level, peaks_path(settings.UPLOAD_DIR, track_id), res)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Пики трека не найдены")
+    index, level, data = found
+
+    etag = file_etag(index.stat, suffix=f"{level.resolution:x}")
+    headers = {
+        "etag": etag,
+        "cache-control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}",
+        "x-peaks-count": str(level.count),
+        "x-audio-duration": f"{index.duration:.3f}",
+    }
+    if none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, headers=headers, media_type="application/octet-stream")
 
 
 @router.post("/", response_model=schemas.Track, status_code=status.HTTP_201_CREATED)
-def create_track(
+async def create_track(
     track: schemas.TrackCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -105,6 +247,39 @@ def create_track(
         user_id=current_user.id
     )
     db.add(db_track)
-    db.commit()
-    db.refresh(db_track)
-    return db_track 
\ No newline at end of file
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Уникальный индекс uq_tracks_url
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Трек с таким URL уже существует")
+    await db.refresh(db_track)
+    # Каталог изменился: закэшированные списки и поиск больше не актуальны
+    await catalog_cache.bump_version()
+    return db_track
+
+
+@router.post("/bulk", response_model=schemas.TrackBulkResult)
+async def create_tracks_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Создать много треков одним запросом.
+    Требует авторизации.
+    
+    Тело - JSON-массив объектов TrackCreate или NDJSON
+    (Content-Type: application/x-ndjson), не больше TRACK_BULK_MAX_ITEMS.
+    Треки с уже существующим url пропускаются. Для каждого элемента
+    возвращается статус: created, duplicate или invalid.
+    """
+    raw_items = parse_bulk_body(
+        await request.body(), request.headers.get("content-type"), settings.TRACK_BULK_MAX_ITEMS
+    )
+    result = await bulk_create_tracks(
+        db, raw_items, current_user.id, batch_size=settings.TRACK_BULK_BATCH_SIZE
+    )
+    if result.created:
+        await catalog_cache.bump_version()
+    return result
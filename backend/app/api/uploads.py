@@ -0,0 +1,343 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+from pathlib import Path
+from uuid import UUID, uuid4
+import hashlib
+import logging
+import os
+
+import aiofiles
+
+from app import schemas
+from app.api.deps import get_current_active_user
+from app.core.auth_cache import UserSnapshot
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.peaks import peaks_builder
+from app.models.track import Track
+from app.models.upload import AudioUpload
+from app.utils.media import MEDIA_TYPES, resolve_media_path
+from app.utils.uploads import (
+    UploadLocked, exclusive_lock, file_sha256, move_file, parse_checksum, part_path, upload_hashes,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Код ответа tus на несовпадение контрольной суммы
+CHECKSUM_MISMATCH = 460
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+
+
+def _offset_headers(upload: AudioUpload) -> dict:
+    return {
+        "Upload-Offset": str(upload.received),
+        "Upload-Length": str(upload.size),
+        "Cache-Control": "no-store",
+    }
+
+
+async def _get_own_upload(db: AsyncSession, upload_id: UUID, current_user: UserSnapshot) -> AudioUpload:
+    upload = await db.get(AudioUpload, upload_id, populate_existing=True)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    if upload.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Недостаточно прав для этой загрузки")
+    return upload
+
+
+@router.post("/", response_model=schemas.AudioUpload, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload_in: schemas.AudioUploadCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Начать загрузку аудиофайла своего трека.
+
+    Файл передаётся частями PATCH /uploads/{id} и прикрепляется к треку
+    POST /uploads/{id}/finalize. Адрес загрузки - в заголовке Location.
+    """
+    extension = os.path.splitext(upload_in.filename)[1].lower()
+    if extension not in MEDIA_TYPES:
+        raise HTTPException(status_code=415, detail="Неподдерживаемый формат аудиофайла")
+    if upload_in.size > settings.AUDIO_UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="Файл больше допустимого размера")
+
+    track = (await db.execute(select(Track.user_id).where(Track.id == upload_in.track_id))).first()
+    if track is None:
+        raise HTTPException(status_code=404, detail="Трек не найден")
+    if track.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Недостаточно прав для изменения трека")
+
+    upload = AudioUpload(
+        id=uuid4(),
+        user_id=current_user.id,
+        track_id=upload_in.track_id,
+        filename=upload_in.filename,
+        size=upload_in.size,
+        received=0,
+        sha256=upload_in.sha256,
+        status="active",
+    )
+    path = part_path(settings.UPLOAD_TMP_DIR, upload.id)
+    async with aiofiles.open(path, "wb"):
+        pass
+    db.add(upload)
+    try:
+        await db.commit()
+    except BaseException:
+        await run_in_threadpool(os.unlink, path)
+        raise
+    await db.refresh(upload, ["created_at", "updated_at"])
+    upload_hashes.set(upload.id, 0, hashlib.sha256())
+
+    response.headers["Location"] = f"{settings.API_V1_STR}/uploads/{upload.id}"
+    response.headers.update(_offset_headers(upload))
+    return upload
+
+
+@router.head("/{upload_id}", response_class=Response)
+async def upload_offset(
+    upload_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Сколько байт принято (Upload-Offset): с этого смещения продолжается загрузка.
+    """
+    upload = await _get_own_upload(db, upload_id, current_user)
+    return Response(status_code=200, headers=_offset_headers(upload))
+
+
+@router.get("/{upload_id}", response_model=schemas.AudioUpload)
+async def read_upload(
+    upload_id: UUID,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Состояние загрузки.
+    """
+    upload = await _get_own_upload(db, upload_id, current_user)
+    response.headers.update(_offset_headers(upload))
+    return upload
+
+
+async def _receive_chunk(db: AsyncSession, request: Request, file, upload_id: UUID, offset: int, checksum) -> Response:
+    # Смещение перечитывается под блокировкой файла: предыдущая часть могла
+    # завершиться после первой проверки
+    row = (await db.execute(
+        select(AudioUpload.received, AudioUpload.size, AudioUpload.status).where(AudioUpload.id == upload_id)
+    )).first()
+    # Соединение с БД не держим на время приёма тела
+    await db.commit()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    if row.status != "active":
+        raise HTTPException(status_code=409, detail="Загрузка уже завершена")
+    if offset != row.received:
+        raise HTTPException(
+            status_code=409, detail="Upload-Offset не совпадает с принятым", headers={"Upload-Offset": str(row.received)}
+        )
+
+    limit = min(row.size - offset, settings.AUDIO_UPLOAD_MAX_CHUNK)
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Часть больше допустимого размера или остатка файла")
+
+    digest = upload_hashes.get(upload_id, offset)
+    chunk_digest = hashlib.new(checksum[0]) if checksum is not None else None
+    written = 0
+    await file.seek(offset)
+    try:
+        async for chunk in request.stream():
+            if written + len(chunk) > limit:
+                raise HTTPException(status_code=413, detail="Часть больше допустимого размера или остатка файла")
+            await file.write(chunk)
+            written += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            if chunk_digest is not None:
+                chunk_digest.update(chunk)
+    except ClientDisconnect:
+        if checksum is not None:
+            # Часть с контрольной суммой принимается только целиком
+            await file.truncate(offset)
+            return Response(status_code=400)
+        # Без контрольной суммы принятое сохраняется: клиент узнает новое
+        # смещение из HEAD и продолжит с него
+    except BaseException:
+        await file.truncate(offset)
+        raise
+
+    if chunk_digest is not None and chunk_digest.digest() != checksum[1]:
+        await file.truncate(offset)
+        raise HTTPException(
+            status_code=CHECKSUM_MISMATCH, detail="Контрольная сумма части не совпадает",
+            headers={"Upload-Offset": str(offset)},
+        )
+
+    received = offset + written
+    # Отрезаем хвост записи, которая оборвалась раньше и не попала в received
+    await file.truncate(received)
+    await file.flush()
+    await run_in_threadpool(os.fsync, file.fileno())
+    await db.execute(update(AudioUpload).where(AudioUpload.id == upload_id).values(received=received))
+    await db.commit()
+    if digest is not None:
+        upload_hashes.set(upload_id, received, digest)
+    else:
+        upload_hashes.discard(upload_id)
+    return Response(status_code=204, headers={"Upload-Offset": str(received)})
+
+
+@router.patch("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def upload_chunk(
+    upload_id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Дописать часть файла с смещения Upload-Offset.
+
+    Тело (Content-Type: application/offset+octet-stream) пишется на диск
+    по мере приёма, целиком в памяти не держится. Upload-Checksum
+    ("sha256 <base64>", также sha1 и md5) проверяет часть: при несовпадении
+    она отбрасывается с ответом 460. При обрыве соединения часть без
+    контрольной суммы сохраняется, и загрузку можно продолжить с
+    Upload-Offset из HEAD. В ответе - новое Upload-Offset.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip().lower() != OFFSET_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Ожидается Content-Type: {OFFSET_CONTENT_TYPE}")
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Неверный заголовок Upload-Offset")
+    try:
+        checksum = parse_checksum(request.headers.get("upload-checksum"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    upload = await _get_own_upload(db, upload_id, current_user)
+    path = part_path(settings.UPLOAD_TMP_DIR, upload.id)
+    try:
+        async with aiofiles.open(path, "r+b") as file:
+            with exclusive_lock(file.fileno()):
+                return await _receive_chunk(db, request, file, upload.id, int(offset), checksum)
+    except FileNotFoundError:
+        if upload.status == "completed":
+            raise HTTPException(status_code=409, detail="Загрузка уже завершена")
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    except UploadLocked:
+        raise HTTPException(status_code=409, detail="Загрузка уже принимает другую часть")
+
+
+@router.post("/{upload_id}/finalize", response_model=schemas.AudioUpload)
+async def finalize_upload(
+    upload_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Завершить загрузку и прикрепить файл к треку.
+
+    Проверяется sha256 файла (если объявлен при создании, иначе
+    сохраняется вычисленный). Файл атомарно переносится в
+    UPLOAD_DIR/audio/{track_id}/ и записывается в tracks.audio_path в одной
+    транзакции с завершением загрузки; прежний файл трека удаляется.
+    Повторный вызов возвращает завершённую загрузку.
+    """
+    upload = await _get_own_upload(db, upload_id, current_user)
+    if upload.status == "completed":
+        return upload
+    if upload.received != upload.size:
+        raise HTTPException(status_code=409, detail="Файл принят не полностью", headers=_offset_headers(upload))
+    await db.commit()
+
+    path = part_path(settings.UPLOAD_TMP_DIR, upload.id)
+    digest = upload_hashes.get(upload.id, upload.size)
+    try:
+        sha256 = digest.hexdigest() if digest is not None else await run_in_threadpool(file_sha256, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    if upload.sha256 is not None and sha256 != upload.sha256:
+        raise HTTPException(status_code=CHECKSUM_MISMATCH, detail="sha256 файла не совпадает с объявленным")
+
+    # Блокировки строк держатся до коммита: параллельное завершение той же
+    # загрузки или другой загрузки трека ждёт и видит результат
+    upload = await db.scalar(
+        select(AudioUpload).where(AudioUpload.id == upload_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    if upload.status == "completed":
+        await db.commit()
+        return upload
+    track = await db.scalar(select(Track).where(Track.id == upload.track_id).with_for_update())
+    previous = track.audio_path
+
+    relative = f"audio/{track.id}/{upload.id}{os.path.splitext(upload.filename)[1].lower()}"
+    target = Path(settings.UPLOAD_DIR) / relative
+    try:
+        await run_in_threadpool(move_file, path, target)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    track.audio_path = relative
+    upload.status = "completed"
+    upload.sha256 = sha256
+    try:
+        await db.commit()
+    except BaseException:
+        await run_in_threadpool(move_file, target, path)
+        raise
+    upload_hashes.discard(upload.id)
+    await db.refresh(upload, ["updated_at"])
+    peaks_builder.wake()
+
+    # Удаляются только файлы, положенные сюда же; уже начатая отдача
+    # старого файла дочитывает его по открытому дескриптору
+    if previous and previous != relative and previous.startswith("audio/"):
+        old = resolve_media_path(settings.UPLOAD_DIR, previous)
+        if old is not None:
+            try:
+                await run_in_threadpool(os.unlink, old)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception("Не удалось удалить прежний аудиофайл %s", old)
+    return upload
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
+async def delete_upload(
+    upload_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    Прервать незавершённую загрузку и удалить принятые байты.
+    """
+    upload = await _get_own_upload(db, upload_id, current_user)
+    if upload.status == "completed":
+        raise HTTPException(status_code=409, detail="Загрузка уже завершена")
+    path = part_path(settings.UPLOAD_TMP_DIR, upload.id)
+    try:
+        async with aiofiles.open(path, "r+b") as file:
+            with exclusive_lock(file.fileno()):
+                await run_in_threadpool(os.unlink, path)
+    except FileNotFoundError:
+        pass
+    except UploadLocked:
+        raise HTTPException(status_code=409, detail="Загрузка уже принимает другую часть")
+    await db.delete(upload)
+    await db.commit()
+    upload_hashes.discard(upload.id)
+    return Response(status_code=204)
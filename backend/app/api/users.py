@@ -1,31 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app import schemas
 from app.models.user import User
 from app.api.deps import get_current_active_user
-from app.core.security import get_password_hash
+from app.core.passwords import hash_password
+from app.core.auth_cache import auth_cache, UserSnapshot
+from app.utils.pagination import keyset_paginate, set_page_headers
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.User])
-def read_users(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+async def read_users(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    skip: Optional[int] = Query(None, ge=0, deprecated=True, description="Смещение (устарело, используйте cursor)"),
+    limit: int = Query(100, ge=1, le=500), 
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
-    Получить список пользователей (только для авторизованных).
+    Получить список пользователей (только для авторизованных), новые в начале.
+    
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
     """
-    users = db.query(User).offset(skip).limit(limit).all()
+    users, next_cursor = await keyset_paginate(
+        db, select(User), [User.created_at, User.id], limit, cursor=cursor, skip=skip
+    )
+    set_page_headers(response, next_cursor, skip)
     return users
 
 
 @router.get("/me", response_model=schemas.User)
-def read_user_me(current_user: User = Depends(get_current_active_user)):
+async def read_user_me(current_user: UserSnapshot = Depends(get_current_active_user)):
     """
     Получить информацию о текущем пользователе.
     """
@@ -33,35 +43,43 @@ def read_user_me(current_user: User = Depends(get_current_active_user)):
 
 
 @router.put("/me", response_model=schemas.User)
-def update_user_me(
+async def update_user_me(
     user_in: schemas.UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     Обновить информацию о текущем пользователе.
     """
     user_data = user_in.dict(exclude_unset=True)
     
-    # Если обновляем пароль, хешируем его
+    # Если обновляем пароль, хешируем его (bcrypt - в отдельном пуле, не в event loop)
     if "password" in user_data and user_data["password"]:
-        user_data["password_hash"] = get_password_hash(user_data.pop("password"))
+        user_data["password_hash"] = await hash_password(user_data.pop("password"))
+    
+    # current_user - снимок из кэша авторизации, изменяем строку из БД
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
     
     # Обновляем данные пользователя
     for field, value in user_data.items():
-        setattr(current_user, field, value)
+        setattr(user, field, value)
     
-    db.add(current_user)
-    db.commit()
-    db.refresh(current_user)
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
     
-    return current_user
+    # Сбрасываем закэшированные токены: username и is_active могли измениться
+    auth_cache.invalidate_user(user.id)
+    
+    return user
 
 
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user: schemas.UserCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создать нового пользователя.
@@ -0,0 +1,193 @@
+"""
+Контроль допуска (admission control) для эндпоинтов, работающих с БД.
+
+Запросы API делятся на группы по пути (route_groups): поиск, выгрузка
+каталога, авторизация, отдача и приём файлов, лайки, треки и остальное API. У каждой группы свой лимит одновременно
+выполняемых запросов и ограниченная очередь ожидания. Запрос, которому
+не хватило места в очереди или который не дождался слота за
+ADMISSION_QUEUE_TIMEOUT_MS, сразу получает 503 с Retry-After, а не
+ждёт соединения с БД вместе со всеми. Так медленная группа (например,
+поиск при тормозящем PostgreSQL) не занимает пул соединений и потоки
+целиком, и задержка остальных групп остаётся ограниченной.
+
+Лимиты задаются строкой ADMISSION_LIMITS вида
+"search=8:32,auth=4:32": группа=одновременных:очередь. Группы без лимита
+и пути вне API не ограничиваются.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core.metrics import counter, gauge, histogram
+
+admission_in_flight = gauge(
+    "soulsync_admission_in_flight",
+    "Выполняющиеся запросы по группам маршрутов",
+    ("group",),
+)
+admission_queue_depth = gauge(
+    "soulsync_admission_queue_depth",
+    "Запросы, ожидающие допуска, по группам маршрутов",
+    ("group",),
+)
+admission_rejected = counter(
+    "soulsync_admission_rejected_total",
+    "Отклонённые с 503 запросы: queue_full - очередь заполнена, timeout - истёк срок ожидания",
+    ("group", "reason"),
+)
+admission_wait = histogram(
+    "soulsync_admission_wait_seconds",
+    "Время ожидания допуска в очереди",
+    ("group",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """
+    Не больше limit одновременных запросов и не больше queue_size
+    ожидающих; ожидающие допускаются по очереди (FIFO).
+
+    Рассчитан на один event loop: счётчики меняются только из его задач.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        admission_in_flight.set_function(lambda: self.active, group=name)
+        admission_queue_depth.set_function(lambda: len(self._waiters), group=name)
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise AdmissionRejected("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected("timeout")
+        except asyncio.CancelledError:
+            # Слот мог быть передан в момент отмены (клиент отключился)
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            admission_wait.observe(time.perf_counter() - started, group=self.name)
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        # Слот переходит первому живому ожидающему, active не меняется
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def route_groups(api_prefix: str) -> Tuple[Tuple[str, "re.Pattern"], ...]:
+    """
+    Правила группы по пути; побеждает первое совпавшее.
+    """
+    prefix = re.escape(api_prefix)
+    return (
+        ("search", re.compile(rf"^{prefix}/(tracks|likes)/search")),
+        # Выгрузка каталога держит слот и соединение с БД до конца передачи
+        ("export", re.compile(rf"^{prefix}/tracks/export")),
+        ("auth", re.compile(rf"^{prefix}/auth/")),
+        # Отдача файлов занимает слот до конца передачи; по умолчанию без лимита
+        ("media", re.compile(rf"^{prefix}/media/")),
+        # Приём частей файла тоже занимает слот до конца тела запроса
+        ("upload", re.compile(rf"^{prefix}/uploads")),
+        ("likes", re.compile(rf"^{prefix}/likes")),
+        ("tracks", re.compile(rf"^{prefix}/tracks")),
+        ("api", re.compile(rf"^{prefix}/")),
+    )
+
+
+def parse_limits(value: str) -> Dict[str, Tuple[int, int]]:
+    """
+    "search=8:32,auth=4:32" -> {"search": (8, 32), "auth": (4, 32)}
+    """
+    limits = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        try:
+            group, spec = item.split("=")
+            limit, queue_size = spec.split(":")
+            limits[group.strip()] = (int(limit), int(queue_size))
+        except ValueError:
+            raise ValueError(f"Неверный элемент ADMISSION_LIMITS '{item}', ожидается группа=лимит:очередь")
+    return limits
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware: допуск HTTP-запросов по лимитам групп маршрутов.
+    Слот занят до конца отправки ответа, в том числе потокового.
+    """
+
+    def __init__(self, app, api_prefix: str, limits: str, queue_timeout: float, retry_after: int = 1):
+        self.app = app
+        self.groups = route_groups(api_prefix)
+        self.limiters = {
+            group: AdmissionLimiter(group, limit, queue_size, queue_timeout)
+            for group, (limit, queue_size) in parse_limits(limits).items()
+        }
+        self.retry_after = retry_after
+
+    def limiter_for(self, path: str) -> Optional[AdmissionLimiter]:
+        for group, pattern in self.groups:
+            if pattern.match(path):
+                return self.limiters.get(group)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter_for(scope["path"]) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            admission_rejected.inc(group=limiter.name, reason=e.reason)
+            await self.reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def reject(self, send):
+        body = json.dumps({"detail": "Сервер перегружен, повторите запрос позже"}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,195 @@
+"""
+Кэш аутентифицированных пользователей для get_current_user.
+
+Без кэша каждый авторизованный запрос декодирует JWT и читает строку
+пользователя из БД. Кэш хранит проверенные claims токена и лёгкий снимок
+пользователя (UserSnapshot) с ограничением по размеру (LRU) и времени
+жизни (TTL). Запись не живёт дольше срока действия самого токена.
+
+Поколения пользователей (защита от гонки чтения из БД с инвалидацией)
+ограничены тем же размером, что и записи, и живут не дольше срока
+действия access token: более старое поколение не может понадобиться
+ни одному запросу, который ещё способен сохранить запись в кэш.
+
+Кэш локален для процесса: при нескольких воркерах изменения пользователя
+в другом воркере станут видны не позже чем через AUTH_CACHE_TTL_SECONDS.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge
+
+auth_cache_hits = counter(
+    "soulsync_auth_cache_hits_total", "Запросы, пользователь которых найден в кэше"
+)
+auth_cache_misses = counter(
+    "soulsync_auth_cache_misses_total", "Запросы, потребовавшие чтения пользователя из БД"
+)
+auth_cache_evictions = counter(
+    "soulsync_auth_cache_evictions_total", "Записи, вытесненные из кэша по размеру"
+)
+auth_cache_invalidations = counter(
+    "soulsync_auth_cache_invalidations_total", "Записи, сброшенные при изменении пользователя"
+)
+auth_cache_size = gauge("soulsync_auth_cache_size", "Текущее количество записей в кэше")
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """
+    Неизменяемый снимок пользователя, достаточный для авторизации и
+    ответа по схеме schemas.User. Для изменения пользователя его строку
+    нужно загрузить из БД заново.
+    """
+    id: uuid.UUID
+    username: str
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+
+@dataclass(frozen=True)
+class CachedAuth:
+    claims: Dict[str, Any]
+    user: UserSnapshot
+    expires_at: float
+
+
+class AuthCache:
+    """
+    Потокобезопасный LRU-кэш с TTL: токен -> CachedAuth.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, generation_ttl: float):
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self.generation_ttl = generation_ttl
+        self._entries: "OrderedDict[str, CachedAuth]" = OrderedDict()
+        self._tokens_by_user: Dict[uuid.UUID, Set[str]] = {}
+        # Поколение пользователя меняется при каждой инвалидации: снимок,
+        # прочитанный из БД до инвалидации, не попадёт в кэш после неё.
+        # user_id -> (поколение, время инвалидации) в порядке инвалидаций.
+        # Значения берутся из общего счётчика; у вытесненных пользователей
+        # поколение равно _generation_floor, поэтому после вытеснения
+        # незавершённый set() со старым поколением тоже будет отклонён
+        self._generations: "OrderedDict[uuid.UUID, Tuple[int, float]]" = OrderedDict()
+        self._last_generation = 0
+        self._generation_floor = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[CachedAuth]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(token)
+                auth_cache_hits.inc()
+                return entry
+            if entry is not None:
+                self._remove(token)
+        auth_cache_misses.inc()
+        return None
+
+    def generation(self, user_id: uuid.UUID) -> int:
+        with self._lock:
+            return self._generation(user_id)
+
+    def set(self, token: str, claims: Dict[str, Any], user: UserSnapshot, generation: int = 0) -> None:
+        """
+        Сохранить запись; generation - значение generation(user.id),
+        полученное до чтения пользователя из БД.
+        """
+        if self.maxsize == 0:
+            return
+        expires_at = time.time() + self.ttl
+        token_exp = claims.get("exp")
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+
+        with self._lock:
+            if self._generation(user.id) != generation:
+                return
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = CachedAuth(claims=claims, user=user, expires_at=expires_at)
+            self._tokens_by_user.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                auth_cache_evictions.inc()
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """
+        Сбросить все записи пользователя (после изменения профиля или
+        ротации refresh token).
+        """
+        now = time.time()
+        with self._lock:
+            self._last_generation += 1
+            self._generations.pop(user_id, None)
+            self._generations[user_id] = (self._last_generation, now)
+            self._prune_generations(now)
+            tokens = self._tokens_by_user.pop(user_id, set())
+            for token in tokens:
+                self._entries.pop(token, None)
+        if tokens:
+            auth_cache_invalidations.inc(len(tokens))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self._generations.clear()
+            self._generation_floor = self._last_generation
+
+    def _generation(self, user_id: uuid.UUID) -> int:
+        entry = self._generations.get(user_id)
+        return entry[0] if entry is not None else self._generation_floor
+
+    def _prune_generations(self, now: float) -> None:
+        while self._generations:
+            user_id, (generation, invalidated_at) = next(iter(self._generations.items()))
+            if (
+                len(self._generations) <= self.maxsize
+                and invalidated_at + self.generation_ttl > now
+            ):
+                break
+            del self._generations[user_id]
+            self._generation_floor = max(self._generation_floor, generation)
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry.user.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry.user.id]
+
+
+auth_cache = AuthCache(
+    maxsize=settings.AUTH_CACHE_MAXSIZE,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    generation_ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+auth_cache_size.set_function(lambda: len(auth_cache))
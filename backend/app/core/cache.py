@@ -0,0 +1,509 @@
+"""
+Кэш результатов запросов к каталогу треков.
+
+Каталог меняется при создании треков (create_track) и импорте, а читается
+на каждом запросе read_track, read_tracks, search_tracks и
+read_popular_tracks. Кэш хранит уже сериализованные ответы этих эндпоинтов.
+
+Счётчики лайков (like_count) версию не увеличивают: они меняются
+постоянно. Чарт read_popular_tracks хранится с коротким TTL
+(POPULAR_CACHE_TTL_SECONDS), в остальных ответах like_count может
+отставать на время жизни записи.
+
+Инвалидация - через версию каталога: ключ записи включает текущую версию,
+а любое изменение каталога увеличивает её (bump_catalog_version). Старые
+записи становятся недостижимыми и вытесняются по LRU/TTL.
+
+Бэкенд задаётся настройкой CATALOG_CACHE_BACKEND:
+  memory    - LRU с TTL в памяти процесса (по умолчанию);
+  redis     - Redis или совместимый сервер (CATALOG_CACHE_REDIS_URL),
+              нужен пакет redis;
+  fakeredis - локальная подмена Redis в памяти процесса с тем же
+              интерфейсом, для разработки без сервера;
+  none      - кэш выключен.
+
+Версия каталога должна быть общей для всех воркеров и скриптов импорта,
+иначе изменение в одном процессе не сбросит кэш других. С бэкендом redis
+она хранится в Redis. У memory и fakeredis записи живут в памяти
+процесса, а версия - в последовательности PostgreSQL catalog_version_seq.
+Чтение из кэша в БД не ходит: процесс держит версию в памяти и фоновой
+задачей перечитывает её раз в CATALOG_CACHE_VERSION_REFRESH_MS, так что
+сброс из другого процесса виден с этой задержкой (из своего - сразу).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy import Sequence, text
+from sqlalchemy.exc import ProgrammingError
+
+from app.core.config import settings
+from app.core.database import Base, async_session_scope, engine
+from app.core.instrumentation import create_untracked_task
+from app.core.metrics import counter, gauge
+
+catalog_cache_requests = counter(
+    "soulsync_catalog_cache_requests_total",
+    "Обращения к кэшу каталога по эндпоинтам",
+    ("endpoint", "result"),
+)
+catalog_cache_hit_ratio = gauge(
+    "soulsync_catalog_cache_hit_ratio",
+    "Доля попаданий в кэш каталога по эндпоинтам",
+    ("endpoint",),
+)
+catalog_cache_version_bumps = counter(
+    "soulsync_catalog_cache_version_bumps_total",
+    "Увеличения версии каталога (сброс кэша)",
+)
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "catalog:version"
+
+
+class CacheBackend:
+    """
+    Интерфейс бэкенда: подмножество команд Redis (GET, SET EX, INCR, DELETE).
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ex: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """
+    LRU с TTL в памяти процесса. Ключи без TTL (версия каталога) не
+    вытесняются по размеру.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = max(0, maxsize)
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key]).encode()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: bytes, ex: Optional[float] = None) -> None:
+        if self.maxsize == 0:
+            return
+        expires_at = time.monotonic() + ex if ex else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._counters.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FakeRedis:
+    """
+    Локальная подмена асинхронного клиента redis: те же сигнатуры
+    get/set/incr/delete, данные в памяти процесса, без ограничения размера.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    def _alive(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._alive(key)
+
+    async def set(self, key: str, value, ex: Optional[float] = None) -> bool:
+        if isinstance(value, (int, str)):
+            value = str(value).encode()
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def incr(self, key: str) -> int:
+        # Без await внутри: атомарно в пределах event loop
+        value = int(self._alive(key) or 0) + 1
+        self._data[key] = (str(value).encode(), None)
+        return value
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def close(self) -> None:
+        self._data.clear()
+
+
+class RedisCache(CacheBackend):
+    """
+    Бэкенд поверх асинхронного клиента Redis (redis.asyncio или FakeRedis).
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCache":
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError(
+                "CATALOG_CACHE_BACKEND=redis требует пакет redis (pip install redis)"
+            )
+        return cls(redis_asyncio.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ex: Optional[float] = None) -> None:
+        # Redis принимает EX только в целых секундах
+        await self.client.set(key, value, ex=max(1, int(ex)) if ex else None)
+
+    async def incr(self, key: str) -> int:
+        return int(await self.client.incr(key))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+
+# Версия каталога для бэкендов в памяти процесса (создаётся create_all и миграцией)
+catalog_version_seq = Sequence("catalog_version_seq", metadata=Base.metadata)
+
+
+class BackendVersion:
+    """
+    Версия каталога в общем бэкенде (Redis).
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    async def get(self) -> int:
+        value = await self.backend.get(VERSION_KEY)
+        return int(value) if value else 0
+
+    async def incr(self) -> int:
+        return await self.backend.incr(VERSION_KEY)
+
+    def incr_sync(self) -> int:
+        return asyncio.run(self.incr())
+
+    def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class SequenceVersion:
+    """
+    Версия каталога в последовательности PostgreSQL: общая для всех
+    процессов, работающих с БД. Последовательность не транзакционна,
+    поэтому увеличивается сразу, а не при коммите вызывающего кода.
+
+    get() отдаёт копию версии из памяти процесса; её обновляет фоновая
+    задача (start/stop) раз в refresh_seconds. Если последовательности нет
+    (другая СУБД, не применена миграция), версия остаётся локальной для
+    процесса, о чём один раз пишется предупреждение.
+    """
+
+    def __init__(self, refresh_seconds: float = 0.5):
+        self.refresh_seconds = refresh_seconds
+        self._value: Optional[int] = None
+        self._shared = engine.dialect.name == "postgresql"
+        self._task: Optional[asyncio.Task] = None
+
+    def _local(self, error: Exception) -> None:
+        if self._shared:
+            self._shared = False
+            logger.warning(
+                "Последовательность catalog_version_seq недоступна, версия каталога локальна для процесса: %s",
+                getattr(error, "orig", error),
+            )
+
+    def _advance(self, value: int) -> int:
+        # Версия не уменьшается: фоновое чтение могло начаться до сброса
+        self._value = max(value, self._value or 0)
+        return self._value
+
+    async def refresh(self) -> None:
+        """
+        Перечитать версию из последовательности.
+        """
+        try:
+            async with async_session_scope() as db:
+                row = (await db.execute(text("SELECT last_value, is_called FROM catalog_version_seq"))).one()
+        except ProgrammingError as e:
+            self._local(e)
+            return
+        # До первого nextval last_value равен начальному значению
+        self._advance(row.last_value if row.is_called else 0)
+
+    async def get(self) -> int:
+        if self._value is None and self._shared:
+            # Первое чтение в процессе, дальше версию обновляет фоновая задача
+            await self.refresh()
+        return self._value or 0
+
+    async def incr(self) -> int:
+        if self._shared:
+            try:
+                async with async_session_scope() as db:
+                    value = await db.scalar(text("SELECT nextval('catalog_version_seq')"))
+                    await db.commit()
+                return self._advance(value)
+            except ProgrammingError as e:
+                self._local(e)
+        return self._advance((self._value or 0) + 1)
+
+    def incr_sync(self) -> int:
+        if self._shared:
+            try:
+                with engine.begin() as conn:
+                    return self._advance(conn.execute(text("SELECT nextval('catalog_version_seq')")).scalar())
+            except ProgrammingError as e:
+                self._local(e)
+        return self._advance((self._value or 0) + 1)
+
+    async def run(self) -> None:
+        failed = False
+        while self._shared:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # БД недоступна: остаёмся на последней версии, пишем один раз
+                if not failed:
+                    logger.warning("Не удалось обновить версию каталога: %s", e)
+                failed = True
+            else:
+                failed = False
+
+    def start(self) -> None:
+        """
+        Запустить фоновое обновление версии, если оно ещё не идёт.
+        """
+        if self._shared and self.refresh_seconds > 0 and (self._task is None or self._task.done()):
+            self._task = create_untracked_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_version_store(name: str, backend: Optional[CacheBackend]):
+    """
+    Хранилище версии каталога: общий бэкенд или последовательность в БД.
+    """
+    if backend is None:
+        return None
+    if name == "redis":
+        return BackendVersion(backend)
+    return SequenceVersion(refresh_seconds=settings.CATALOG_CACHE_VERSION_REFRESH_MS / 1000)
+
+
+def create_backend(name: str, maxsize: Optional[int] = None) -> Optional[CacheBackend]:
+    """
+    Создать бэкенд по имени с параметрами из настроек; maxsize - размер
+    memory (по умолчанию CATALOG_CACHE_MAXSIZE).
+    """
+    if name == "memory":
+        return MemoryCache(maxsize=settings.CATALOG_CACHE_MAXSIZE if maxsize is None else maxsize)
+    if name == "redis":
+        return RedisCache.from_url(settings.CATALOG_CACHE_REDIS_URL)
+    if name == "fakeredis":
+        return RedisCache(FakeRedis())
+    if name == "none":
+        return None
+    raise ValueError(
+        f"Неизвестный бэкенд кэша '{name}'. Доступные: memory, redis, fakeredis, none"
+    )
+
+
+class CatalogCache:
+    """
+    Кэш сериализованных ответов эндпоинтов каталога с версионированием.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float, versions=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.versions = versions if versions is not None or backend is None else BackendVersion(backend)
+        self._hits: Dict[str, int] = {}
+        self._lookups: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def version(self) -> int:
+        return await self.versions.get()
+
+    def start(self) -> None:
+        if self.versions is not None:
+            self.versions.start()
+
+    async def stop(self) -> None:
+        if self.versions is not None:
+            await self.versions.stop()
+
+    async def bump_version(self) -> None:
+        """
+        Увеличить версию каталога: все закэшированные ответы устаревают.
+        """
+        if self.backend is None:
+            return
+        try:
+            await self.versions.incr()
+        except Exception:
+            logger.exception("Не удалось увеличить версию каталога, кэш может быть устаревшим")
+            return
+        catalog_cache_version_bumps.inc()
+
+    def bump_version_sync(self) -> None:
+        """
+        То же из синхронного кода (скрипты импорта).
+        """
+        if self.backend is None:
+            return
+        try:
+            self.versions.incr_sync()
+        except Exception:
+            logger.exception("Не удалось увеличить версию каталога, кэш может быть устаревшим")
+            return
+        catalog_cache_version_bumps.inc()
+
+    @staticmethod
+    def _key(version: int, endpoint: str, params: Dict[str, Any]) -> str:
+        raw = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        return f"catalog:v{version}:{endpoint}:{digest}"
+
+    def _record(self, endpoint: str, hit: bool) -> None:
+        catalog_cache_requests.inc(endpoint=endpoint, result="hit" if hit else "miss")
+        with self._stats_lock:
+            self._lookups[endpoint] = self._lookups.get(endpoint, 0) + 1
+            self._hits[endpoint] = self._hits.get(endpoint, 0) + int(hit)
+            ratio = self._hits[endpoint] / self._lookups[endpoint]
+        catalog_cache_hit_ratio.set(ratio, endpoint=endpoint)
+
+    async def lookup(self, endpoint: str, params: Dict[str, Any]) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Найти ответ эндпоинта. Возвращает (значение или None, ключ для store).
+
+        Ключ вычисляется по версии на момент чтения: если каталог изменится,
+        пока запрос выполняется, результат сохранится под старой версией
+        и не будет отдан.
+        """
+        if self.backend is None:
+            return None, None
+        # Недоступный бэкенд не должен ломать чтение каталога: идём в БД
+        try:
+            key = self._key(await self.version(), endpoint, params)
+            value = await self.backend.get(key)
+        except Exception:
+            logger.exception("Ошибка чтения из кэша каталога")
+            return None, None
+        self._record(endpoint, value is not None)
+        return value, key
+
+    async def store(self, key: Optional[str], value: bytes, ttl: Optional[float] = None) -> None:
+        """
+        Сохранить ответ на ttl секунд (по умолчанию - общий TTL кэша).
+        """
+        if self.backend is None or key is None:
+            return
+        try:
+            await self.backend.set(key, value, ex=ttl or self.ttl)
+        except Exception:
+            logger.exception("Ошибка записи в кэш каталога")
+
+
+_catalog_backend = create_backend(settings.CATALOG_CACHE_BACKEND)
+catalog_cache = CatalogCache(
+    _catalog_backend,
+    settings.CATALOG_CACHE_TTL_SECONDS,
+    create_version_store(settings.CATALOG_CACHE_BACKEND, _catalog_backend),
+)
+
+
+def dump_models(schema, items: Iterable[Any]) -> bytes:
+    """
+    Сериализовать ORM-объекты по pydantic-схеме в JSON-массив.
+    """
+    return b"[" + b",".join(
+        schema.model_validate(item).model_dump_json().encode() for item in items
+    ) + b"]"
+
+
+def pack_page(body: bytes, next_cursor: Optional[str]) -> bytes:
+    """
+    Упаковать страницу: курсор следующей страницы и тело ответа.
+    Курсор - base64url, перевода строки в нём не бывает.
+    """
+    return (next_cursor or "").encode() + b"\n" + body
+
+
+def unpack_page(value: bytes) -> Tuple[bytes, Optional[str]]:
+    cursor, body = value.split(b"\n", 1)
+    return body, cursor.decode() or None
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def bump_catalog_version() -> None:
+    """
+    Сбросить кэш каталога из синхронного кода (скрипты импорта).
+    """
+    catalog_cache.bump_version_sync()
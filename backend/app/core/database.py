@@ -1,10 +1,42 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from .config import settings
+from .instrumentation import TimedAsyncQueuePool, TimedQueuePool, instrument_engine, register_pool_metrics
+
+
+def engine_options(url, poolclass) -> dict:
+    """
+    Параметры пула и statement_timeout из настроек для движка PostgreSQL.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "postgresql":
+        return {}
+    options = {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout:
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
 
 # Создаем движок SQLAlchemy
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, TimedQueuePool))
 
 # Создаем сессию
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,4 +50,162 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+# Асинхронный доступ к БД.
+#
+# Роутеры работают с AsyncSession через await. Настройка DB_ENGINE_MODE
+# выбирает, что стоит за ней:
+#   async - AsyncEngine на asyncpg, запросы не блокируют event loop;
+#   sync  - обычная Session на psycopg2, каждый вызов выполняется в пуле потоков
+#           (ThreadedSession). Режим оставлен для сравнения пропускной способности.
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_url(url: str):
+    """
+    URL синхронного драйвера -> URL соответствующего асинхронного драйвера.
+    """
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+class ThreadedSession:
+    """
+    Обёртка над синхронной Session с интерфейсом AsyncSession.
+
+    Каждая операция с БД выполняется в пуле потоков, результаты запросов
+    загружаются полностью до возврата в event loop.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def get_bind(self, *args, **kwargs):
+        return self.sync_session.get_bind(*args, **kwargs)
+
+    @property
+    def bind(self):
+        return self.sync_session.get_bind()
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    def _execute(self, statement, params=None, **kwargs):
+        result = self.sync_session.execute(statement, params, **kwargs)
+        # DML без RETURNING (в том числе ORM bulk INSERT) строк не возвращает
+        if not getattr(result._metadata, "returns_rows", True):
+            return result
+        return result.freeze()()
+
+    async def execute(self, statement, params=None, **kwargs):
+        return await run_in_threadpool(self._execute, statement, params, **kwargs)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalar()
+
+    async def scalars(self, statement, params=None, **kwargs):
+        result = await self.execute(statement, params, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def delete(self, instance) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self, objects=None) -> None:
+        await run_in_threadpool(self.sync_session.flush, objects)
+
+    async def refresh(self, instance, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+if settings.DB_ENGINE_MODE == "async":
+    async_url = get_async_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(async_url, **engine_options(async_url, TimedAsyncQueuePool))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    ThreadedSessionLocal = None
+elif settings.DB_ENGINE_MODE == "sync":
+    async_engine = None
+    AsyncSessionLocal = None
+    ThreadedSessionLocal = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+else:
+    raise ValueError(f"Неизвестный DB_ENGINE_MODE '{settings.DB_ENGINE_MODE}', ожидается async или sync")
+
+if settings.SQL_INSTRUMENTATION:
+    # Счётчики запросов и время БД для Server-Timing и /metrics
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+
+# Занятость пулов в /metrics
+register_pool_metrics(engine, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+if async_engine is not None:
+    register_pool_metrics(async_engine.sync_engine, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+
+
+@asynccontextmanager
+async def async_session_scope():
+    """
+    Асинхронная сессия для кода вне запросов (фоновые задачи).
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadedSession(ThreadedSessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+
+# Функция-зависимость для получения асинхронной сессии базы данных
+async def get_async_db():
+    async with async_session_scope() as db:
+        yield db
+
+
+def _sync_partitions(statement, size: int):
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=size).execute(statement)
+        for partition in result.partitions():
+            yield partition
+
+
+async def stream_partitions(statement, size: int = 1000) -> AsyncIterator[List]:
+    """
+    Прочитать результат запроса серверным курсором пачками по size строк.
+
+    Открывает собственное соединение на время чтения, в памяти находится
+    не больше одной пачки. В режиме sync чтение идёт в пуле потоков.
+    """
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            result = await conn.stream(statement.execution_options(yield_per=size))
+            async for partition in result.partitions():
+                yield partition
+    else:
+        async for partition in iterate_in_threadpool(_sync_partitions(statement, size)):
+            yield partition
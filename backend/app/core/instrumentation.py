@@ -0,0 +1,289 @@
+"""
+Инструментирование SQL на уровне запроса.
+
+События движка before_cursor_execute/after_cursor_execute измеряют каждый
+SQL-запрос. Middleware заводит для HTTP-запроса RequestSQLStats в
+contextvar, куда попадают все запросы к БД, выполненные при его обработке
+(в том числе из пула потоков и из greenlet'ов asyncpg - контекст
+копируется). По итогам запроса:
+
+- в ответ добавляется заголовок Server-Timing (db, db-slowest, db-pool, app);
+- обновляются гистограммы /metrics по маршруту;
+- если запрос одной формы повторился больше SQL_REPEATED_STATEMENT_THRESHOLD
+  раз, пишется предупреждение о вероятном N+1.
+
+Фоновые задачи копируют contextvar создавшего их запроса. Чтобы их
+запросы не засчитывались запросу, который уже ответил, задачи создаются
+через create_untracked_task, а фоновая работа внутри запроса
+(BackgroundTasks) выполняется в блоке untracked_sql. После подведения
+итогов запроса статистика больше ничего не учитывает.
+
+Пулы соединений движков создаются классами TimedQueuePool и
+TimedAsyncQueuePool: они измеряют ожидание свободного соединения, а
+register_pool_metrics отдаёт в /metrics текущую занятость пула.
+"""
+import asyncio
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Coroutine, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.datastructures import MutableHeaders
+
+from app.core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+db_query_duration = histogram(
+    "soulsync_db_query_duration_seconds",
+    "Время выполнения SQL-запросов",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+request_duration = histogram(
+    "soulsync_http_request_duration_seconds",
+    "Время обработки HTTP-запросов по маршрутам",
+    ("method", "route"),
+)
+request_db_queries = histogram(
+    "soulsync_http_request_db_queries",
+    "Количество SQL-запросов на HTTP-запрос",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+request_db_seconds = histogram(
+    "soulsync_http_request_db_seconds",
+    "Суммарное время SQL-запросов на HTTP-запрос",
+    ("method", "route"),
+)
+repeated_statements = counter(
+    "soulsync_db_repeated_statements_total",
+    "HTTP-запросы, в которых запрос одной формы повторился больше порога (вероятный N+1)",
+    ("method", "route"),
+)
+pool_connections = gauge(
+    "soulsync_db_pool_connections",
+    "Соединения пула по состояниям: checked_out, idle, overflow",
+    ("pool", "state"),
+)
+pool_capacity = gauge(
+    "soulsync_db_pool_capacity",
+    "Максимум соединений пула (pool_size + max_overflow)",
+    ("pool",),
+)
+pool_acquire_duration = histogram(
+    "soulsync_db_pool_acquire_seconds",
+    "Время получения соединения из пула (включая открытие нового)",
+    ("pool",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+pool_timeouts = counter(
+    "soulsync_db_pool_timeouts_total",
+    "Запросы соединения, не дождавшиеся его за pool_timeout",
+    ("pool",),
+)
+
+# Список параметров IN (...) разной длины приводится к одной форме
+_PARAM_LIST = re.compile(r"(%\(\w+\)s|\$\d+|\?)(\s*,\s*(%\(\w+\)s|\$\d+|\?))+")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAM_LIST.sub("?, ...", _SPACES.sub(" ", statement).strip())
+
+
+class RequestSQLStats:
+    """
+    SQL-запросы одного HTTP-запроса.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Dict[str, int] = {}
+        self.pool_wait = 0.0
+        self.closed = False
+
+    def record(self, statement: str, elapsed: float) -> None:
+        if self.closed:
+            return
+        self.queries += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        return [(shape, count) for shape, count in self.shapes.items() if count > threshold]
+
+    def server_timing(self, total: float) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries", '
+            f"db-slowest;dur={self.slowest_time * 1000:.2f}, "
+            f"db-pool;dur={self.pool_wait * 1000:.2f}, "
+            f"app;dur={total * 1000:.2f}"
+        )
+
+
+_current_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def current_sql_stats() -> Optional[RequestSQLStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def untracked_sql():
+    """
+    Запросы внутри блока и задачи, созданные в нём, не учитываются в
+    статистике текущего HTTP-запроса.
+    """
+    token = _current_stats.set(None)
+    try:
+        yield
+    finally:
+        _current_stats.reset(token)
+
+
+def create_untracked_task(coro: Coroutine) -> asyncio.Task:
+    """
+    Фоновая задача вне статистики SQL HTTP-запроса, из которого она создана.
+    """
+    with untracked_sql():
+        return asyncio.get_running_loop().create_task(coro)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_query_duration.observe(elapsed)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Подключить измерение запросов к синхронному движку
+    (для AsyncEngine - к его sync_engine).
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class _TimedCheckout:
+    """
+    Примесь к пулу: время ожидания соединения в pool_acquire_duration и
+    в статистике текущего HTTP-запроса. pool_name задаётся подклассом,
+    поэтому сохраняется и при пересоздании пула (engine.dispose()).
+    """
+    pool_name = ""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            pool_timeouts.inc(pool=self.pool_name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            pool_acquire_duration.observe(elapsed, pool=self.pool_name)
+            stats = _current_stats.get()
+            if stats is not None and not stats.closed:
+                stats.pool_wait += elapsed
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pool_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pool_name = "async"
+
+
+def register_pool_metrics(engine, capacity: int) -> None:
+    """
+    Отдавать в /metrics занятость пула движка (для AsyncEngine - sync_engine).
+    Пул читается из engine.pool при сборе, поэтому dispose() не мешает.
+    """
+    if not isinstance(engine.pool, QueuePool):
+        return
+    name = getattr(engine.pool, "pool_name", "") or engine.dialect.driver
+    pool_connections.set_function(lambda: engine.pool.checkedout(), pool=name, state="checked_out")
+    pool_connections.set_function(lambda: engine.pool.checkedin(), pool=name, state="idle")
+    pool_connections.set_function(lambda: max(engine.pool.overflow(), 0), pool=name, state="overflow")
+    pool_capacity.set(capacity, pool=name)
+
+
+class SQLInstrumentationMiddleware:
+    """
+    ASGI middleware: статистика SQL по HTTP-запросу, Server-Timing и метрики.
+    """
+
+    def __init__(self, app, repeated_threshold: int = 10):
+        self.app = app
+        self.repeated_threshold = repeated_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # Запросы, выполненные после начала ответа (потоковые ответы),
+                # в заголовок не попадут, но попадут в метрики
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                headers.append("Server-Timing", stats.server_timing(time.perf_counter() - started))
+                message["headers"] = headers.raw
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            stats.closed = True
+            self._observe(scope, stats, time.perf_counter() - started)
+
+    def _observe(self, scope, stats: RequestSQLStats, elapsed: float) -> None:
+        method = scope.get("method", "")
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        request_duration.observe(elapsed, method=method, route=route)
+        request_db_queries.observe(stats.queries, method=method, route=route)
+        request_db_seconds.observe(stats.db_time, method=method, route=route)
+
+        repeated = stats.repeated(self.repeated_threshold)
+        if repeated:
+            repeated_statements.inc(method=method, route=route)
+            for shape, count in repeated:
+                logger.warning(
+                    "Вероятный N+1: запрос повторился %d раз за %s %s: %s",
+                    count, method, route, shape[:300],
+                )
+        if stats.queries:
+            logger.debug(
+                "%s %s: %d SQL-запросов, %.1f мс в БД, самый долгий %.1f мс: %s",
+                method, route, stats.queries, stats.db_time * 1000,
+                stats.slowest_time * 1000, (stats.slowest_statement or "")[:300],
+            )
@@ -0,0 +1,245 @@
+"""
+Денормализованный счётчик tracks.like_count с отложенной записью.
+
+create_like и delete_like не обновляют строку трека в своей транзакции:
+популярный трек стал бы точкой конкуренции за блокировку. Изменения
+копятся в памяти процесса (трек -> дельта) и раз в LIKE_COUNT_FLUSH_SECONDS
+записываются одним запросом
+
+    UPDATE tracks SET like_count = like_count + v.delta
+    FROM (VALUES ...) AS v(id, delta) WHERE tracks.id = v.id
+
+Счётчик может отставать на период сброса, а при падении процесса -
+потерять несброшенные дельты. Расхождение исправляет сверка с likes раз
+в LIKE_COUNT_RECONCILE_SECONDS. Сверка не трогает треки, лайки которых
+менялись во время сверки (их дельты ещё в пути), и обновляет счётчик,
+только если он не изменился с момента чтения. Дельты, несброшенные в
+других воркерах, сверка не видит: возникшее из-за них расхождение
+исправит следующая сверка.
+
+Версию кэша каталога сброс не увеличивает: иначе при постоянном потоке
+лайков кэш сбрасывался бы каждую секунду. /tracks/popular кэшируется на
+короткий POPULAR_CACHE_TTL_SECONDS, в остальных ответах каталога
+like_count может отставать на CATALOG_CACHE_TTL_SECONDS.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.config import settings
+from app.core.database import async_session_scope
+from app.core.instrumentation import create_untracked_task
+from app.core.metrics import counter, gauge, histogram
+from app.models.like import Like
+from app.models.track import Track
+
+logger = logging.getLogger(__name__)
+
+like_count_pending = gauge(
+    "soulsync_like_count_pending_tracks",
+    "Треки с несброшенными изменениями like_count",
+)
+like_count_flush_duration = histogram(
+    "soulsync_like_count_flush_seconds",
+    "Время сброса изменений like_count в БД",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+like_count_corrected = counter(
+    "soulsync_like_count_corrected_total",
+    "Треки, счётчик лайков которых исправлен сверкой",
+)
+
+
+class LikeCounter:
+    """
+    Буфер дельт like_count и фоновая задача сброса и сверки.
+    """
+
+    def __init__(
+        self,
+        flush_seconds: float = 1.0,
+        max_pending: int = 10000,
+        reconcile_seconds: float = 3600,
+        batch_size: int = 1000,
+    ):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.reconcile_seconds = reconcile_seconds
+        self.batch_size = batch_size
+        self._deltas: Dict[uuid.UUID, int] = {}
+        # Треки, изменённые во время сверки (None - сверка не идёт)
+        self._touched: Optional[Set[uuid.UUID]] = None
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reconciled_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._deltas)
+
+    def add(self, track_id: uuid.UUID, delta: int) -> None:
+        """
+        Учесть лайк (+1) или снятие лайка (-1) после коммита транзакции.
+        """
+        with self._lock:
+            total = self._deltas.get(track_id, 0) + delta
+            if total:
+                self._deltas[track_id] = total
+            else:
+                self._deltas.pop(track_id, None)
+            if self._touched is not None:
+                self._touched.add(track_id)
+            overflow = len(self._deltas) >= self.max_pending
+        if overflow and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _take(self, start_reconcile: bool = False) -> Dict[uuid.UUID, int]:
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            if start_reconcile:
+                self._touched = set()
+            return deltas
+
+    def _restore(self, deltas: Dict[uuid.UUID, int]) -> None:
+        with self._lock:
+            for track_id, delta in deltas.items():
+                self._deltas[track_id] = self._deltas.get(track_id, 0) + delta
+
+    async def _apply(self, deltas: Dict[uuid.UUID, int]) -> None:
+        items = sorted(deltas.items())  # один порядок блокировок строк во всех воркерах
+        async with async_session_scope() as db:
+            for start in range(0, len(items), self.batch_size):
+                batch = values(
+                    column("id", UUID(as_uuid=True)), column("delta", Integer), name="v"
+                ).data(items[start:start + self.batch_size])
+                await db.execute(
+                    update(Track)
+                    .where(Track.id == batch.c.id)
+                    # Счётчик не меняет трек для выгрузки /tracks/export
+                    .values(like_count=Track.like_count + batch.c.delta, updated_at=Track.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+    async def flush(self, start_reconcile: bool = False) -> None:
+        """
+        Записать накопленные дельты; при ошибке вернуть их в буфер.
+        """
+        async with self._flush_lock:
+            deltas = self._take(start_reconcile)
+            if not deltas:
+                return
+            started = time.perf_counter()
+            try:
+                await self._apply(deltas)
+            except Exception:
+                self._restore(deltas)
+                raise
+            like_count_flush_duration.observe(time.perf_counter() - started)
+
+    async def _drift(self) -> List[Tuple[uuid.UUID, int, int]]:
+        counts = (
+            select(Like.track_id, func.count().label("likes"))
+            .where(Like.track_id.isnot(None))
+            .group_by(Like.track_id)
+            .subquery()
+        )
+        actual = func.coalesce(counts.c.likes, 0)
+        async with async_session_scope() as db:
+            result = await db.execute(
+                select(Track.id, Track.like_count, actual)
+                .outerjoin(counts, counts.c.track_id == Track.id)
+                .where(Track.like_count != actual)
+            )
+            return [tuple(row) for row in result]
+
+    async def reconcile(self) -> int:
+        """
+        Сверить like_count с таблицей likes. Возвращает число исправленных треков.
+        """
+        try:
+            await self.flush(start_reconcile=True)
+            drift = await self._drift()
+        except Exception:
+            with self._lock:
+                self._touched = None
+            raise
+        with self._lock:
+            touched, self._touched = self._touched or set(), None
+        drift = [(track_id, seen, likes) for track_id, seen, likes in drift if track_id not in touched]
+
+        corrected = 0
+        async with async_session_scope() as db:
+            for start in range(0, len(drift), self.batch_size):
+                batch = values(
+                    column("id", UUID(as_uuid=True)), column("seen", Integer), column("likes", Integer), name="v"
+                ).data(drift[start:start + self.batch_size])
+                result = await db.execute(
+                    update(Track)
+                    .where(Track.id == batch.c.id, Track.like_count == batch.c.seen)
+                    .values(like_count=batch.c.likes, updated_at=Track.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+                corrected += result.rowcount
+            await db.commit()
+        like_count_corrected.inc(corrected)
+        return corrected
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if self.reconcile_seconds and time.monotonic() - self._reconciled_at >= self.reconcile_seconds:
+                    self._reconciled_at = time.monotonic()
+                    corrected = await self.reconcile()
+                    if corrected:
+                        logger.warning("Сверка like_count исправила %d треков", corrected)
+                else:
+                    await self.flush()
+            except Exception:
+                logger.exception("Не удалось обновить счётчики лайков")
+
+    def start(self) -> None:
+        """
+        Запустить фоновый сброс, если он ещё не идёт.
+        """
+        if self._task is None or self._task.done():
+            self._flush_lock = asyncio.Lock()
+            self._task = create_untracked_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Остановить фоновую задачу и сбросить оставшиеся дельты.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Не удалось сбросить счётчики лайков при остановке")
+
+
+like_counter = LikeCounter(
+    flush_seconds=settings.LIKE_COUNT_FLUSH_SECONDS,
+    max_pending=settings.LIKE_COUNT_MAX_PENDING,
+    reconcile_seconds=settings.LIKE_COUNT_RECONCILE_SECONDS,
+)
+like_count_pending.set_function(lambda: len(like_counter))
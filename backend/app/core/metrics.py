@@ -0,0 +1,196 @@
+"""
+Метрики процесса в текстовом формате Prometheus (GET /metrics).
+
+Небольшая реализация без внешних зависимостей: счётчики, измерители
+и гистограммы с метками. Метрики регистрируются при импорте модулей, которые их
+обновляют, и отдаются все сразу функцией render_metrics().
+"""
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _format_labels(self, key: LabelValues, extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        escaped = (
+            f'{name}="{_escape(value)}"'
+            for name, value in pairs
+        )
+        return "{" + ",".join(escaped) + "}"
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            if not self.labelnames and not self._values:
+                return [(self.name, (), 0.0)]
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        for name, key, value in self.samples():
+            yield f"{name}{self._format_labels(key)} {value:g}"
+
+
+class Counter(Metric):
+    """
+    Монотонно растущий счётчик.
+    """
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """
+    Текущее значение; может задаваться функцией, вызываемой при сборе.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], float], **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._callbacks[key] = callback
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            callbacks = sorted(self._callbacks.items())
+        if callbacks:
+            return [(self.name, key, float(callback())) for key, callback in callbacks]
+        return super().samples()
+
+
+class Histogram(Metric):
+    """
+    Распределение наблюдений по корзинам (le) с суммой и количеством.
+    """
+    type_name = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> (счётчики по корзинам, сумма, количество)
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        with self._lock:
+            series = sorted((key, list(counts), total, count) for key, (counts, total, count) in self._series.items())
+        if not series and not self.labelnames:
+            series = [((), [0] * len(self.buckets), 0.0, 0)]
+        for key, counts, total, count in series:
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{self._format_labels(key, {'le': f'{bound:g}'})} {bucket_count}"
+            yield f"{self.name}_bucket{self._format_labels(key, {'le': '+Inf'})} {count}"
+            yield f"{self.name}_sum{self._format_labels(key)} {total:g}"
+            yield f"{self.name}_count{self._format_labels(key)} {count}"
+
+
+_registry: Dict[str, Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric: Metric) -> Metric:
+    with _registry_lock:
+        existing = _registry.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована с другим типом")
+            return existing
+        _registry[metric.name] = metric
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return _register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return _register(Gauge(name, documentation, labelnames))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Tuple[str, ...] = (),
+    buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS,
+) -> Histogram:
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render_metrics() -> str:
+    """
+    Все зарегистрированные метрики в текстовом формате Prometheus.
+    """
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
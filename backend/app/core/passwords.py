@@ -0,0 +1,128 @@
+"""
+Хеширование и проверка паролей (bcrypt) в отдельном ограниченном пуле.
+
+bcrypt нагружает CPU на сотни миллисекунд. Выполняясь в общем пуле потоков
+FastAPI, шторм логинов занимал бы потоки, которые нужны остальным
+эндпоинтам. Здесь для bcrypt свой пул из PASSWORD_HASH_WORKERS потоков
+(bcrypt отпускает GIL) или процессов (PASSWORD_HASH_EXECUTOR=process).
+Если задач в пуле больше PASSWORD_HASH_MAX_PENDING, новая сразу
+отклоняется с 503, а не встаёт в бесконечную очередь.
+
+Время выполнения и ожидания в очереди измеряется внутри воркера по
+time.monotonic, поэтому одинаково работает и для процессов.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+from app.core.security import get_password_hash, verify_password
+
+password_hash_duration = histogram(
+    "soulsync_password_hash_seconds",
+    "Время bcrypt-операции в пуле: hash или verify",
+    ("op",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+password_queue_wait = histogram(
+    "soulsync_password_hash_queue_seconds",
+    "Ожидание bcrypt-операции в очереди пула",
+    ("op",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+password_pending = gauge(
+    "soulsync_password_hash_pending",
+    "bcrypt-операции в пуле: выполняются и ждут очереди",
+)
+password_queue_depth = gauge(
+    "soulsync_password_hash_queue_depth",
+    "bcrypt-операции, ожидающие свободного воркера",
+)
+password_rejected = counter(
+    "soulsync_password_hash_rejected_total",
+    "bcrypt-операции, отклонённые из-за переполненной очереди",
+)
+
+OPERATIONS = {
+    "hash": get_password_hash,
+    "verify": verify_password,
+}
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+def _run(op: str, *args):
+    """
+    Выполняется в воркере пула: результат и моменты начала и конца.
+    """
+    started = time.monotonic()
+    result = OPERATIONS[op](*args)
+    return result, started, time.monotonic()
+
+
+def get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            if settings.PASSWORD_HASH_EXECUTOR == "process":
+                # spawn: fork процесса с event loop и потоками небезопасен
+                _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            elif settings.PASSWORD_HASH_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt")
+            else:
+                raise ValueError(
+                    f"Неизвестный PASSWORD_HASH_EXECUTOR '{settings.PASSWORD_HASH_EXECUTOR}', "
+                    "ожидается thread или process"
+                )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _submit(op: str, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        password_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, повторите запрос позже",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    submitted = time.monotonic()
+    try:
+        result, started, finished = await asyncio.get_running_loop().run_in_executor(
+            get_executor(), _run, op, *args
+        )
+    finally:
+        _pending -= 1
+    password_queue_wait.observe(max(started - submitted, 0.0), op=op)
+    password_hash_duration.observe(finished - started, op=op)
+    return result
+
+
+async def hash_password(password: str) -> str:
+    return await _submit("hash", password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await _submit("verify", plain_password, hashed_password)
+
+
+password_pending.set_function(lambda: _pending)
+password_queue_depth.set_function(lambda: max(_pending - settings.PASSWORD_HASH_WORKERS, 0))
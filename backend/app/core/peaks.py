@@ -0,0 +1,243 @@
+"""
+Фоновое построение пиков формы волны для GET /tracks/{id}/peaks.
+
+Раз в PEAKS_REFRESH_SECONDS (и сразу после загрузки аудио, wake())
+треки с audio_path просматриваются пачками по ключу. Треки, пики которых
+построены по текущей версии файла и с текущими уровнями, пропускаются по
+заголовку файла пиков без декодирования. Остальные декодируются и
+сворачиваются в пики в пуле из PEAKS_WORKERS процессов: декодирование и
+numpy не занимают event loop и GIL веб-процесса.
+
+Ошибка построения (битый файл, нет ffmpeg) запоминается по отпечатку
+исходного файла, и трек не повторяется, пока файл не изменится.
+
+Задача запускается в каждом воркере, но проход выполняет только один:
+на время прохода берётся advisory-блокировка PostgreSQL (LOCK_KEY) на
+отдельном соединении вне пула запросов. Остальные воркеры пропускают проход и пул
+процессов не создают; после wake() они повторяют попытку каждые
+BUSY_RETRY_SECONDS, чтобы загруженный файл не ждал следующего периода.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.pool import NullPool
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import async_session_scope
+from app.core.instrumentation import create_untracked_task
+from app.core.metrics import counter, histogram
+from app.models.track import Track
+from app.utils.media import resolve_media_path
+from app.utils.peaks import build_peaks, parse_resolutions, peaks_path, read_index
+
+logger = logging.getLogger(__name__)
+
+peaks_tracks = counter(
+    "soulsync_peaks_tracks_total",
+    "Треки, просмотренные построением пиков: built, skipped, failed",
+    ("result",),
+)
+peaks_refresh_duration = histogram(
+    "soulsync_peaks_refresh_seconds",
+    "Время прохода построения пиков по всем трекам с аудио",
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+Fingerprint = Tuple[int, int, int]
+
+# Ключ advisory-блокировки прохода: "SSPK", как magic файла пиков
+LOCK_KEY = 0x5353504B
+BUSY_RETRY_SECONDS = 5.0
+
+
+# Соединение блокировки держится весь проход (иногда минуты), поэтому
+# берётся не из пула запросов, а отдельным подключением без пула
+_lock_engine = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+
+
+@asynccontextmanager
+async def advisory_lock(key: int) -> AsyncIterator[bool]:
+    """
+    Сессионная advisory-блокировка на отдельном соединении вне пула:
+    True, если получена. Снимается закрытием соединения при выходе.
+    """
+    conn = await run_in_threadpool(_lock_engine.connect)
+    try:
+        locked = await run_in_threadpool(
+            lambda: conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})
+        )
+        yield locked
+    finally:
+        await run_in_threadpool(conn.close)
+
+
+class PeaksBuilder:
+    """
+    Поиск треков без актуальных пиков и их построение в пуле процессов.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float = 300,
+        workers: int = 2,
+        resolutions: Sequence[int] = (256, 1024, 4096, 16384),
+        sample_rate: int = 22050,
+        ffmpeg: str = "ffmpeg",
+        batch_size: int = 500,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.workers = workers
+        self.resolutions = list(resolutions)
+        self.sample_rate = sample_rate
+        self.ffmpeg = ffmpeg
+        self.batch_size = batch_size
+        self._failed: Dict[uuid.UUID, Fingerprint] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: fork процесса с event loop и потоками небезопасен
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _stale(self, rows) -> Tuple[List[Tuple[uuid.UUID, str, str, Fingerprint]], int]:
+        """
+        Треки, пики которых нужно построить, и число пропущенных.
+        """
+        jobs, skipped = [], 0
+        for track_id, audio_path in rows:
+            source = resolve_media_path(settings.UPLOAD_DIR, audio_path)
+            try:
+                stat = os.stat(source) if source is not None else None
+            except FileNotFoundError:
+                stat = None
+            if stat is None:
+                skipped += 1
+                continue
+            fingerprint = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            target = peaks_path(settings.UPLOAD_DIR, track_id)
+            index = read_index(target)
+            if (index is not None and index.is_current(stat, self.resolutions)) or self._failed.get(track_id) == fingerprint:
+                skipped += 1
+                continue
+            jobs.append((track_id, str(source), str(target), fingerprint))
+        return jobs, skipped
+
+    async def _build(self, loop, job) -> str:
+        track_id, source, target, fingerprint = job
+        try:
+            built = await loop.run_in_executor(
+                self._get_executor(), build_peaks, source, target, self.resolutions, self.sample_rate, self.ffmpeg
+            )
+        except Exception as e:
+            self._failed[track_id] = fingerprint
+            logger.warning("Не удалось построить пики трека %s: %s", track_id, e)
+            return "failed"
+        self._failed.pop(track_id, None)
+        return "built" if built else "skipped"
+
+    async def refresh(self) -> Optional[Dict[str, int]]:
+        """
+        Построить недостающие и устаревшие пики. Возвращает число треков по
+        результатам или None, если проход уже выполняет другой воркер.
+        """
+        async with advisory_lock(LOCK_KEY) as locked:
+            if not locked:
+                return None
+            return await self._refresh()
+
+    async def _refresh(self) -> Dict[str, int]:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        results: Counter = Counter()
+        last_id = None
+        while True:
+            statement = select(Track.id, Track.audio_path).where(Track.audio_path.isnot(None))
+            if last_id is not None:
+                statement = statement.where(Track.id > last_id)
+            # Короткая сессия на пачку: соединение не держится, пока идёт декодирование
+            async with async_session_scope() as db:
+                rows = (await db.execute(statement.order_by(Track.id).limit(self.batch_size))).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            jobs, skipped = await loop.run_in_executor(None, self._stale, rows)
+            results["skipped"] += skipped
+            for result in await asyncio.gather(*(self._build(loop, job) for job in jobs)):
+                results[result] += 1
+        for result, count in results.items():
+            peaks_tracks.inc(count, result=result)
+        peaks_refresh_duration.observe(time.perf_counter() - started)
+        return dict(results)
+
+    def wake(self) -> None:
+        """
+        Запустить проход раньше срока (после загрузки аудио трека).
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        woken = False
+        while True:
+            self._wakeup.clear()
+            timeout = self.refresh_seconds
+            try:
+                results = await self.refresh()
+                if results is None:
+                    if woken:
+                        # Проход другого воркера мог начаться до загрузки файла
+                        timeout = min(timeout, BUSY_RETRY_SECONDS)
+                else:
+                    woken = False
+                    if results.get("built") or results.get("failed"):
+                        logger.info("Пики треков: %s", results)
+            except Exception:
+                logger.exception("Не удалось обновить пики треков")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+                woken = True
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """
+        Запустить фоновое построение, если оно включено и ещё не идёт.
+        """
+        if self.refresh_seconds > 0 and (self._task is None or self._task.done()):
+            self._task = create_untracked_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+peaks_builder = PeaksBuilder(
+    refresh_seconds=settings.PEAKS_REFRESH_SECONDS,
+    workers=settings.PEAKS_WORKERS,
+    resolutions=parse_resolutions(settings.PEAKS_RESOLUTIONS),
+    sample_rate=settings.PEAKS_SAMPLE_RATE,
+    ffmpeg=settings.PEAKS_FFMPEG,
+)
@@ -0,0 +1,391 @@
+"""
+Рекомендации для потока (GET /flow/next) по совместным лайкам.
+
+Модель - разреженные матрицы SciPy в памяти процесса:
+
+- likes: пользователи x треки, 1 - лайк;
+- cooccurrence = likes^T likes: сколько пользователей лайкнули оба трека,
+  на диагонали - популярность трека.
+
+Сходство треков i и j - косинусная мера C[i, j] / sqrt(C[i, i] * C[j, j]).
+Кандидаты для пользователя - сумма строк сходства его последних лайков
+(seed) с весами decay^номер, выдача - взвешенная случайная выборка из
+лучших кандидатов, чтобы поток не повторялся от сессии к сессии.
+
+Модель перестраивается в фоне: каждые FLOW_REFRESH_SECONDS дочитываются
+новые лайки и к C прибавляется только вклад затронутых пользователей,
+полная перестройка (учитывает удалённые лайки и FLOW_MAX_USER_LIKES) - раз
+в FLOW_FULL_REBUILD_SECONDS. Каждая перестройка создаёт новый снимок
+FlowModel, запросы читают снимок без блокировок.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, select
+
+from app.core.cache import CacheBackend, create_backend
+from app.core.config import settings
+from app.core.instrumentation import create_untracked_task
+from app.core.metrics import counter, gauge, histogram
+from app.models.like import Like
+
+logger = logging.getLogger(__name__)
+
+flow_model_size = gauge(
+    "soulsync_flow_model_size",
+    "Размер модели потока: items, users, nnz (ненулевые элементы совместных лайков)",
+    ("dimension",),
+)
+flow_model_refresh_duration = histogram(
+    "soulsync_flow_model_refresh_seconds",
+    "Время перестройки модели потока: full или incremental",
+    ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+flow_tracks = counter(
+    "soulsync_flow_tracks_total",
+    "Треки, выданные /flow/next: model - по рекомендациям, random - добор случайными",
+    ("source",),
+)
+
+# Лайки, сделанные в транзакциях, которые закоммитились позже более новых,
+# получают created_at меньше водяного знака; перечитываем такой запас
+WATERMARK_OVERLAP = timedelta(minutes=5)
+# Сколько лучших кандидатов участвуют в случайной выборке на один трек выдачи
+CANDIDATE_FACTOR = 4
+
+
+@dataclass(frozen=True)
+class FlowModel:
+    item_ids: List[uuid.UUID]
+    item_index: Dict[uuid.UUID, int]
+    user_index: Dict[uuid.UUID, int]
+    likes: sparse.csr_matrix
+    cooccurrence: sparse.csr_matrix
+    popularity: np.ndarray
+    watermark: Optional[datetime]
+
+
+def _binary_matrix(rows: array, cols: array, shape: Tuple[int, int]) -> sparse.csr_matrix:
+    matrix = sparse.csr_matrix(
+        (
+            np.ones(len(rows), dtype=np.float32),
+            (np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32)),
+        ),
+        shape=shape,
+    )
+    matrix.data[:] = 1
+    return matrix
+
+
+def _grow(matrix: sparse.csr_matrix, shape: Tuple[int, int]) -> sparse.csr_matrix:
+    """
+    Та же матрица с добавленными пустыми строками и столбцами (без копирования данных).
+    """
+    if matrix.shape == shape:
+        return matrix
+    extra = np.full(shape[0] - matrix.shape[0], matrix.indptr[-1], dtype=matrix.indptr.dtype)
+    return sparse.csr_matrix((matrix.data, matrix.indices, np.concatenate([matrix.indptr, extra])), shape=shape)
+
+
+def _position(index: Dict[uuid.UUID, int], key: uuid.UUID, keys: Optional[List[uuid.UUID]] = None) -> int:
+    position = index.get(key)
+    if position is None:
+        position = index[key] = len(index)
+        if keys is not None:
+            keys.append(key)
+    return position
+
+
+class FlowRecommender:
+    def __init__(
+        self,
+        refresh_seconds: float = 60,
+        full_rebuild_seconds: float = 3600,
+        max_user_likes: int = 500,
+        seed_decay: float = 0.9,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self.max_user_likes = max_user_likes
+        self.seed_decay = seed_decay
+        self.model: Optional[FlowModel] = None
+        self._full_built_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._rng = np.random.default_rng()
+
+    def _like_partitions(self, conn, since: Optional[datetime] = None) -> Iterable[List]:
+        pairs = (Like.user_id.isnot(None), Like.track_id.isnot(None))
+        if since is None:
+            # Только последние max_user_likes лайков каждого пользователя
+            ranked = (
+                select(
+                    Like.user_id,
+                    Like.track_id,
+                    Like.created_at,
+                    func.row_number()
+                    .over(partition_by=Like.user_id, order_by=(Like.created_at.desc(), Like.id.desc()))
+                    .label("rank"),
+                )
+                .where(*pairs)
+                .subquery()
+            )
+            statement = select(ranked.c.user_id, ranked.c.track_id, ranked.c.created_at).where(
+                ranked.c.rank <= self.max_user_likes
+            )
+        else:
+            statement = select(Like.user_id, Like.track_id, Like.created_at).where(*pairs, Like.created_at > since)
+        result = conn.execution_options(stream_results=True, yield_per=100_000).execute(statement)
+        yield from result.partitions()
+
+    def build(self) -> FlowModel:
+        """
+        Полная перестройка модели по таблице likes.
+        """
+        from app.core.database import engine
+
+        item_ids: List[uuid.UUID] = []
+        item_index: Dict[uuid.UUID, int] = {}
+        user_index: Dict[uuid.UUID, int] = {}
+        rows, cols = array("i"), array("i")
+        watermark = None
+        with engine.connect() as conn:
+            for partition in self._like_partitions(conn):
+                for user_id, track_id, created_at in partition:
+                    rows.append(_position(user_index, user_id))
+                    cols.append(_position(item_index, track_id, item_ids))
+                    if created_at is not None and (watermark is None or created_at > watermark):
+                        watermark = created_at
+
+        likes = _binary_matrix(rows, cols, (len(user_index), len(item_index)))
+        cooccurrence = (likes.T @ likes).tocsr()
+        return FlowModel(
+            item_ids=item_ids,
+            item_index=item_index,
+            user_index=user_index,
+            likes=likes,
+            cooccurrence=cooccurrence,
+            popularity=cooccurrence.diagonal(),
+            watermark=watermark,
+        )
+
+    def update(self, model: FlowModel) -> FlowModel:
+        """
+        Дочитать лайки новее водяного знака и пересчитать вклад
+        затронутых пользователей: C' = C + X_U^T D + D^T X_U + D^T D.
+        """
+        from app.core.database import engine
+
+        if model.watermark is None:
+            return self.build()
+        with engine.connect() as conn:
+            fresh = [row for partition in self._like_partitions(conn, model.watermark - WATERMARK_OVERLAP)
+                     for row in partition]
+        if not fresh:
+            return model
+
+        known_users, known_items = model.likes.shape
+        item_ids, item_index, user_index = model.item_ids, model.item_index, model.user_index
+        if any(row[0] not in user_index or row[1] not in item_index for row in fresh):
+            # Новые пользователи или треки: словари снимка не меняем, копируем
+            item_ids, item_index, user_index = list(item_ids), dict(item_index), dict(user_index)
+
+        rows, cols = array("i"), array("i")
+        watermark = model.watermark
+        for user_id, track_id, created_at in fresh:
+            rows.append(_position(user_index, user_id))
+            cols.append(_position(item_index, track_id, item_ids))
+            if created_at is not None and created_at > watermark:
+                watermark = created_at
+
+        # Лайки из запаса перед водяным знаком уже есть в модели
+        rows_np, cols_np = np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32)
+        old = (rows_np < known_users) & (cols_np < known_items)
+        is_new = np.ones(len(rows_np), dtype=bool)
+        if old.any():
+            is_new[old] = np.asarray(model.likes[rows_np[old], cols_np[old]]).ravel() == 0
+        if not is_new.any():
+            return FlowModel(**{**model.__dict__, "watermark": watermark})
+        rows, cols = array("i", rows_np[is_new]), array("i", cols_np[is_new])
+
+        shape = (len(user_index), len(item_index))
+        previous = _grow(model.likes, shape)
+        added = _binary_matrix(rows, cols, shape)
+        touched = np.unique(np.frombuffer(rows, dtype=np.int32))
+        before, delta = previous[touched], added[touched]
+        cross = (before.T @ delta).tocsr()
+        cooccurrence = _grow(model.cooccurrence, (shape[1], shape[1])) + cross + cross.T + (delta.T @ delta)
+        cooccurrence = cooccurrence.tocsr()
+        return FlowModel(
+            item_ids=item_ids,
+            item_index=item_index,
+            user_index=user_index,
+            likes=(previous + added).tocsr(),
+            cooccurrence=cooccurrence,
+            popularity=cooccurrence.diagonal(),
+            watermark=watermark,
+        )
+
+    def refresh(self) -> None:
+        """
+        Перестроить модель: полностью, если пора, иначе инкрементально.
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            full = self.model is None or time.monotonic() - self._full_built_at >= self.full_rebuild_seconds
+            if full:
+                self.model = self.build()
+                self._full_built_at = time.monotonic()
+            else:
+                self.model = self.update(self.model)
+            flow_model_refresh_duration.observe(
+                time.perf_counter() - started, kind="full" if full else "incremental"
+            )
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Отдельный поток: numpy не блокирует event loop и не занимает пул FastAPI
+                await loop.run_in_executor(None, self.refresh)
+            except Exception:
+                logger.exception("Не удалось обновить модель потока")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        """
+        Запустить фоновую перестройку, если она ещё не идёт.
+        """
+        if self._task is None or self._task.done():
+            self._task = create_untracked_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def recommend(
+        self,
+        user_id: uuid.UUID,
+        seeds: List[uuid.UUID],
+        exclude: Set[uuid.UUID],
+        limit: int,
+    ) -> List[uuid.UUID]:
+        """
+        До limit треков, похожих на seeds (последние лайки, новые первыми),
+        кроме лайкнутых пользователем и exclude.
+        """
+        model = self.model
+        if model is None:
+            return []
+        seed_positions = [model.item_index[s] for s in seeds if s in model.item_index]
+        if not seed_positions:
+            return []
+
+        popularity = model.popularity
+        weights = self.seed_decay ** np.arange(len(seed_positions)) / np.sqrt(popularity[seed_positions])
+        scores = sparse.csr_matrix(weights.reshape(1, -1)) @ model.cooccurrence[seed_positions]
+        candidates = scores.indices
+        values = scores.data / np.sqrt(popularity[candidates])
+
+        excluded = set(seed_positions)
+        user = model.user_index.get(user_id)
+        if user is not None:
+            excluded.update(model.likes[user].indices.tolist())
+        excluded.update(model.item_index[t] for t in exclude if t in model.item_index)
+        keep = ~np.isin(candidates, np.fromiter(excluded, dtype=np.int64, count=len(excluded)))
+        candidates, values = candidates[keep], values[keep]
+        if not len(candidates):
+            return []
+
+        pool = min(len(candidates), limit * CANDIDATE_FACTOR)
+        best = np.argpartition(-values, pool - 1)[:pool]
+        picked = self._rng.choice(best, size=min(limit, pool), replace=False, p=values[best] / values[best].sum())
+        picked = picked[np.argsort(-values[picked])]
+        return [model.item_ids[candidates[i]] for i in picked]
+
+
+class FlowSessions:
+    """
+    Треки, уже выданные в сессии потока: (пользователь, сессия) -> ID
+    (подряд по 16 байт), с TTL от последней выдачи.
+
+    Хранятся в бэкенде кэша (FLOW_SESSION_BACKEND): с redis сессия общая
+    для всех воркеров, с memory - LRU в памяти процесса, и при нескольких
+    воркерах следующий запрос сессии, попавший в другой воркер, может
+    повторить треки. Ошибка бэкенда не ломает поток: сессия считается пустой.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id: uuid.UUID, session: str) -> str:
+        return f"flow:{user_id}:{session}"
+
+    async def _load(self, key: str) -> bytes:
+        try:
+            return await self.backend.get(key) or b""
+        except Exception:
+            logger.exception("Ошибка чтения сессии потока")
+            return b""
+
+    async def get(self, user_id: uuid.UUID, session: str) -> Set[uuid.UUID]:
+        if self.backend is None:
+            return set()
+        value = await self._load(self._key(user_id, session))
+        return {uuid.UUID(bytes=value[i:i + 16]) for i in range(0, len(value) - len(value) % 16, 16)}
+
+    async def add(self, user_id: uuid.UUID, session: str, track_ids: Iterable[uuid.UUID]) -> None:
+        if self.backend is None:
+            return
+        key = self._key(user_id, session)
+        # Чтение и запись не атомарны: при параллельных запросах одной
+        # сессии часть выданных ID может потеряться (возможен повтор)
+        value = await self._load(key) + b"".join(track_id.bytes for track_id in track_ids)
+        try:
+            await self.backend.set(key, value, ex=self.ttl)
+        except Exception:
+            logger.exception("Ошибка записи сессии потока")
+
+
+flow_recommender = FlowRecommender(
+    refresh_seconds=settings.FLOW_REFRESH_SECONDS,
+    full_rebuild_seconds=settings.FLOW_FULL_REBUILD_SECONDS,
+    max_user_likes=settings.FLOW_MAX_USER_LIKES,
+    seed_decay=settings.FLOW_SEED_DECAY,
+)
+flow_sessions = FlowSessions(
+    create_backend(settings.FLOW_SESSION_BACKEND, maxsize=settings.FLOW_SESSION_MAXSIZE),
+    ttl=settings.FLOW_SESSION_TTL_SECONDS,
+)
+
+
+def _model_size(dimension: str) -> float:
+    model = flow_recommender.model
+    if model is None:
+        return 0
+    return {
+        "items": len(model.item_ids),
+        "users": len(model.user_index),
+        "nnz": model.cooccurrence.nnz,
+    }[dimension]
+
+
+for _dimension in ("items", "users", "nnz"):
+    flow_model_size.set_function(lambda d=_dimension: _model_size(d), dimension=_dimension)
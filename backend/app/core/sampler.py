@@ -0,0 +1,471 @@
+"""
+Стратегии случайной выборки треков для /tracks/random.
+
+ORDER BY random() заставляет PostgreSQL читать и сортировать всю таблицу
+tracks на каждый запрос. Стратегии ниже выбирают limit треков за время,
+зависящее от limit, а не от размера каталога. Нужная стратегия задаётся
+настройкой RANDOM_SAMPLER.
+
+Режим /tracks/random?mode=weighted (WeightedSampler) выбирает треки с
+вероятностью, пропорциональной популярности, по таблице псевдонимов
+(alias method) в памяти процесса.
+"""
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Type
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select, tablesample, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.database import async_session_scope
+from app.core.instrumentation import create_untracked_task
+from app.models.like import Like
+from app.models.track import Track
+
+logger = logging.getLogger(__name__)
+
+
+class TrackSampler:
+    """
+    Базовый класс стратегии выборки.
+    """
+    name: str = ""
+
+    async def sample(self, db: AsyncSession, limit: int) -> List[Track]:
+        raise NotImplementedError
+
+
+class OrderByRandomSampler(TrackSampler):
+    """
+    Исходная реализация: полная сортировка таблицы по random().
+    Оставлена для сравнения в бенчмарке и для очень маленьких каталогов.
+    """
+    name = "order_by_random"
+
+    async def sample(self, db: AsyncSession, limit: int) -> List[Track]:
+        result = await db.execute(select(Track).order_by(func.random()).limit(limit))
+        return list(result.scalars())
+
+
+class RandomKeySampler(TrackSampler):
+    """
+    Выборка по индексированному столбцу tracks.random_key.
+
+    Берём несколько случайных точек в [0, 1) и от каждой читаем по индексу
+    короткую серию из run_length треков. Все серии собираются одним
+    запросом (UNION ALL), так что стоимость - несколько index seek'ов.
+    Короткие серии не дают одним и тем же соседям по ключу постоянно
+    попадать в выдачу вместе.
+    """
+    name = "random_key"
+
+    def __init__(self, run_length: int = 4):
+        self.run_length = max(1, run_length)
+
+    def _probe(self, pivot: float, size: int):
+        return (
+            select(Track.id)
+            .where(Track.random_key >= pivot)
+            .order_by(Track.random_key)
+            .limit(size)
+        )
+
+    async def sample_ids(self, db: AsyncSession, limit: int) -> List:
+        probes = [
+            self._probe(random.random(), self.run_length)
+            for _ in range(math.ceil(limit / self.run_length))
+        ]
+        ids = list(dict.fromkeys((await db.execute(union_all(*probes))).scalars()))
+
+        # Серии около 1.0 могут оказаться короче - добираем с начала ключей
+        if len(ids) < limit:
+            top_up = select(Track.id).order_by(Track.random_key).limit(limit - len(ids))
+            if ids:
+                top_up = top_up.where(Track.id.notin_(ids))
+            ids.extend((await db.execute(top_up)).scalars())
+
+        return ids[:limit]
+
+    async def sample(self, db: AsyncSession, limit: int) -> List[Track]:
+        ids = await self.sample_ids(db, limit)
+        return await load_tracks(db, ids)
+
+
+class TableSampleSampler(TrackSampler):
+    """
+    Выборка через TABLESAMPLE SYSTEM (только PostgreSQL).
+
+    Процент страниц вычисляется по оценке числа строк из pg_class так,
+    чтобы в выборку попало примерно limit * oversample строк; среди них
+    уже сортируем по random(). Для маленьких таблиц и других СУБД
+    используется обычный ORDER BY random().
+    """
+    name = "tablesample"
+
+    def __init__(self, oversample: float = 4.0):
+        self.oversample = max(1.0, oversample)
+        self._fallback = OrderByRandomSampler()
+
+    async def _estimated_rows(self, db: AsyncSession) -> float:
+        estimate = await db.scalar(
+            text("SELECT reltuples FROM pg_class WHERE oid = 'tracks'::regclass")
+        )
+        return float(estimate or 0)
+
+    async def sample(self, db: AsyncSession, limit: int) -> List[Track]:
+        if db.get_bind().dialect.name != "postgresql":
+            return await self._fallback.sample(db, limit)
+
+        total = await self._estimated_rows(db)
+        # reltuples = -1, пока таблица не анализировалась
+        if total <= limit * self.oversample * 10:
+            return await self._fallback.sample(db, limit)
+
+        percent = min(100.0, limit * self.oversample * 100.0 / total)
+        tracks: List[Track] = []
+        # SYSTEM выбирает целые страницы, поэтому размер выборки плавает;
+        # при недоборе повторяем с удвоенным процентом
+        for _ in range(3):
+            sampled = aliased(Track, tablesample(Track.__table__, func.system(percent)))
+            result = await db.execute(select(sampled).order_by(func.random()).limit(limit))
+            tracks = list(result.scalars())
+            if len(tracks) >= limit or percent >= 100.0:
+                break
+            percent = min(100.0, percent * 2)
+
+        return tracks
+
+
+class IdPoolSampler(TrackSampler):
+    """
+    Перемешанный пул ID треков в памяти процесса.
+
+    Запрос забирает limit ID из пула и загружает треки по первичному ключу.
+    Когда в пуле остаётся меньше low_watermark ID, пул пополняется фоновой
+    задачей в собственной сессии. Пополнение читает только столбец id по
+    индексу random_key.
+    """
+    name = "id_pool"
+
+    def __init__(
+        self,
+        pool_size: int = 5000,
+        low_watermark: int = 1000,
+        session_factory: Callable = async_session_scope,
+    ):
+        self.pool_size = max(1, pool_size)
+        self.low_watermark = min(low_watermark, self.pool_size)
+        self.session_factory = session_factory
+        self._pool: List = []
+        self._lock = threading.Lock()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._key_sampler = RandomKeySampler(run_length=self.pool_size)
+
+    async def _fetch_ids(self) -> List:
+        async with self.session_factory() as db:
+            ids = await self._key_sampler.sample_ids(db, self.pool_size)
+        random.shuffle(ids)
+        return ids
+
+    async def refill(self) -> None:
+        """
+        Пополнить пул.
+        """
+        try:
+            ids = await self._fetch_ids()
+        except Exception:
+            logger.exception("Не удалось пополнить пул случайных треков")
+            return
+        with self._lock:
+            known = set(self._pool)
+            self._pool.extend(i for i in ids if i not in known)
+
+    def _refill_in_background(self) -> None:
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        self._refill_task = create_untracked_task(self.refill())
+
+    def _take(self, limit: int) -> List:
+        with self._lock:
+            ids = self._pool[-limit:]
+            del self._pool[-limit:]
+            remaining = len(self._pool)
+        if remaining < self.low_watermark:
+            self._refill_in_background()
+        return ids
+
+    async def sample(self, db: AsyncSession, limit: int) -> List[Track]:
+        ids = self._take(limit)
+        if len(ids) < limit:
+            # Холодный старт или пул исчерпан быстрее, чем пополнился
+            if self._refill_task is not None and not self._refill_task.done():
+                await asyncio.shield(self._refill_task)
+            else:
+                await self.refill()
+            ids += [i for i in self._take(limit - len(ids)) if i not in ids]
+        return await load_tracks(db, ids)
+
+
+async def load_tracks(db: AsyncSession, ids: List) -> List[Track]:
+    """
+    Загрузить треки по списку ID, сохранив порядок списка.
+    """
+    if not ids:
+        return []
+    result = await db.execute(select(Track).where(Track.id.in_(ids)))
+    tracks = {t.id: t for t in result.scalars()}
+    return [tracks[i] for i in ids if i in tracks]
+
+
+class AliasTable:
+    """
+    Таблица псевдонимов Уолкера (построение по Возе): выбор индекса i с
+    вероятностью weights[i] / sum(weights) за O(1) на выбор.
+
+    Столбец выбирается равномерно, затем монетка с вероятностью prob[i]
+    оставляет его или заменяет на alias[i].
+    """
+
+    def __init__(self, weights: np.ndarray):
+        size = len(weights)
+        scaled = (np.asarray(weights, dtype=np.float64) * size / weights.sum()).tolist()
+        prob = [1.0] * size
+        alias = list(range(size))
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Оставшиеся столбцы (погрешность округления) выбираются с вероятностью 1
+        self.prob = np.array(prob, dtype=np.float32)
+        self.alias = np.array(alias, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        columns = rng.integers(0, len(self.prob), size)
+        coins = rng.random(size, dtype=np.float32)
+        return np.where(coins < self.prob[columns], columns, self.alias[columns])
+
+
+class WeightedSampler:
+    """
+    Выборка треков с весом по лайкам: weight = лайки + recency_boost *
+    сумма 2^(-возраст лайка / half_life) по лайкам трека.
+
+    Веса считаются одним агрегирующим запросом к likes, ID треков и
+    таблица псевдонимов хранятся в массивах NumPy. Запрос выборки не
+    обращается к PostgreSQL для выбора ID и никогда не ждёт построения:
+    первая таблица строится при старте (start), устаревшая (старше
+    refresh_seconds) перестраивается фоновой задачей, пока запросы читают
+    прежнюю. Пока таблицы нет, выдача целиком равномерная. После ошибки
+    построения следующая попытка откладывается (от RETRY_SECONDS вдвое
+    до refresh_seconds).
+
+    Треки без лайков в таблицу не входят, поэтому доля explore выдачи
+    берётся из равномерной стратегии RANDOM_SAMPLER.
+    """
+    name = "weighted"
+    RETRY_SECONDS = 5.0
+
+    def __init__(
+        self,
+        uniform: TrackSampler,
+        refresh_seconds: float = 300,
+        half_life_days: float = 7,
+        recency_boost: float = 4.0,
+        explore: float = 0.2,
+        session_factory: Callable = async_session_scope,
+    ):
+        self.uniform = uniform
+        self.refresh_seconds = refresh_seconds
+        self.half_life = half_life_days * 86400
+        self.recency_boost = recency_boost
+        self.explore = min(max(explore, 0.0), 1.0)
+        self.session_factory = session_factory
+        # (ID треков - массив по 16 байт UUID, таблица, время построения)
+        self._table: Optional[tuple] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._rng = np.random.default_rng()
+
+    async def _fetch_weights(self):
+        age = cast(func.extract("epoch", func.now() - Like.created_at), Float)
+        # Ограничение снизу: exp() в PostgreSQL падает с underflow на очень старых лайках
+        decay = func.exp(func.greatest(-age * math.log(2) / self.half_life, -700.0))
+        statement = (
+            select(Like.track_id, func.count(), func.coalesce(func.sum(decay), 0.0))
+            .where(Like.track_id.isnot(None))
+            .group_by(Like.track_id)
+        )
+        async with self.session_factory() as db:
+            rows = (await db.execute(statement)).all()
+        track_ids = np.frombuffer(b"".join(r[0].bytes for r in rows), dtype="V16")
+        weights = np.array([r[1] + self.recency_boost * r[2] for r in rows], dtype=np.float64)
+        return track_ids, weights
+
+    async def rebuild(self) -> None:
+        """
+        Перестроить таблицу по текущим лайкам.
+        """
+        try:
+            track_ids, weights = await self._fetch_weights()
+            table = None
+            if len(track_ids):
+                # Построение - цикл на Python, не держим им event loop
+                table = await asyncio.get_running_loop().run_in_executor(None, AliasTable, weights)
+        except Exception:
+            logger.exception("Не удалось перестроить таблицу взвешенной выборки")
+            ceiling = max(self.refresh_seconds, self.RETRY_SECONDS)
+            self._retry_delay = min(max(2 * self._retry_delay, self.RETRY_SECONDS), ceiling)
+            self._retry_at = time.monotonic() + self._retry_delay
+            return
+        self._retry_delay = 0.0
+        self._table = (track_ids, table, time.monotonic())
+
+    def _rebuild_in_background(self) -> None:
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        self._rebuild_task = create_untracked_task(self.rebuild())
+
+    def start(self) -> None:
+        """
+        Построить первую таблицу в фоне (при старте приложения).
+        """
+        self._rebuild_in_background()
+
+    async def stop(self) -> None:
+        if self._rebuild_task is not None:
+            self._rebuild_task.cancel()
+            try:
+                await self._rebuild_task
+            except asyncio.CancelledError:
+                pass
+            self._rebuild_task = None
+
+    def _current(self) -> Optional[tuple]:
+        # Запрос не ждёт построения: без таблицы выдача равномерная
+        if self._table is None or time.monotonic() - self._table[2] >= self.refresh_seconds:
+            self._rebuild_in_background()
+        return self._table
+
+    def draw_ids(self, track_ids: np.ndarray, table: AliasTable, count: int) -> List[uuid.UUID]:
+        """
+        До count разных ID; популярные треки выпадают повторно, поэтому
+        тянем с запасом и несколько раз.
+        """
+        picked: Dict[int, None] = {}
+        for _ in range(4):
+            if len(picked) >= count:
+                break
+            picked.update(dict.fromkeys(table.draw(self._rng, 2 * (count - len(picked)) + 4).tolist()))
+        return [uuid.UUID(bytes=track_ids[i].tobytes()) for i in list(picked)[:count]]
+
+    async def _without_liked(self, db: AsyncSession, user_id, ids: List) -> List:
+        if user_id is None or not ids:
+            return ids
+        liked = set((await db.execute(
+            select(Like.track_id).where(Like.user_id == user_id, Like.track_id.in_(ids))
+        )).scalars())
+        return [i for i in ids if i not in liked]
+
+    async def sample(self, db: AsyncSession, limit: int, user_id: Optional[uuid.UUID] = None) -> List[Track]:
+        """
+        limit треков; с user_id - кроме уже лайкнутых этим пользователем.
+        """
+        current = self._current()
+        weighted = int(self._rng.binomial(limit, 1.0 - self.explore))
+        ids: List = []
+        if current is not None and current[1] is not None and weighted:
+            track_ids, table, _ = current
+            # С исключением лайкнутых берём вдвое больше кандидатов
+            ids = self.draw_ids(track_ids, table, weighted * (2 if user_id else 1))
+            ids = (await self._without_liked(db, user_id, ids))[:weighted]
+        tracks = await load_tracks(db, ids)
+
+        if len(tracks) < limit:
+            # Исследование и добор, если популярных треков не хватило
+            seen = {t.id for t in tracks}
+            extra = [t for t in await self.uniform.sample(db, 2 * (limit - len(tracks))) if t.id not in seen]
+            allowed = set(await self._without_liked(db, user_id, [t.id for t in extra]))
+            tracks += [t for t in extra if t.id in allowed][:limit - len(tracks)]
+        random.shuffle(tracks)
+        return tracks
+
+
+SAMPLERS: Dict[str, Type[TrackSampler]] = {
+    cls.name: cls
+    for cls in (RandomKeySampler, TableSampleSampler, IdPoolSampler, OrderByRandomSampler)
+}
+
+
+def create_sampler(name: str) -> TrackSampler:
+    """
+    Создать стратегию по имени с параметрами из настроек.
+    """
+    if name == RandomKeySampler.name:
+        return RandomKeySampler(run_length=settings.RANDOM_KEY_RUN_LENGTH)
+    if name == TableSampleSampler.name:
+        return TableSampleSampler(oversample=settings.RANDOM_TABLESAMPLE_OVERSAMPLE)
+    if name == IdPoolSampler.name:
+        return IdPoolSampler(
+            pool_size=settings.RANDOM_ID_POOL_SIZE,
+            low_watermark=settings.RANDOM_ID_POOL_LOW_WATERMARK,
+        )
+    if name == OrderByRandomSampler.name:
+        return OrderByRandomSampler()
+    raise ValueError(
+        f"Неизвестная стратегия выборки '{name}'. Доступные: {', '.join(SAMPLERS)}"
+    )
+
+
+_sampler: Optional[TrackSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> TrackSampler:
+    """
+    Стратегия, выбранная в settings.RANDOM_SAMPLER (один экземпляр на процесс).
+    """
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = create_sampler(settings.RANDOM_SAMPLER)
+    return _sampler
+
+
+_weighted_sampler: Optional[WeightedSampler] = None
+
+
+def get_weighted_sampler() -> WeightedSampler:
+    """
+    Взвешенная выборка для /tracks/random?mode=weighted (один экземпляр на процесс).
+    """
+    global _weighted_sampler
+    if _weighted_sampler is None:
+        with _sampler_lock:
+            if _weighted_sampler is None:
+                _weighted_sampler = WeightedSampler(
+                    uniform=create_sampler(settings.RANDOM_SAMPLER),
+                    refresh_seconds=settings.RANDOM_WEIGHTED_REFRESH_SECONDS,
+                    half_life_days=settings.RANDOM_WEIGHTED_HALF_LIFE_DAYS,
+                    recency_boost=settings.RANDOM_WEIGHTED_RECENCY_BOOST,
+                    explore=settings.RANDOM_WEIGHTED_EXPLORE,
+                )
+    return _weighted_sampler
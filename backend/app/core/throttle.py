@@ -0,0 +1,178 @@
+"""
+Ограничение частоты попыток входа (POST /auth/token) по алгоритму token bucket.
+
+Отдельные корзины по IP клиента и по паре (имя пользователя, IP): корзина
+вмещает burst попыток и пополняется со скоростью per_minute попыток в
+минуту. Попытка резервирует по жетону из обеих корзин сразу и только если
+жетоны есть в обеих. Иначе ответ 429 с Retry-After до появления жетона.
+Успешный вход жетоны возвращает (refund), так что расходуют их только
+неудачные попытки, а чужие попытки с другого адреса не блокируют вход
+владельцу имени.
+
+IP клиента берётся из X-Forwarded-For, только если запрос пришёл от
+доверенного прокси (TRUSTED_PROXIES), иначе - адрес соединения.
+
+Корзины хранятся в памяти процесса (LRU на LOGIN_THROTTLE_MAX_KEYS
+ключей): при нескольких воркерах лимит действует в каждом отдельно.
+"""
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge
+
+login_throttled = counter(
+    "soulsync_login_throttled_total",
+    "Попытки входа, отклонённые с 429, по исчерпанной корзине: ip или username",
+    ("key",),
+)
+login_throttle_keys = gauge(
+    "soulsync_login_throttle_keys",
+    "Количество корзин ограничения входа в памяти",
+    ("key",),
+)
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[Network]:
+    """
+    "10.0.0.0/8, 127.0.0.1" -> список сетей. ValueError при неверном адресе.
+    """
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+def _trusted(address: str, networks: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(request: Request, trusted: Optional[List[Network]] = None) -> Optional[str]:
+    """
+    IP клиента: адрес соединения или, если соединение от доверенного
+    прокси, первый справа недоверенный адрес X-Forwarded-For.
+    """
+    trusted = trusted_proxies if trusted is None else trusted
+    peer = request.client.host if request.client else None
+    if peer is None or not trusted or not _trusted(peer, trusted):
+        return peer
+    forwarded = [item.strip() for item in ",".join(request.headers.getlist("x-forwarded-for")).split(",")]
+    for address in reversed([item for item in forwarded if item]):
+        if not _trusted(address, trusted):
+            return address
+    return peer
+
+
+class TokenBucketLimiter:
+    """
+    Потокобезопасный набор корзин token bucket с ограничением по размеру (LRU).
+    """
+
+    def __init__(self, burst: float, per_minute: float, maxsize: int):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.maxsize = maxsize
+        # ключ -> (жетоны, время последнего пополнения)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _tokens(self, key: str, now: float) -> float:
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def retry_after(self, key: str, now: float) -> float:
+        """
+        Через сколько секунд в корзине появится жетон (0 - уже есть).
+        """
+        tokens = self._tokens(key, now)
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate if self.rate > 0 else math.inf
+
+    def take(self, key: str, now: float) -> None:
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+
+    def refund(self, key: str, now: float) -> None:
+        """
+        Вернуть жетон в корзину (если она ещё не вытеснена).
+        """
+        if key in self._buckets:
+            self._buckets[key] = (min(self.burst, self._tokens(key, now) + 1), now)
+
+
+class LoginThrottle:
+    def __init__(self):
+        maxsize = settings.LOGIN_THROTTLE_MAX_KEYS
+        self.by_ip = TokenBucketLimiter(settings.LOGIN_THROTTLE_IP_BURST, settings.LOGIN_THROTTLE_IP_PER_MINUTE, maxsize)
+        self.by_username = TokenBucketLimiter(
+            settings.LOGIN_THROTTLE_USERNAME_BURST, settings.LOGIN_THROTTLE_USERNAME_PER_MINUTE, maxsize
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(ip: Optional[str], username: str) -> Tuple[str, str]:
+        ip = ip or "unknown"
+        return ip, f"{username.lower()}|{ip}"
+
+    def check(self, ip: Optional[str], username: str) -> None:
+        """
+        Резервирует жетоны попытки входа или бросает HTTPException 429.
+        """
+        if not settings.LOGIN_THROTTLE:
+            return
+        ip_key, username_key = self._keys(ip, username)
+        now = time.monotonic()
+        with self._lock:
+            waits = {
+                "ip": self.by_ip.retry_after(ip_key, now),
+                "username": self.by_username.retry_after(username_key, now),
+            }
+            if not any(waits.values()):
+                self.by_ip.take(ip_key, now)
+                self.by_username.take(username_key, now)
+                return
+
+        for key, wait in waits.items():
+            if wait:
+                login_throttled.inc(key=key)
+        retry_after = max(waits.values())
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Слишком много попыток входа, повторите позже",
+            headers={"Retry-After": str(math.ceil(retry_after)) if math.isfinite(retry_after) else "3600"},
+        )
+
+
+    def refund(self, ip: Optional[str], username: str) -> None:
+        """
+        Вернуть жетоны успешной попытки: лимит расходуют только неудачные.
+        """
+        if not settings.LOGIN_THROTTLE:
+            return
+        ip_key, username_key = self._keys(ip, username)
+        now = time.monotonic()
+        with self._lock:
+            self.by_ip.refund(ip_key, now)
+            self.by_username.refund(username_key, now)
+
+
+trusted_proxies = parse_networks(settings.TRUSTED_PROXIES)
+login_throttle = LoginThrottle()
+login_throttle_keys.set_function(lambda: len(login_throttle.by_ip), key="ip")
+login_throttle_keys.set_function(lambda: len(login_throttle.by_username), key="username")
@@ -1,17 +1,45 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
 from pathlib import Path
 
 from app.core.config import settings
 from app.api import api_router
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, Base
+from app.core.metrics import render_metrics
+from app.core.instrumentation import SQLInstrumentationMiddleware
+from app.core.admission import AdmissionControlMiddleware
+from app.core.passwords import shutdown_executor
+from app.core.recommender import flow_recommender
+from app.core.like_counts import like_counter
+from app.core.peaks import peaks_builder
+from app.core.cache import catalog_cache
+from app.core.sampler import get_weighted_sampler
 
 # Создаем таблицы в БД (в продакшене используйте Alembic для миграций)
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title=settings.PROJECT_NAME)
 
+# Лимиты одновременных запросов по группам маршрутов, при перегрузке 503.
+# Добавляется первым, чтобы CORS и учёт SQL оборачивали и отказы
+if settings.ADMISSION_CONTROL:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        api_prefix=settings.API_V1_STR,
+        limits=settings.ADMISSION_LIMITS,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+    )
+
+# Статистика SQL по запросам: заголовок Server-Timing и метрики /metrics
+if settings.SQL_INSTRUMENTATION:
+    app.add_middleware(
+        SQLInstrumentationMiddleware,
+        repeated_threshold=settings.SQL_REPEATED_STATEMENT_THRESHOLD,
+    )
+
 # Настройка CORS - более агрессивно
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +51,33 @@ app.add_middleware(
     max_age=86400,  # 24 часа кеширования preflight запросов
 )
 
+@app.on_event("startup")
+async def start_background_tasks():
+    # Фоновая перестройка модели рекомендаций потока
+    flow_recommender.start()
+    # Отложенная запись tracks.like_count и сверка с likes
+    like_counter.start()
+    # Построение пиков формы волны загруженного аудио
+    peaks_builder.start()
+    # Обновление версии кэша каталога из БД
+    catalog_cache.start()
+    # Первая таблица взвешенной выборки /tracks/random?mode=weighted
+    get_weighted_sampler().start()
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    await flow_recommender.stop()
+    # Сбрасываем накопленные изменения счётчиков лайков
+    await like_counter.stop()
+    await peaks_builder.stop()
+    await catalog_cache.stop()
+    await get_weighted_sampler().stop()
+    # Закрываем соединения пула asyncpg при остановке приложения
+    if async_engine is not None:
+        await async_engine.dispose()
+    # Останавливаем пул bcrypt
+    shutdown_executor()
+
 # Подключаем API роутеры
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -35,4 +90,12 @@ app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads"
 
 @app.get("/")
 def read_root():
-    return {"message": "Welcome to SoulSync API"} 
\ No newline at end of file
+    return {"message": "Welcome to SoulSync API"} 
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Метрики процесса в формате Prometheus.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,4 +1,6 @@
 from .user import User
 from .track import Track
 from .playlist import Playlist, PlaylistTrack
-from .like import Like 
\ No newline at end of file
+from .like import Like
+from .import_file import ImportFile
+from .upload import AudioUpload
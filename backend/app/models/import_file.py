@@ -0,0 +1,31 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from app.core.database import Base
+
+
+class ImportFile(Base):
+    """
+    Манифест импорта: состояние обработки одного файла скриптами импорта.
+
+    Файл определяется хешем содержимого, поэтому переименованный файл не
+    импортируется повторно, а изменённый - импортируется заново.
+    """
+    __tablename__ = "import_files"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), unique=True, nullable=False)  # sha256
+    path = Column(String)  # путь при последнем запуске
+    size = Column(BigInteger)
+    status = Column(String, nullable=False, default="pending")  # pending, in_progress, done, failed
+    # Сколько записей файла обработано и зафиксировано (контрольная точка)
+    rows_done = Column(Integer, nullable=False, default=0)
+    row_count = Column(Integer, nullable=True)  # всего записей, известно после завершения
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    duplicates = Column(Integer, nullable=False, default=0)
+    invalid = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
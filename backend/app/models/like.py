@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, DateTime, func, String
+from sqlalchemy import Column, ForeignKey, DateTime, Index, func, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -7,6 +7,12 @@ from app.core.database import Base
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        # Ключ keyset-пагинации лайков пользователя
+        Index("ix_likes_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Один лайк на пару пользователь-трек; цель ON CONFLICT в create_like
+        Index("uq_likes_user_id_track_id", "user_id", "track_id", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
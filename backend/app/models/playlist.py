@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, func
+from sqlalchemy import Column, String, Boolean, Integer, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -7,6 +7,10 @@ from app.core.database import Base
 
 class Playlist(Base):
     __tablename__ = "playlists"
+    __table_args__ = (
+        # Ключ keyset-пагинации плейлистов пользователя
+        Index("ix_playlists_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, index=True)
@@ -18,18 +22,28 @@ class Playlist(Base):
     
     # Связи
     user = relationship("User", back_populates="playlists")
-    tracks = relationship("PlaylistTrack", back_populates="playlist")
+    # Ленивая загрузка запрещена: записи читаются постранично явными
+    # запросами (app/api/playlists.py), а не по одному плейлисту в цикле
+    tracks = relationship(
+        "PlaylistTrack", back_populates="playlist", order_by="PlaylistTrack.position", lazy="raise_on_sql"
+    )
 
 
 class PlaylistTrack(Base):
     __tablename__ = "playlist_tracks"
+    __table_args__ = (
+        # Порядок треков плейлиста; уникальность не даёт двум записям
+        # получить один ключ при одновременной вставке
+        Index("uq_playlist_tracks_playlist_id_position", "playlist_id", "position", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     playlist_id = Column(UUID(as_uuid=True), ForeignKey("playlists.id"))
     track_id = Column(UUID(as_uuid=True), ForeignKey("tracks.id"))
-    position = Column(Integer)  # для сортировки
+    # Дробный ключ порядка (app/utils/positions.py), сравнивается побайтно
+    position = Column(String(collation="C"), nullable=False)
     created_at = Column(DateTime, default=func.now())
     
     # Связи
     playlist = relationship("Playlist", back_populates="tracks")
-    track = relationship("Track", back_populates="playlists") 
\ No newline at end of file
+    track = relationship("Track", back_populates="playlists", lazy="raise_on_sql")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, func, ForeignKey
+from sqlalchemy import Column, String, DateTime, Float, Integer, func, ForeignKey, Index, text, event, DDL
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -7,6 +7,25 @@ from app.core.database import Base
 
 class Track(Base):
     __tablename__ = "tracks"
+    __table_args__ = (
+        # Ключ keyset-пагинации списка треков
+        Index("ix_tracks_created_at_id", "created_at", "id"),
+        # Порядок и фильтр since выгрузки /tracks/export
+        Index("ix_tracks_updated_at_id", "updated_at", "id"),
+        # Чарт /tracks/popular по счётчику лайков
+        Index("ix_tracks_like_count_id", "like_count", "id"),
+        # Один трек на url; цель ON CONFLICT в импорте и POST /tracks/bulk
+        Index("uq_tracks_url", "url", unique=True),
+        # Триграммные индексы для поиска по подстроке и нечёткого поиска (pg_trgm)
+        Index(
+            "ix_tracks_title_trgm", "title",
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_tracks_artist_trgm", "artist",
+            postgresql_using="gin", postgresql_ops={"artist": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     url = Column(String)  # ссылка на SoundCloud
@@ -15,9 +34,23 @@ class Track(Base):
     artwork_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    # Случайный ключ для выборки /tracks/random без ORDER BY random()
+    random_key = Column(Float, server_default=text("random()"), nullable=False, index=True)
+    # Количество лайков; обновляется с отложенной записью (app/core/like_counts.py)
+    like_count = Column(Integer, server_default=text("0"), nullable=False)
+    # Аудиофайл трека относительно UPLOAD_DIR (GET /media/{track_id})
+    audio_path = Column(String, nullable=True)
     
     # Связи
     playlists = relationship("PlaylistTrack", back_populates="track")
     likes = relationship("Like", back_populates="track")
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    user = relationship("User", back_populates="tracks") 
\ No newline at end of file
+    user = relationship("User", back_populates="tracks") 
+
+
+# Расширение pg_trgm должно существовать до создания триграммных индексов
+event.listen(
+    Track.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from app.core.database import Base
+
+
+class AudioUpload(Base):
+    """
+    Возобновляемая загрузка аудиофайла трека (/uploads).
+
+    Принятые байты лежат в UPLOAD_TMP_DIR/{id}.part; received - сколько из
+    них подтверждено (fsync) и с какого смещения ждётся следующая часть.
+    """
+    __tablename__ = "audio_uploads"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    track_id = Column(UUID(as_uuid=True), ForeignKey("tracks.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)  # объявленный размер файла
+    received = Column(BigInteger, nullable=False, default=0)
+    # Ожидаемый sha256 от клиента, после завершения - фактический
+    sha256 = Column(String(64), nullable=True)
+    status = Column(String, nullable=False, default="active")  # active, completed
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1,4 +1,9 @@
 from .user import User, UserCreate, UserUpdate, UserInDB
-from .track import Track, TrackCreate, TrackUpdate, TrackInDB
-from .playlist import Playlist, PlaylistCreate, PlaylistUpdate, PlaylistInDB, PlaylistTrack
-from .like import Like, LikeCreate 
\ No newline at end of file
+from .track import Track, TrackCreate, TrackUpdate, TrackInDB, TrackBulkItem, TrackBulkResult
+from .playlist import (
+    Playlist, PlaylistCreate, PlaylistUpdate, PlaylistInDB, PlaylistTrack,
+    PlaylistEntry, PlaylistSummary, PlaylistDetail,
+    PlaylistTracksAdd, PlaylistTrackMove, PlaylistTracksRemove,
+)
+from .like import Like, LikeCreate, LikeCheckRequest
+from .upload import AudioUpload, AudioUploadCreate
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from .track import Track
+from app.core.config import settings
 
 
 class LikeBase(BaseModel):
@@ -21,4 +22,8 @@ class Like(LikeBase):
     track: Optional[Track] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+
+class LikeCheckRequest(BaseModel):
+    track_ids: List[UUID] = Field(..., max_length=settings.LIKE_CHECK_MAX_BATCH)
@@ -1,12 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from typing import Optional, List
+from .track import Track
+from app.core.config import settings
 
 
 class PlaylistTrackBase(BaseModel):
     track_id: UUID
-    position: int
+    position: str  # ключ порядка: записи сортируются по нему побайтно
 
 
 class PlaylistTrack(PlaylistTrackBase):
@@ -44,6 +46,21 @@ class PlaylistInDB(PlaylistBase):
         from_attributes = True
 
 
+class PlaylistEntry(PlaylistTrack):
+    track: Track
+
+
+class PlaylistSummary(PlaylistInDB):
+    track_count: int = 0
+    # Обложки первых треков (для коллажа в списке плейлистов)
+    artworks: List[str] = []
+
+
+class PlaylistDetail(PlaylistSummary):
+    # Первая страница треков; следующие - GET /playlists/{id}/tracks по X-Next-Cursor
+    tracks: List[PlaylistEntry] = []
+
+
 class Playlist(PlaylistBase):
     id: UUID
     user_id: UUID
@@ -52,4 +69,23 @@ class Playlist(PlaylistBase):
     tracks: List[PlaylistTrack] = []
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class PlaylistTracksAdd(BaseModel):
+    track_ids: List[UUID] = Field(..., min_length=1, max_length=settings.PLAYLIST_MAX_BATCH)
+    # ID записей плейлиста, между которыми вставить треки; без них - в конец
+    after: Optional[UUID] = None
+    before: Optional[UUID] = None
+
+
+class PlaylistTrackMove(BaseModel):
+    # Новое место записи: после after и/или перед before (ID записей)
+    after: Optional[UUID] = None
+    before: Optional[UUID] = None
+
+
+class PlaylistTracksRemove(BaseModel):
+    # Удаляются записи с указанными ID и все вхождения указанных треков
+    entry_ids: List[UUID] = Field([], max_length=settings.PLAYLIST_MAX_BATCH)
+    track_ids: List[UUID] = Field([], max_length=settings.PLAYLIST_MAX_BATCH)
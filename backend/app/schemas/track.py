@@ -1,7 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class TrackBase(BaseModel):
@@ -37,6 +37,24 @@ class Track(TrackBase):
     created_at: datetime
     updated_at: datetime
     user_id: UUID
+    like_count: int = 0
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class TrackBulkItem(BaseModel):
+    index: int
+    status: str  # created, duplicate, invalid
+    id: Optional[UUID] = None
+    url: Optional[str] = None
+    error: Optional[str] = None
+
+
+class TrackBulkResult(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    invalid: int
+    elapsed_ms: float
+    rows_per_second: float
+    items: List[TrackBulkItem]
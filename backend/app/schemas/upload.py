@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from uuid import UUID
+from datetime import datetime
+from typing import Optional
+
+
+class AudioUploadCreate(BaseModel):
+    track_id: UUID
+    filename: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., gt=0, description="Размер файла в байтах")
+    sha256: Optional[str] = Field(
+        None, pattern="^[0-9a-f]{64}$", description="sha256 всего файла (hex), проверяется при завершении"
+    )
+
+
+class AudioUpload(BaseModel):
+    id: UUID
+    track_id: UUID
+    filename: str
+    size: int
+    received: int
+    sha256: Optional[str] = None
+    status: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,157 @@
+"""
+Пакетная загрузка треков для POST /tracks/bulk.
+
+Тело запроса - JSON-массив объектов TrackCreate или NDJSON (один объект
+на строку). Элементы проверяются по схеме, дубликаты url отбрасываются
+внутри запроса и по уникальному индексу uq_tracks_url, новые треки
+вставляются пачками многострочных INSERT ... ON CONFLICT DO NOTHING
+(executemany, который SQLAlchemy 2.0 разворачивает в VALUES (...), (...))
+в одной транзакции.
+"""
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.models.track import Track
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+
+def parse_bulk_body(body: bytes, content_type: str, max_items: int) -> List[Tuple[Any, Optional[str]]]:
+    """
+    Разобрать тело запроса в список (объект, ошибка разбора).
+
+    Некорректная строка NDJSON не отклоняет весь запрос, а становится
+    элементом со статусом invalid.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in NDJSON_TYPES:
+        raw_items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                raw_items.append((json.loads(line), None))
+            except ValueError as e:
+                raw_items.append((None, f"Некорректный JSON: {e}"))
+    else:
+        try:
+            data = json.loads(body or b"null")
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Тело запроса должно быть JSON-массивом или NDJSON"
+            )
+        if not isinstance(data, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Ожидается JSON-массив треков"
+            )
+        raw_items = [(item, None) for item in data]
+
+    if len(raw_items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Слишком много треков в запросе: {len(raw_items)}, максимум {max_items}"
+        )
+    return raw_items
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'item'}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def bulk_create_tracks(
+    db: AsyncSession,
+    raw_items: List[Tuple[Any, Optional[str]]],
+    user_id: uuid.UUID,
+    batch_size: int = 1000,
+) -> schemas.TrackBulkResult:
+    """
+    Проверить и вставить треки одной транзакцией.
+    """
+    started = time.perf_counter()
+    results: List[schemas.TrackBulkItem] = []
+    seen_urls: Dict[str, int] = {}
+    created = 0
+    batch_size = max(1, batch_size)
+
+    for offset in range(0, len(raw_items), batch_size):
+        pending: List[Tuple[int, schemas.TrackCreate]] = []
+        for index, (raw, parse_error) in enumerate(raw_items[offset:offset + batch_size], start=offset):
+            if parse_error is not None:
+                results.append(schemas.TrackBulkItem(index=index, status=INVALID, error=parse_error))
+                continue
+            try:
+                item = schemas.TrackCreate.model_validate(raw)
+            except ValidationError as e:
+                results.append(schemas.TrackBulkItem(
+                    index=index, status=INVALID, error=_validation_message(e)
+                ))
+                continue
+            if item.url in seen_urls:
+                results.append(schemas.TrackBulkItem(
+                    index=index, status=DUPLICATE, url=item.url,
+                    error=f"Повторяет элемент {seen_urls[item.url]} этого запроса"
+                ))
+                continue
+            seen_urls[item.url] = index
+            pending.append((index, item))
+
+        if not pending:
+            continue
+
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "url": item.url,
+                "title": item.title,
+                "artist": item.artist,
+                "artwork_url": item.artwork_url,
+                "user_id": user_id,
+            }
+            for _, item in pending
+        ]
+        # Один запрос на пачку: существующие url отсекает уникальный индекс,
+        # RETURNING возвращает только вставленные строки
+        inserted = set((await db.execute(
+            pg_insert(Track).on_conflict_do_nothing(index_elements=[Track.url]).returning(Track.url),
+            rows,
+        )).scalars())
+
+        for (index, item), row in zip(pending, rows):
+            if item.url in inserted:
+                results.append(schemas.TrackBulkItem(index=index, status=CREATED, id=row["id"], url=item.url))
+            else:
+                results.append(schemas.TrackBulkItem(
+                    index=index, status=DUPLICATE, url=item.url, error="Трек с таким URL уже существует"
+                ))
+        created += len(inserted)
+
+    if created:
+        await db.commit()
+
+    elapsed = time.perf_counter() - started
+    results.sort(key=lambda r: r.index)
+    return schemas.TrackBulkResult(
+        total=len(raw_items),
+        created=created,
+        duplicates=sum(r.status == DUPLICATE for r in results),
+        invalid=sum(r.status == INVALID for r in results),
+        elapsed_ms=round(elapsed * 1000, 2),
+        rows_per_second=round(created / elapsed, 1) if elapsed > 0 else 0.0,
+        items=results,
+    )
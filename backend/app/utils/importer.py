@@ -0,0 +1,601 @@
+"""
+Потоковый импорт треков из файлов JSON, NDJSON и CSV.
+
+Общий движок для scripts/import_tracks.py и scripts/import_soundcloud_tracks.py:
+
+- файлы читаются по одной записи, без загрузки целиком в память
+  (JSON-массив разбирается инкрементально, поддерживаются .gz);
+- записи проверяются схемой TrackCreate и вставляются пачками
+  многострочных INSERT ... ON CONFLICT (url) по уникальному индексу
+  uq_tracks_url - отдельный SELECT на каждый трек не нужен;
+- ID исполнителей (режим SoundCloud) загружаются одним запросом только
+  по столбцам artist и user_id;
+- несколько файлов можно обрабатывать параллельно в пуле процессов;
+- записи фиксируются частями, а манифест import_files хранит по каждому
+  файлу хеш содержимого, число записей и контрольную точку: повторный
+  запуск пропускает готовые файлы и продолжает прерванные;
+- прогресс и итоговая скорость печатаются в консоль.
+"""
+import csv
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, literal_column, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import schemas
+from app.models.import_file import ImportFile
+from app.models.track import Track
+
+FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+# Пространство имён для ID новых исполнителей: один и тот же исполнитель
+# получает один ID во всех процессах и запусках импорта
+ARTIST_NAMESPACE = uuid.UUID("6f1c4a52-3b8e-4d3a-9a0e-5f0c2d7b8e91")
+
+ON_CONFLICT_SKIP = "skip"
+ON_CONFLICT_UPDATE = "update"
+
+MANIFEST_PENDING = "pending"
+MANIFEST_IN_PROGRESS = "in_progress"
+MANIFEST_DONE = "done"
+MANIFEST_FAILED = "failed"
+
+# Сколько ошибок в записях печатать на файл
+MAX_REPORTED_ERRORS = 20
+
+
+def detect_format(path: str) -> Optional[str]:
+    name = path[:-3] if path.endswith(".gz") else path
+    return FORMATS.get(os.path.splitext(name)[1].lower())
+
+
+def open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _element_end(buffer: str, pos: int) -> Optional[int]:
+    """
+    Позиция ',' или ']' массива после элемента, начатого в pos, или None,
+    если элемент не закончился в буфере. Учитывает строки и вложенность,
+    синтаксис самого элемента не проверяет.
+    """
+    depth = 0
+    in_string = escape = False
+    for i in range(pos, len(buffer)):
+        c = buffer[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "[{":
+            depth += 1
+        elif c in "]}":
+            if depth == 0:
+                return i
+            depth -= 1
+        elif c == "," and depth == 0:
+            return i
+    return None
+
+
+def iter_json_array(
+    f, chunk_size: int = 1 << 16, max_element_size: int = 1 << 24
+) -> Iterator[Tuple[Any, Optional[str]]]:
+    """
+    Инкрементально разобрать JSON-массив объектов из текстового потока.
+
+    В памяти держится только текущий кусок файла. Элемент с ошибкой
+    синтаксиса возвращается как ошибка, разбор продолжается со следующего
+    элемента. Файл дочитывается, только если элемент оборвался на границе
+    куска; элемент длиннее max_element_size прерывает разбор.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buffer, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer += chunk
+        return True
+
+    pos = 0
+    while True:
+        # Пропускаем пробелы и разделители между элементами
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or not fill():
+                break
+        if pos >= len(buffer):
+            if not started:
+                yield None, "Файл пуст"
+            else:
+                yield None, "Неожиданный конец файла: массив не закрыт"
+            return
+        if not started:
+            if buffer[pos] != "[":
+                yield None, "JSON должен содержать список треков"
+                return
+            started = True
+            pos += 1
+            continue
+        if buffer[pos] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            boundary = _element_end(buffer, pos)
+            if boundary is None and len(buffer) - pos > max_element_size:
+                yield None, f"Некорректный JSON: элемент длиннее {max_element_size} символов"
+                return
+            # Элемент оборвался на границе куска - дочитываем
+            if boundary is None and not eof and fill():
+                continue
+            yield None, f"Некорректный JSON: {e}"
+            if boundary is None:
+                return
+            # Пропускаем испорченный элемент до разделителя массива
+            pos = boundary
+            continue
+        # Число на границе куска могло оборваться, оставаясь корректным
+        if end == len(buffer) and not eof and fill():
+            continue
+        yield value, None
+        pos = end
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def iter_ndjson(f) -> Iterator[Tuple[Any, Optional[str]]]:
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f"Некорректный JSON: {e}"
+
+
+def iter_csv(f) -> Iterator[Tuple[Any, Optional[str]]]:
+    for row in csv.DictReader(f):
+        # Пустые ячейки CSV - отсутствующие необязательные поля
+        yield {k: v for k, v in row.items() if k and v != ""}, None
+
+
+def iter_records(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[Any, Optional[str]]]:
+    """
+    Записи файла в виде (объект, ошибка разбора).
+    """
+    fmt = fmt or detect_format(path)
+    readers = {"json": iter_json_array, "ndjson": iter_ndjson, "csv": iter_csv}
+    if fmt not in readers:
+        raise ValueError(f"Неизвестный формат файла {path}, ожидается json, ndjson или csv")
+    with open_text(path) as f:
+        yield from readers[fmt](f)
+
+
+@dataclass
+class ImportOptions:
+    # Фиксированный владелец треков (import_tracks.py)
+    user_id: Optional[uuid.UUID] = None
+    # Владелец по исполнителю (import_soundcloud_tracks.py): artist -> user_id
+    artist_ids: Optional[Dict[str, uuid.UUID]] = None
+    batch_size: int = 5000
+    on_conflict: str = ON_CONFLICT_SKIP
+    dry_run: bool = False
+    progress_every: int = 100000
+    # Фиксировать каждые N записей (0 - один коммит на файл)
+    checkpoint_every: int = 50000
+    # Вести манифест import_files: пропуск готовых файлов и продолжение прерванных
+    manifest: bool = True
+    # Импортировать заново файлы, отмеченные в манифесте как готовые
+    force: bool = False
+
+
+@dataclass
+class ImportStats:
+    path: str = ""
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    elapsed: float = 0.0
+    # Файл уже импортирован (по манифесту)
+    skipped: bool = False
+    # Записей, зафиксированных прошлыми запусками
+    resumed_from: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add(self, other: "ImportStats") -> None:
+        self.read += other.read
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.duplicates += other.duplicates
+        self.invalid += other.invalid
+
+    def summary(self) -> str:
+        return (
+            f"прочитано {self.read}, добавлено {self.inserted}, обновлено {self.updated}, "
+            f"дубликатов {self.duplicates}, с ошибками {self.invalid}; "
+            f"{self.elapsed:.1f} с, {self.rows_per_second:.0f} строк/с"
+        )
+
+
+def load_artist_ids(conn) -> Dict[str, uuid.UUID]:
+    """
+    ID исполнителей из уже импортированных треков: один запрос только по
+    двум столбцам, самый ранний трек исполнителя определяет его ID.
+    """
+    rows = conn.execute(text(
+        "SELECT DISTINCT ON (artist) artist, user_id FROM tracks "
+        "WHERE artist IS NOT NULL AND user_id IS NOT NULL "
+        "ORDER BY artist, created_at"
+    ))
+    return {artist: user_id for artist, user_id in rows}
+
+
+def artist_user_id(artist: str, artist_ids: Dict[str, uuid.UUID]) -> uuid.UUID:
+    user_id = artist_ids.get(artist)
+    if user_id is None:
+        user_id = artist_ids[artist] = uuid.uuid5(ARTIST_NAMESPACE, artist)
+    return user_id
+
+
+def upsert_statement(on_conflict: str = ON_CONFLICT_SKIP):
+    """
+    INSERT треков с обработкой существующих url.
+
+    RETURNING (xmax = 0) отличает вставленные строки от обновлённых;
+    пропущенные при skip строки не возвращаются вовсе.
+    """
+    statement = pg_insert(Track.__table__)
+    if on_conflict == ON_CONFLICT_UPDATE:
+        statement = statement.on_conflict_do_update(
+            index_elements=[Track.url],
+            set_={
+                "title": statement.excluded.title,
+                "artist": statement.excluded.artist,
+                "artwork_url": statement.excluded.artwork_url,
+                "updated_at": statement.excluded.updated_at,
+            },
+        )
+    elif on_conflict == ON_CONFLICT_SKIP:
+        statement = statement.on_conflict_do_nothing(index_elements=[Track.url])
+    else:
+        raise ValueError(f"Неизвестный режим on_conflict '{on_conflict}', ожидается skip или update")
+    return statement.returning(literal_column("xmax = 0").label("inserted"))
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'item'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def _flush(conn, statement, batch: Dict[str, Dict], stats: ImportStats) -> None:
+    if not batch:
+        return
+    rows = list(batch.values())
+    batch.clear()
+    if conn is None:
+        stats.inserted += len(rows)
+        return
+    inserted = [row.inserted for row in conn.execute(statement, rows)]
+    stats.inserted += sum(inserted)
+    stats.updated += len(inserted) - sum(inserted)
+    stats.duplicates += len(rows) - len(inserted)
+
+
+def file_hash(path: str) -> Tuple[str, int]:
+    """
+    sha256 содержимого файла и его размер.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def claim_manifest(conn, path: str, force: bool = False):
+    """
+    Найти или создать запись манифеста для файла и заблокировать её до
+    конца транзакции. При force завершённый файл начинается заново.
+    """
+    content_hash, size = file_hash(path)
+    table = ImportFile.__table__
+    conn.execute(
+        pg_insert(table)
+        .values(content_hash=content_hash, path=path, size=size)
+        .on_conflict_do_nothing(index_elements=[table.c.content_hash])
+    )
+    entry = conn.execute(
+        select(table).where(table.c.content_hash == content_hash).with_for_update()
+    ).one()
+    if force and entry.status == MANIFEST_DONE:
+        conn.execute(
+            update(table).where(table.c.id == entry.id).values(
+                status=MANIFEST_PENDING, rows_done=0, row_count=None,
+                inserted=0, updated=0, duplicates=0, invalid=0, error=None,
+            )
+        )
+        entry = conn.execute(select(table).where(table.c.id == entry.id)).one()
+    return entry
+
+
+def _save_manifest(conn, entry, stats: ImportStats, rows_done: int, **values) -> None:
+    table = ImportFile.__table__
+    conn.execute(
+        update(table).where(table.c.id == entry.id).values(
+            rows_done=rows_done,
+            inserted=entry.inserted + stats.inserted,
+            updated=entry.updated + stats.updated,
+            duplicates=entry.duplicates + stats.duplicates,
+            invalid=entry.invalid + stats.invalid,
+            **values,
+        )
+    )
+
+
+def import_file(path: str, options: ImportOptions, engine=None, fmt: Optional[str] = None) -> ImportStats:
+    """
+    Импортировать один файл.
+
+    Записи фиксируются частями по options.checkpoint_every (0 - одной
+    транзакцией на файл). С манифестом каждая фиксация сохраняет в той же
+    транзакции контрольную точку: повторный запуск пропускает завершённые
+    файлы и продолжает прерванный с первой незафиксированной записи.
+    В режиме dry_run записи только читаются и проверяются.
+    """
+    if engine is None and not options.dry_run:
+        from app.core.database import engine
+
+    stats = ImportStats(path=path)
+    started = time.perf_counter()
+    statement = upsert_statement(options.on_conflict)
+    # Пачка по url: повтор url в одном INSERT ... ON CONFLICT недопустим
+    batch: Dict[str, Dict] = {}
+    name = os.path.basename(path)
+    entry = None
+
+    def process(conn) -> None:
+        for position, (raw, parse_error) in enumerate(iter_records(path, fmt), start=1):
+            # Записи до контрольной точки уже зафиксированы прошлым запуском
+            if position <= stats.resumed_from:
+                continue
+            stats.read += 1
+            if parse_error is None:
+                try:
+                    item = schemas.TrackCreate.model_validate(raw)
+                except ValidationError as e:
+                    parse_error = _validation_message(e)
+            if parse_error is not None:
+                stats.invalid += 1
+                if len(stats.errors) < MAX_REPORTED_ERRORS:
+                    stats.errors.append(f"{name}, запись {position}: {parse_error}")
+            elif item.url in batch:
+                stats.duplicates += 1
+            else:
+                if options.artist_ids is not None:
+                    user_id = artist_user_id(item.artist, options.artist_ids)
+                else:
+                    user_id = options.user_id
+                batch[item.url] = {
+                    "id": uuid.uuid4(),
+                    "url": item.url,
+                    "title": item.title,
+                    "artist": item.artist,
+                    "artwork_url": item.artwork_url,
+                    "user_id": user_id,
+                }
+                if len(batch) >= options.batch_size:
+                    _flush(conn, statement, batch, stats)
+
+            if conn is not None and options.checkpoint_every and stats.read % options.checkpoint_every == 0:
+                _flush(conn, statement, batch, stats)
+                if entry is not None:
+                    _save_manifest(conn, entry, stats, position, status=MANIFEST_IN_PROGRESS)
+                conn.commit()
+
+            if options.progress_every and stats.read % options.progress_every == 0:
+                rate = stats.read / (time.perf_counter() - started)
+                print(f"  {name}: {position} строк, {rate:.0f} строк/с")
+
+        _flush(conn, statement, batch, stats)
+        if entry is not None:
+            _save_manifest(
+                conn, entry, stats, stats.resumed_from + stats.read,
+                status=MANIFEST_DONE, row_count=stats.resumed_from + stats.read,
+                finished_at=func.now(), error=None,
+            )
+
+    if options.dry_run:
+        process(None)
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    with engine.connect() as conn:
+        if options.manifest:
+            entry = claim_manifest(conn, path, force=options.force)
+            if entry.status == MANIFEST_DONE:
+                conn.commit()
+                stats.skipped = True
+                stats.elapsed = time.perf_counter() - started
+                return stats
+            stats.resumed_from = entry.rows_done
+            if stats.resumed_from:
+                print(f"  {name}: продолжаем с записи {stats.resumed_from + 1}")
+            conn.execute(
+                update(ImportFile.__table__).where(ImportFile.__table__.c.id == entry.id)
+                .values(status=MANIFEST_IN_PROGRESS, path=path, started_at=func.now())
+            )
+            conn.commit()
+
+        try:
+            process(conn)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            if entry is not None:
+                conn.execute(
+                    update(ImportFile.__table__).where(ImportFile.__table__.c.id == entry.id)
+                    .values(status=MANIFEST_FAILED, error=str(e)[:2000])
+                )
+                conn.commit()
+            raise
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def expand_paths(paths: List[str], fmt: Optional[str] = None) -> List[str]:
+    """
+    Файлы для импорта: сами файлы и поддерживаемые файлы из директорий.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full = os.path.join(path, name)
+                file_format = detect_format(full)
+                if os.path.isfile(full) and file_format and fmt in (None, file_format):
+                    files.append(full)
+        else:
+            files.append(path)
+    return files
+
+
+def _init_worker() -> None:
+    # Соединения пула, унаследованные от родителя при fork, не используем
+    from app.core.database import engine
+    engine.dispose(close=False)
+
+
+def _import_in_worker(path: str, options: ImportOptions, fmt: Optional[str]) -> ImportStats:
+    return import_file(path, options, fmt=fmt)
+
+
+def import_paths(
+    paths: List[str],
+    options: ImportOptions,
+    workers: int = 1,
+    fmt: Optional[str] = None,
+) -> ImportStats:
+    """
+    Импортировать файлы и директории, при workers > 1 - в пуле процессов
+    (по файлу на задачу).
+    """
+    files = expand_paths(paths, fmt)
+    total = ImportStats(path=", ".join(paths))
+    started = time.perf_counter()
+    print(f"Файлов к импорту: {len(files)}, процессов: {max(1, workers)}")
+
+    if options.manifest and not options.dry_run:
+        from app.core.database import engine
+        ImportFile.__table__.create(engine, checkfirst=True)
+
+    skipped = []
+
+    def report(stats: ImportStats) -> None:
+        if stats.skipped:
+            skipped.append(stats.path)
+            print(f"{os.path.basename(stats.path)}: уже импортирован, пропускаем")
+            return
+        total.add(stats)
+        for error in stats.errors:
+            print(f"  {error}")
+        if stats.invalid > len(stats.errors):
+            print(f"  ... ещё ошибок: {stats.invalid - len(stats.errors)}")
+        print(f"{os.path.basename(stats.path)}: {stats.summary()}")
+
+    def failed(path: str, error: Exception) -> None:
+        print(f"{os.path.basename(path)}: ошибка импорта, незафиксированная часть отменена: {error}")
+
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(_import_in_worker, path, options, fmt): path for path in files}
+            for future in as_completed(futures):
+                try:
+                    report(future.result())
+                except Exception as e:
+                    failed(futures[future], e)
+    else:
+        for path in files:
+            try:
+                report(import_file(path, options, fmt=fmt))
+            except Exception as e:
+                failed(path, e)
+
+    total.elapsed = time.perf_counter() - started
+    if skipped:
+        print(f"Пропущено уже импортированных файлов: {len(skipped)}")
+    print(f"Итого: {total.summary()}")
+    return total
+
+
+def add_cli_arguments(parser) -> None:
+    """
+    Общие параметры командной строки скриптов импорта.
+    """
+    parser.add_argument("--workers", type=int, default=1, help="Процессов для параллельной обработки файлов")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Строк в одном INSERT")
+    parser.add_argument(
+        "--on-conflict", choices=[ON_CONFLICT_SKIP, ON_CONFLICT_UPDATE], default=ON_CONFLICT_SKIP,
+        help="Трек с существующим url: пропустить или обновить название, автора и обложку",
+    )
+    parser.add_argument("--progress-every", type=int, default=100000, help="Печатать прогресс каждые N строк")
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=50000,
+        help="Фиксировать транзакцию и контрольную точку каждые N строк (0 - одна транзакция на файл)",
+    )
+    parser.add_argument("--no-manifest", action="store_true", help="Не вести манифест импорта в БД")
+    parser.add_argument("--force", action="store_true", help="Импортировать заново уже импортированные файлы")
+
+
+def options_from_args(args) -> Dict[str, Any]:
+    """
+    Параметры ImportOptions из разобранных аргументов add_cli_arguments.
+    """
+    return {
+        "batch_size": args.batch_size,
+        "on_conflict": args.on_conflict,
+        "progress_every": args.progress_every,
+        "checkpoint_every": args.checkpoint_every,
+        "manifest": not args.no_manifest,
+        "force": args.force,
+    }
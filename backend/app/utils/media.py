@@ -0,0 +1,177 @@
+"""
+Отдача аудиофайлов из UPLOAD_DIR с поддержкой HTTP Range для GET /media/{track_id}.
+
+Плеер при перемотке запрашивает диапазон байт (Range: bytes=N-) и
+получает 206 Partial Content только с нужной частью файла вместо
+повторной загрузки целиком. If-Range защищает от склейки частей разных
+версий файла: если ETag изменился, отдаётся весь файл.
+
+ETag строгий: по inode, размеру и времени изменения файла с
+наносекундами. Содержимое для него не читается.
+
+Тело отправляется через расширение ASGI http.response.zerocopysend
+(os.sendfile на стороне сервера), если сервер его поддерживает, иначе
+читается асинхронно частями по chunk_size.
+"""
+import email.utils
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+    ".ogg": "audio/ogg",
+    ".oga": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac",
+    ".wav": "audio/wav",
+    ".webm": "audio/webm",
+}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_type(path: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def resolve_media_path(root: str, relative: str) -> Optional[Path]:
+    """
+    Путь к файлу внутри root или None, если relative выходит за его пределы.
+    """
+    base = Path(root).resolve()
+    path = (base / relative).resolve()
+    if base != path and base not in path.parents:
+        return None
+    return path
+
+
+def file_etag(stat: os.stat_result, suffix: str = "") -> str:
+    """
+    Сильный ETag файла; suffix различает представления одного файла.
+    """
+    suffix = f"-{suffix}" if suffix else ""
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}{suffix}"'
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Диапазон [start, end] из заголовка Range.
+
+    None - отдать файл целиком (заголовка нет, синтаксис не распознан,
+    конец диапазона меньше начала или несколько диапазонов). ValueError -
+    диапазон начинается за концом файла (416).
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first and last and int(last) < int(first):
+        # RFC 9110: неверный диапазон, заголовок игнорируется
+        return None
+    if size == 0:
+        raise ValueError("Пустой файл")
+    if not first:
+        # bytes=-N: последние N байт
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("Пустой диапазон")
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError("Диапазон вне файла")
+    return start, end
+
+
+def if_range_matches(header: Optional[str], etag: str, stat: os.stat_result) -> bool:
+    """
+    Выполняется ли условие If-Range (или заголовка нет).
+    """
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        # Для If-Range допустимо только строгое сравнение
+        return header == etag
+    try:
+        since = email.utils.parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    return since is not None and int(since.timestamp()) == int(stat.st_mtime)
+
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """
+    Совпадает ли If-None-Match с ETag (слабое сравнение) - ответ 304.
+    """
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class FileRangeResponse(Response):
+    """
+    Ответ с содержимым файла или его диапазоном [start, end].
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict,
+        media_type: str,
+        send_body: bool = True,
+        chunk_size: int = 64 * 1024,
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+        self.chunk_size = chunk_size
+        self.headers["content-length"] = str(end - start + 1 if stat.st_size else 0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = self.end - self.start + 1
+        if not self.send_body or remaining <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.start,
+                    "count": remaining,
+                })
+            return
+
+        async with await anyio.open_file(self.path, "rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # Файл укоротился во время отправки: закрываем ответ
+            await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,120 @@
+"""
+Keyset (курсорная) пагинация.
+
+Страница задаётся не смещением, а непрозрачным курсором - значениями
+ключей сортировки последней записи предыдущей страницы, например
+(created_at, id). Запрос следующей страницы превращается в
+WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC
+и обслуживается составным индексом по тем же столбцам независимо от
+глубины страницы. Новые записи, добавленные между запросами, не сдвигают
+следующие страницы.
+
+Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+Параметр skip поддерживается на время перехода и помечается заголовком
+Deprecation.
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"d": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"u": value.hex}
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    raise TypeError(f"Тип {type(value).__name__} не поддерживается в курсоре")
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "d" in value:
+            return datetime.fromisoformat(value["d"])
+        if "u" in value:
+            return uuid.UUID(value["u"])
+        raise ValueError("Неизвестный тип значения в курсоре")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Закодировать значения ключей сортировки в непрозрачную строку.
+    """
+    payload = json.dumps([_dump_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Раскодировать курсор; при ошибке - 400 Bad Request.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("Неверное количество ключей в курсоре")
+        return [_load_value(v) for v in values]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+
+
+async def keyset_paginate(
+    db: AsyncSession,
+    statement: Select,
+    keys: Sequence[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: Optional[int] = None,
+    descending: bool = True,
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Получить страницу запроса statement, отсортированного по keys по убыванию
+    (descending=False - по возрастанию).
+
+    keys - столбцы или выражения, вместе однозначно упорядочивающие записи
+    (последним обычно идёт первичный ключ). statement должен выбирать одну
+    сущность. Возвращает (записи, курсор следующей страницы или None).
+    """
+    statement = statement.add_columns(*keys)
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        if descending:
+            statement = statement.where(tuple_(*keys) < tuple_(*values))
+        else:
+            statement = statement.where(tuple_(*keys) > tuple_(*values))
+    statement = statement.order_by(*[key.desc() if descending else key.asc() for key in keys])
+    if skip:
+        statement = statement.offset(skip)
+
+    # Запрашиваем на одну запись больше, чтобы узнать, есть ли следующая страница
+    rows = (await db.execute(statement.limit(limit + 1))).all()
+    next_cursor = None
+    if limit > 0 and len(rows) > limit:
+        next_cursor = encode_cursor(tuple(rows[limit - 1])[1:])
+
+    return [row[0] for row in rows[:limit]], next_cursor
+
+
+def set_page_headers(response: Response, next_cursor: Optional[str], skip: Optional[int] = None) -> None:
+    """
+    Проставить заголовки пагинации: курсор следующей страницы и пометку
+    об устаревшем параметре skip.
+    """
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if skip is not None:
+        response.headers["Deprecation"] = "true"
@@ -0,0 +1,291 @@
+"""
+Пики формы волны (waveform peaks) аудиофайлов треков.
+
+Аудио декодируется потоково (WAV с 16-битным PCM - модулем wave,
+остальное - ffmpeg в s16le), сэмплы всех каналов сворачиваются в min/max
+блоков по 10 мс, из блоков строятся уровни с заданным числом пар min/max
+на весь трек (resolution). Все уровни трека лежат в одном файле
+UPLOAD_DIR/peaks/{track_id}.peaks:
+
+    заголовок  HEADER: magic, версия, число уровней, отпечаток исходного
+               файла (размер, mtime_ns, inode), длительность в секундах
+    индекс     LEVEL на уровень: resolution, число пар, смещение данных
+    данные     int8 [min0, max0, min1, max1, ...] каждого уровня
+
+Значения - старшие 8 бит 16-битных сэмплов, громкость не нормализуется.
+Файл читается через mmap: уровень - срез отображения, данные не разбираются.
+"""
+import mmap
+import os
+import struct
+import subprocess
+import tempfile
+import uuid
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MAGIC = b"SSPK"
+VERSION = 1
+# magic, версия, уровней, размер, mtime_ns и inode исходника, длительность
+HEADER = struct.Struct("<4sHHQqQd")
+# resolution, пар min/max, смещение данных от начала файла
+LEVEL = struct.Struct("<IIQ")
+BLOCKS_PER_SECOND = 100
+READ_FRAMES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class PeaksLevel:
+    resolution: int
+    count: int
+    offset: int
+
+
+@dataclass(frozen=True)
+class PeaksIndex:
+    source_size: int
+    source_mtime_ns: int
+    source_ino: int
+    duration: float
+    levels: Tuple[PeaksLevel, ...]
+    stat: os.stat_result  # файла пиков
+
+    def is_current(self, source: os.stat_result, resolutions: Sequence[int]) -> bool:
+        """
+        Построены ли пики по этой версии исходного файла и с этими уровнями.
+        """
+        return (
+            (self.source_size, self.source_mtime_ns, self.source_ino)
+            == (source.st_size, source.st_mtime_ns, source.st_ino)
+            and [level.resolution for level in self.levels] == list(resolutions)
+        )
+
+    def level(self, resolution: int) -> PeaksLevel:
+        """
+        Наименьший уровень не грубее resolution, иначе самый подробный.
+        """
+        for level in self.levels:
+            if level.resolution >= resolution:
+                return level
+        return self.levels[-1]
+
+
+def peaks_path(root: str, track_id: uuid.UUID) -> Path:
+    return Path(root) / "peaks" / f"{track_id}.peaks"
+
+
+def parse_resolutions(value: str) -> List[int]:
+    """
+    "256,1024" -> [256, 1024] (по возрастанию, без повторов).
+    """
+    resolutions = sorted({int(item) for item in value.split(",") if item.strip()})
+    if not resolutions or resolutions[0] <= 0:
+        raise ValueError(f"Неверный список уровней пиков '{value}'")
+    return resolutions
+
+
+def _parse_index(buffer, stat: os.stat_result) -> Optional[PeaksIndex]:
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, level_count, size, mtime_ns, ino, duration = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION or not level_count:
+        return None
+    if len(buffer) < HEADER.size + LEVEL.size * level_count:
+        return None
+    levels = tuple(
+        PeaksLevel(*LEVEL.unpack_from(buffer, HEADER.size + LEVEL.size * i)) for i in range(level_count)
+    )
+    if any(level.offset + 2 * level.count > stat.st_size for level in levels):
+        return None
+    return PeaksIndex(size, mtime_ns, ino, duration, levels, stat)
+
+
+def read_index(path: Path) -> Optional[PeaksIndex]:
+    """
+    Индекс файла пиков или None, если файла нет или он неполный.
+    """
+    try:
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            head = file.read(HEADER.size)
+            if len(head) == HEADER.size:
+                head += file.read(LEVEL.size * HEADER.unpack(head)[2])
+    except FileNotFoundError:
+        return None
+    return _parse_index(head, stat)
+
+
+def read_level(path: Path, resolution: int) -> Optional[Tuple[PeaksIndex, PeaksLevel, bytes]]:
+    """
+    Данные уровня, ближайшего к resolution, из отображённого в память файла.
+    """
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with file:
+        stat = os.fstat(file.fileno())
+        if stat.st_size < HEADER.size:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            index = _parse_index(mapped, stat)
+            if index is None:
+                return None
+            level = index.level(resolution)
+            return index, level, mapped[level.offset:level.offset + 2 * level.count]
+
+
+def _decode_wav(path: Path) -> Tuple[int, Iterator[np.ndarray]]:
+    audio = wave.open(str(path), "rb")
+    if audio.getsampwidth() != 2:
+        audio.close()
+        raise wave.Error("Поддерживается только 16-битный PCM")
+    rate, channels = audio.getframerate(), audio.getnchannels()
+
+    def frames():
+        with audio:
+            while data := audio.readframes(READ_FRAMES):
+                yield np.frombuffer(data, dtype="<i2").reshape(-1, channels)
+
+    return rate, frames()
+
+
+def _decode_ffmpeg(path: Path, sample_rate: int, ffmpeg: str) -> Tuple[int, Iterator[np.ndarray]]:
+    # stderr - во временный файл: непрочитанный канал при длинном выводе
+    # ошибок заполнился бы и остановил ffmpeg, пока читается stdout
+    stderr = tempfile.TemporaryFile()
+    try:
+        # Два канала: пики берутся по обоим, а не по их среднему
+        process = subprocess.Popen(
+            [
+                ffmpeg, "-v", "error", "-nostdin", "-i", str(path),
+                "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "2", "-ar", str(sample_rate), "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+        )
+    except BaseException:
+        stderr.close()
+        raise
+
+    def frames():
+        try:
+            while data := process.stdout.read(READ_FRAMES * 4):
+                usable = len(data) - len(data) % 4
+                yield np.frombuffer(data[:usable], dtype="<i2").reshape(-1, 2)
+            if process.wait() != 0:
+                stderr.seek(max(0, os.fstat(stderr.fileno()).st_size - 2000))
+                error = stderr.read().decode(errors="replace").strip()[-500:]
+                raise RuntimeError(f"ffmpeg: {error}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            stderr.close()
+
+    return sample_rate, frames()
+
+
+def decode(path: Path, sample_rate: int = 22050, ffmpeg: str = "ffmpeg") -> Tuple[int, Iterator[np.ndarray]]:
+    """
+    Частота и итератор массивов сэмплов int16 формы (кадры, каналы).
+    """
+    if path.suffix.lower() == ".wav":
+        try:
+            return _decode_wav(path)
+        except (wave.Error, EOFError):
+            pass
+    return _decode_ffmpeg(path, sample_rate, ffmpeg)
+
+
+def block_peaks(rate: int, frames: Iterator[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    min и max блоков по 1/BLOCKS_PER_SECOND секунды и число кадров.
+    """
+    block = max(1, rate // BLOCKS_PER_SECOND)
+    mins, maxs = [], []
+    rest, total = None, 0
+    for chunk in frames:
+        total += len(chunk)
+        if rest is not None and len(rest):
+            chunk = np.concatenate([rest, chunk])
+        usable = len(chunk) - len(chunk) % block
+        if usable:
+            blocks = chunk[:usable].reshape(-1, block * chunk.shape[1])
+            mins.append(blocks.min(axis=1))
+            maxs.append(blocks.max(axis=1))
+        rest = chunk[usable:]
+    if rest is not None and len(rest):
+        # Неполный последний блок
+        mins.append(rest.reshape(1, -1).min(axis=1))
+        maxs.append(rest.reshape(1, -1).max(axis=1))
+    if not mins:
+        empty = np.zeros(0, dtype=np.int16)
+        return empty, empty, total
+    return np.concatenate(mins), np.concatenate(maxs), total
+
+
+def build_levels(mins: np.ndarray, maxs: np.ndarray, resolutions: Sequence[int]) -> List[Tuple[int, np.ndarray]]:
+    """
+    Уровни [(resolution, int8 [min, max, ...])]; у коротких треков пар
+    меньше resolution - по одной на блок.
+    """
+    levels = []
+    for resolution in resolutions:
+        count = min(resolution, len(mins))
+        data = np.empty(2 * count, dtype=np.int8)
+        if count:
+            edges = np.arange(count, dtype=np.int64) * len(mins) // count
+            data[0::2] = np.minimum.reduceat(mins, edges) >> 8
+            data[1::2] = np.maximum.reduceat(maxs, edges) >> 8
+        levels.append((resolution, data))
+    return levels
+
+
+def write_peaks(target: Path, source: os.stat_result, duration: float, levels: List[Tuple[int, np.ndarray]]) -> None:
+    """
+    Записать файл пиков атомарно (временный файл и rename).
+    """
+    offset = HEADER.size + LEVEL.size * len(levels)
+    index = []
+    for resolution, data in levels:
+        index.append(LEVEL.pack(resolution, len(data) // 2, offset))
+        offset += len(data)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, len(levels), source.st_size, source.st_mtime_ns, source.st_ino, duration
+        ))
+        file.write(b"".join(index))
+        for _, data in levels:
+            file.write(data.tobytes())
+    os.replace(tmp, target)
+
+
+def build_peaks(
+    source: str,
+    target: str,
+    resolutions: Sequence[int],
+    sample_rate: int = 22050,
+    ffmpeg: str = "ffmpeg",
+) -> bool:
+    """
+    Построить пики source в target. Выполняется в процессе пула.
+
+    False, если пики уже актуальны (их построил другой воркер).
+    """
+    source, target = Path(source), Path(target)
+    stat = source.stat()
+    index = read_index(target)
+    if index is not None and index.is_current(stat, resolutions):
+        return False
+    rate, frames = decode(source, sample_rate, ffmpeg)
+    mins, maxs, total = block_peaks(rate, frames)
+    write_peaks(target, stat, total / rate, build_levels(mins, maxs, resolutions))
+    return True
@@ -0,0 +1,174 @@
+"""
+Дробные ключи порядка (fractional indexing) для треков плейлиста.
+
+Позиция - строка, сравниваемая побайтно (столбец с COLLATE "C"). Между
+любыми двумя ключами можно получить новый, поэтому вставка и перенос
+трека меняют одну строку, а не перенумеровывают плейлист.
+
+Ключ = целая часть + дробная часть в 62-ричной системе. Первый символ
+целой части задаёт её длину ("a" - одна цифра, "b" - две, ..., "Z" -
+одна цифра отрицательного числа), поэтому добавление в конец и в начало
+увеличивает целую часть, и ключи растут логарифмически. Вставки в одно и
+то же место удлиняют дробную часть примерно на символ за 6 вставок;
+слишком длинные ключи плейлиста пересчитываются (generate_n_keys_between).
+
+Алгоритм - по статье David Greenspan "Implementing Fractional Indexing".
+"""
+from typing import List, Optional
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+INTEGER_ZERO = "a0"
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """
+    Дробная часть строго между a и b (b=None - бесконечность).
+    """
+    if b is not None:
+        # Общий префикс (a дополняется нулями) переносится в результат
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Неверный ключ порядка: заголовок '{head}'")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Неверный ключ порядка '{key}'")
+    return key[:length]
+
+
+def validate_key(key: str) -> None:
+    """
+    ValueError, если строка не является ключом порядка.
+    """
+    if not key or key == SMALLEST_INTEGER:
+        raise ValueError(f"Неверный ключ порядка '{key}'")
+    integer = _integer_part(key)
+    fraction = key[len(integer):]
+    if fraction.endswith(DIGITS[0]) or any(c not in DIGITS for c in key[1:]):
+        raise ValueError(f"Неверный ключ порядка '{key}'")
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) + 1
+        if d < len(DIGITS):
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    # Перенос: целая часть становится на цифру длиннее (или короче для отрицательных)
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        d = DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def generate_key_between(a: Optional[str], b: Optional[str]) -> str:
+    """
+    Ключ строго между a и b; None - начало или конец списка.
+    """
+    if a is not None:
+        validate_key(a)
+    if b is not None:
+        validate_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Ключи порядка не упорядочены: '{a}' >= '{b}'")
+
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        integer_b = _integer_part(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b):])
+        if integer_b < b:
+            return integer_b
+        key = _decrement_integer(integer_b)
+        if key is None:
+            raise ValueError("Ключи порядка исчерпаны в начале списка")
+        return key
+
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+    if b is None:
+        key = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if key is None else key
+
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b):])
+    key = _increment_integer(integer_a)
+    if key is None:
+        raise ValueError("Ключи порядка исчерпаны в конце списка")
+    if key < b:
+        return key
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def generate_n_keys_between(a: Optional[str], b: Optional[str], n: int) -> List[str]:
+    """
+    n упорядоченных ключей между a и b. Ключи в середине промежутка
+    делят его пополам, поэтому длина растёт как log(n), а не как n.
+    """
+    if n <= 0:
+        return []
+    if n == 1:
+        return [generate_key_between(a, b)]
+    if b is None:
+        keys = [generate_key_between(a, None)]
+        for _ in range(n - 1):
+            keys.append(generate_key_between(keys[-1], None))
+        return keys
+    if a is None:
+        keys = [generate_key_between(None, b)]
+        for _ in range(n - 1):
+            keys.append(generate_key_between(None, keys[-1]))
+        return keys[::-1]
+    middle = n // 2
+    key = generate_key_between(a, b)
+    return generate_n_keys_between(a, key, middle) + [key] + generate_n_keys_between(key, b, n - middle - 1)
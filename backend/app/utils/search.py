@@ -0,0 +1,70 @@
+"""
+Поиск треков по названию и автору.
+
+В PostgreSQL поиск обслуживается триграммными GIN-индексами (pg_trgm):
+они подходят и для ILIKE '%запрос%', и для нечёткого оператора <%,
+а результаты ранжируются по word_similarity. Для остальных СУБД
+(например, SQLite в тестах) используется переносимый ILIKE с простым
+ранжированием: точное совпадение > совпадение префикса > вхождение.
+"""
+from typing import Tuple
+
+from sqlalchemy import case, func, literal, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.track import Track
+
+LIKE_ESCAPE = "/"
+
+
+def like_pattern(query: str) -> str:
+    """
+    Шаблон ILIKE для поиска подстроки с экранированием % и _.
+    """
+    escaped = (
+        query.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+    return f"%{escaped}%"
+
+
+def track_search(query: str, dialect_name: str) -> Tuple[ColumnElement, ColumnElement]:
+    """
+    Условие фильтрации и выражение релевантности для поиска треков.
+
+    Возвращает пару (condition, rank); сортировать нужно по rank по убыванию.
+    """
+    pattern = like_pattern(query)
+    substring_match = or_(
+        Track.title.ilike(pattern, escape=LIKE_ESCAPE),
+        Track.artist.ilike(pattern, escape=LIKE_ESCAPE),
+    )
+
+    if dialect_name == "postgresql":
+        # q <% column - нечёткое совпадение запроса со словами в столбце
+        condition = or_(
+            substring_match,
+            literal(query).op("<%")(Track.title),
+            literal(query).op("<%")(Track.artist),
+        )
+        rank = func.greatest(
+            func.word_similarity(query, Track.title),
+            func.word_similarity(query, Track.artist),
+        )
+        return condition, rank
+
+    lowered = query.lower()
+    prefix = like_pattern(query)[1:]
+    rank = case(
+        (or_(func.lower(Track.title) == lowered, func.lower(Track.artist) == lowered), 1.0),
+        (
+            or_(
+                Track.title.ilike(prefix, escape=LIKE_ESCAPE),
+                Track.artist.ilike(prefix, escape=LIKE_ESCAPE),
+            ),
+            0.75,
+        ),
+        else_=0.5,
+    )
+    return substring_match, rank
@@ -0,0 +1,145 @@
+"""
+Файлы возобновляемой загрузки аудио (/uploads).
+
+Части пишутся в UPLOAD_TMP_DIR/{id}.part по смещению Upload-Offset.
+Одновременная запись в один файл исключается блокировкой flock: она
+общая для всех воркеров на хосте и снимается вместе с дескриптором.
+
+Контрольные суммы считаются по ходу приёма: Upload-Checksum проверяет
+отдельную часть, а sha256 всего файла накапливается в памяти процесса
+(UploadHashes). Если часть принял другой воркер или процесс
+перезапускался, sha256 при завершении пересчитывается по файлу.
+"""
+import base64
+import binascii
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+
+
+class UploadLocked(Exception):
+    """
+    Файл загрузки занят другим запросом.
+    """
+
+
+def part_path(root: str, upload_id: uuid.UUID) -> Path:
+    return Path(root) / f"{upload_id}.part"
+
+
+def parse_checksum(header: Optional[str]) -> Optional[Tuple[str, bytes]]:
+    """
+    "sha256 <base64>" -> ("sha256", digest). ValueError при неверном формате
+    или неподдерживаемом алгоритме.
+    """
+    if not header:
+        return None
+    try:
+        algorithm, value = header.split()
+        digest = base64.b64decode(value, validate=True)
+    except (ValueError, binascii.Error):
+        raise ValueError("Неверный формат Upload-Checksum")
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Алгоритм {algorithm} не поддерживается")
+    return algorithm, digest
+
+
+@contextmanager
+def exclusive_lock(fd: int):
+    """
+    Неблокирующая исключительная блокировка файла; UploadLocked, если занят.
+    """
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        raise UploadLocked()
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def move_file(source: Path, target: Path) -> None:
+    """
+    Атомарно переместить файл; между файловыми системами - копия во
+    временный файл рядом с target и rename.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        tmp = target.with_name(target.name + ".tmp")
+        with open(source, "rb") as src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, target)
+        os.unlink(source)
+    _fsync_dir(target.parent)
+
+
+class UploadHashes:
+    """
+    Накопленный sha256 загрузок: upload_id -> (смещение, состояние хеша).
+
+    Состояние hashlib не сериализуется, поэтому хранится только в памяти
+    процесса; вытесняются давно не обновлявшиеся загрузки.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[uuid.UUID, Tuple[int, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, upload_id: uuid.UUID, offset: int):
+        """
+        Копия хеша первых offset байт или None, если его нет.
+        """
+        with self._lock:
+            item = self._items.get(upload_id)
+            if item is None or item[0] != offset:
+                return None
+            return item[1].copy()
+
+    def set(self, upload_id: uuid.UUID, offset: int, digest) -> None:
+        with self._lock:
+            self._items[upload_id] = (offset, digest)
+            self._items.move_to_end(upload_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def discard(self, upload_id: uuid.UUID) -> None:
+        with self._lock:
+            self._items.pop(upload_id, None)
+
+
+upload_hashes = UploadHashes()
@@ -0,0 +1,60 @@
+"""
+Сравнение двух прогонов benchmarks.loadgen (JSON) по эндпоинтам.
+
+Регрессией считается рост p95 или падение RPS больше чем на --threshold
+процентов. С --fail скрипт завершается с кодом 1 при регрессии (для CI).
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import sys
+
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(base: dict, head: dict, threshold: float) -> int:
+    regressions = 0
+    print(f"base: {base['meta'].get('commit')}  head: {head['meta'].get('commit')}")
+    print(f"{'scenario':>8} {'endpoint':>26} {'p50 ms':>21} {'p95 ms':>21} {'p99 ms':>21} {'rps':>21}")
+    for scenario, report in head["scenarios"].items():
+        base_endpoints = base["scenarios"].get(scenario, {}).get("endpoints", {})
+        for name, new in report["endpoints"].items():
+            old = base_endpoints.get(name)
+            if not old or not old.get("count") or not new.get("count"):
+                continue
+            columns = [
+                f"{old[key]:>7.2f}>{new[key]:<7.2f}{change(old[key], new[key]):>+4.0f}%"
+                for key in ("p50_ms", "p95_ms", "p99_ms", "rps")
+            ]
+            regressed = (
+                change(old["p95_ms"], new["p95_ms"]) > threshold
+                or change(old["rps"], new["rps"]) < -threshold
+            )
+            regressions += regressed
+            print(f"{scenario:>8} {name:>26} {' '.join(columns)}{'  РЕГРЕССИЯ' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение результатов benchmarks.loadgen")
+    parser.add_argument("base", help="JSON базового прогона")
+    parser.add_argument("head", help="JSON нового прогона")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Допустимое ухудшение, %%")
+    parser.add_argument("--fail", action="store_true", help="Код выхода 1 при регрессии")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+
+    regressions = compare(base, head, args.threshold)
+    if args.fail and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
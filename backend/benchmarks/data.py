@@ -0,0 +1,18 @@
+"""
+Константы синтетических данных бенчмарков: пароль пользователей и словарь
+названий треков.
+
+Модуль не импортирует приложение: его используют benchmarks.scenarios и
+benchmarks.loadgen до того, как loadgen подставит DATABASE_URL.
+"""
+BENCH_PASSWORD = "bench-password"
+BENCH_URL_PREFIX = "https://soundcloud.com/bench/track-"
+
+WORDS = (
+    "midnight", "summer", "love", "dream", "city", "night", "fire", "ocean",
+    "heart", "echo", "golden", "shadow", "river", "neon", "silver", "storm",
+    "velvet", "electric", "paradise", "falling", "wild", "broken", "forever",
+    "moon", "sunset", "lonely", "crystal", "dance", "highway", "winter",
+    "memory", "ghost", "rain", "stars", "sugar", "thunder", "blue", "desert",
+    "horizon", "lights",
+)
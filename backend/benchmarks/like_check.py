@@ -0,0 +1,102 @@
+"""
+Бенчмарк проверки статуса лайков: N запросов GET /likes/check/{id}
+против одного POST /likes/check со списком ID.
+
+Приложение запускается в процессе (ASGI через TestClient), поэтому в
+замер входит вся обработка запроса: разбор JWT, поиск пользователя и
+запросы к БД. Количество SQL-запросов считается по событиям движка.
+
+ВНИМАНИЕ: скрипт создаёт пользователя, треки и лайки, используйте отдельную БД.
+
+    python -m benchmarks.like_check --database-url postgresql://.../soulsync_bench --queue 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк /likes/check: по одному ID против пакета")
+    parser.add_argument("--database-url", required=True, help="URL отдельной БД для бенчмарка")
+    parser.add_argument("--queue", type=int, default=50, help="Размер очереди треков (как в потоке)")
+    parser.add_argument("--repeat", type=int, default=20, help="Количество повторов")
+    args = parser.parse_args()
+
+    # Настройки читаются при импорте приложения
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from fastapi.testclient import TestClient
+
+    from app.core.database import async_engine, engine
+    from app.main import app
+
+    # В режиме async запросы роутеров идут через async_engine
+    if async_engine is not None:
+        engine = async_engine.sync_engine
+
+    # Контекстный менеджер держит один event loop на весь прогон:
+    # соединения asyncpg привязаны к циклу, в котором созданы
+    with TestClient(app) as client:
+        run(client, engine, args)
+
+
+def run(client, engine, args):
+    from sqlalchemy import event
+
+    username, password = f"bench-{uuid.uuid4().hex[:8]}", "bench-password"
+    client.post("/api/v1/auth/register", json={"username": username, "password": password})
+    token = client.post(
+        "/api/v1/auth/token", data={"username": username, "password": password}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    track_ids = []
+    for i in range(args.queue):
+        response = client.post(
+            "/api/v1/tracks/",
+            json={"url": f"https://soundcloud.com/bench/{uuid.uuid4().hex}", "title": f"Bench {i}", "artist": "Bench"},
+            headers=headers,
+        )
+        track_ids.append(response.json()["id"])
+    # Лайкаем каждый третий трек
+    for track_id in track_ids[::3]:
+        client.post("/api/v1/likes/", json={"track_id": track_id}, headers=headers)
+
+    queries = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(*_):
+        queries["count"] += 1
+
+    def per_id():
+        return {tid: client.get(f"/api/v1/likes/check/{tid}", headers=headers).json() for tid in track_ids}
+
+    def batch():
+        return client.post("/api/v1/likes/check", json={"track_ids": track_ids}, headers=headers).json()
+
+    assert per_id() == batch(), "Результаты двух способов не совпадают"
+
+    print(f"Очередь из {args.queue} треков, {args.repeat} повторов")
+    print(f"{'path':>8} {'requests':>9} {'queries':>8} {'mean ms':>9} {'p95 ms':>9}")
+    for name, func, requests in (("per-id", per_id, args.queue), ("batch", batch, 1)):
+        timings = []
+        queries["count"] = 0
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(0.95 * len(timings)))]
+        print(
+            f"{name:>8} {requests:>9} {queries['count'] // args.repeat:>8} "
+            f"{statistics.mean(timings):>9.2f} {p95:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Нагрузочный тест API: асинхронные воркеры на httpx по сценариям
+benchmarks.scenarios (home, search, likes, login).
+
+Приложение запускается в процессе через httpx.ASGITransport против
+--database-url (замер включает всю обработку запроса, но не сеть и
+uvicorn) или нагрузка подаётся на уже запущенный сервер по --base-url.
+Данные готовит benchmarks.seed.
+
+Сценарии выполняются по очереди: concurrency воркеров повторяют сценарий
+duration секунд, первые warmup секунд не учитываются. По каждому
+эндпоинту считаются RPS, p50/p95/p99 и ошибки, а по заголовку
+Server-Timing - время в БД и число SQL-запросов. Результаты пишутся в
+JSON (коммит, настройки, размер каталога) для сравнения прогонов
+скриптом benchmarks.compare.
+
+    python -m benchmarks.seed --database-url postgresql://.../soulsync_bench --tracks 100000
+    python -m benchmarks.loadgen --database-url postgresql://.../soulsync_bench --concurrency 32 --duration 30
+    python -m benchmarks.loadgen --base-url http://localhost:8000 --scenarios search,login
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks.data import BENCH_PASSWORD
+from benchmarks.scenarios import API, SCENARIOS
+from benchmarks.stats import summarize
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+_SERVER_TIMING_DB = re.compile(r'(?:^|,)\s*db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class Recorder:
+    """
+    Замеры по эндпоинтам одного сценария.
+    """
+
+    def __init__(self):
+        self.recording = False
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.db_timings: Dict[str, List[float]] = defaultdict(list)
+        self.queries: Dict[str, List[int]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    def add(self, name: str, elapsed_ms: float, status, ok: bool, server_timing: Optional[str] = None):
+        if not self.recording:
+            return
+        self.timings[name].append(elapsed_ms)
+        self.statuses[name][str(status)] += 1
+        if not ok:
+            self.errors[name] += 1
+        match = _SERVER_TIMING_DB.search(server_timing or "")
+        if match:
+            self.db_timings[name].append(float(match.group(1)))
+            self.queries[name].append(int(match.group(2)))
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name, timings in sorted(self.timings.items()):
+            summary = summarize(timings, elapsed)
+            summary["errors"] = self.errors[name]
+            summary["statuses"] = dict(self.statuses[name])
+            if self.db_timings[name]:
+                summary["db_mean_ms"] = round(statistics.mean(self.db_timings[name]), 3)
+                summary["queries_mean"] = round(statistics.mean(self.queries[name]), 2)
+            endpoints[name] = summary
+        total = sum(len(timings) for timings in self.timings.values())
+        return {
+            "elapsed": round(elapsed, 3),
+            "requests": total,
+            "rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "errors": sum(self.errors.values()),
+            "endpoints": endpoints,
+        }
+
+
+class Bench:
+    """
+    Состояние прогона, доступное сценариям.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, users: int, seed: int):
+        self.client = client
+        self.users = users
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+        self.tokens: List[str] = []
+        self.track_ids: List[str] = []
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    async def call(self, name: str, method: str, url: str, ok=(200,), **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(name, (time.perf_counter() - started) * 1000, type(e).__name__, False)
+            return None
+        self.recorder.add(
+            name,
+            (time.perf_counter() - started) * 1000,
+            response.status_code,
+            response.status_code in ok,
+            response.headers.get("server-timing"),
+        )
+        return response
+
+
+async def prepare(bench: Bench, sessions: int) -> None:
+    """
+    Войти под sessions пользователями и собрать ID треков для сценариев.
+    """
+    async def sign_in(number: int) -> str:
+        response = await bench.client.post(
+            f"{API}/auth/token",
+            data={"username": f"bench-user-{number}", "password": BENCH_PASSWORD},
+        )
+        if response.status_code != 200:
+            raise SystemExit(
+                f"Не удалось войти как bench-user-{number} ({response.status_code}). "
+                "Сначала заполните БД: python -m benchmarks.seed"
+            )
+        return response.json()["access_token"]
+
+    bench.tokens = list(await asyncio.gather(*(sign_in(n) for n in range(1, min(sessions, bench.users) + 1))))
+
+    track_ids = set()
+    for _ in range(10):
+        response = await bench.client.get(f"{API}/tracks/random", params={"limit": 50})
+        response.raise_for_status()
+        track_ids.update(track["id"] for track in response.json())
+    if not track_ids:
+        raise SystemExit("Каталог пуст. Сначала заполните БД: python -m benchmarks.seed")
+    bench.track_ids = sorted(track_ids)
+
+
+async def run_scenario(bench: Bench, scenario, concurrency: int, duration: float, warmup: float) -> dict:
+    bench.recorder = Recorder()
+    deadline = time.perf_counter() + warmup + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await scenario(bench)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    await asyncio.sleep(warmup)
+    bench.recorder.recording = True
+    started = time.perf_counter()
+    await asyncio.gather(*workers)
+    return bench.recorder.report(time.perf_counter() - started)
+
+
+def git_revision() -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=root, capture_output=True, text=True, check=True).stdout.strip()
+
+    try:
+        return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def make_client(args) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits)
+
+    # DATABASE_URL подставлен в main(): настройки читаются при импорте приложения
+    from app.main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench",
+        timeout=args.timeout,
+        limits=limits,
+    )
+
+
+def catalog(database_url: Optional[str]) -> Optional[dict]:
+    if not database_url:
+        return None
+    from sqlalchemy import create_engine
+
+    from benchmarks.seed import catalog_size
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        size = catalog_size(conn)
+    engine.dispose()
+    return size
+
+
+def print_report(results: dict) -> None:
+    print(f"{'scenario':>8} {'endpoint':>26} {'count':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'db ms':>7} {'sql':>5} {'err':>5}")
+    for scenario, report in results["scenarios"].items():
+        for name, endpoint in report["endpoints"].items():
+            print(
+                f"{scenario:>8} {name:>26} {endpoint['count']:>7} {endpoint['rps']:>8.1f} "
+                f"{endpoint['p50_ms']:>8.2f} {endpoint['p95_ms']:>8.2f} {endpoint['p99_ms']:>8.2f} "
+                f"{endpoint.get('db_mean_ms', 0):>7.2f} {endpoint.get('queries_mean', 0):>5.1f} "
+                f"{endpoint['errors']:>5}"
+            )
+
+
+async def run(args) -> dict:
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+
+    results = {
+        "meta": {
+            **git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "target": args.base_url or "asgi",
+            "db_engine_mode": None if args.base_url else os.getenv("DB_ENGINE_MODE", "async"),
+            "python": platform.python_version(),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "catalog": catalog(args.database_url),
+        },
+        "scenarios": {},
+    }
+
+    async with make_client(args) as client:
+        bench = Bench(client, users=args.users, seed=args.seed)
+        await prepare(bench, args.sessions)
+        for name in names:
+            print(f"Сценарий {name}: {args.concurrency} воркеров, {args.duration} с...")
+            results["scenarios"][name] = await run_scenario(
+                bench, SCENARIOS[name], args.concurrency, args.duration, args.warmup
+            )
+
+    if not args.base_url:
+        from app.core.database import async_engine
+
+        if async_engine is not None:
+            await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API по сценариям")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--database-url", help="URL отдельной БД: приложение запускается в процессе (ASGI)")
+    target.add_argument("--base-url", help="Адрес запущенного сервера, например http://localhost:8000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую")
+    parser.add_argument("--concurrency", type=int, default=16, help="Количество воркеров")
+    parser.add_argument("--duration", type=float, default=20.0, help="Длительность сценария, с")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Прогрев перед замером, с")
+    parser.add_argument("--users", type=int, default=1000, help="Сколько пользователей bench-user-* создано в БД")
+    parser.add_argument("--sessions", type=int, default=20, help="Сколько пользователей входят для сценариев с токеном")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Таймаут запроса, с")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно генератора случайных чисел")
+    parser.add_argument("--output", help="Файл результатов JSON (по умолчанию benchmarks/results/)")
+    args = parser.parse_args()
+    if args.database_url:
+        # До первого импорта app (в том числе через benchmarks.seed)
+        os.environ["DATABASE_URL"] = args.database_url
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{(results['meta']['commit'] or 'nogit')[:8]}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Проверка числа SQL-запросов чтения плейлистов.
+
+Список плейлистов (GET /playlists/) и карточка плейлиста
+(GET /playlists/{id}, GET /playlists/{id}/tracks) должны выполнять
+постоянное число запросов (EXPECTED) при любом количестве плейлистов на
+странице и треков в плейлисте. Скрипт измеряет запросы для разных
+размеров и завершается с кодом 1, если число отличается от ожидаемого:
+выросло с размером (признак N+1) или изменилось после правки эндпоинта.
+При намеренном изменении запросов обновите EXPECTED.
+
+Приложение запускается в процессе (ASGI через TestClient). Запросы
+считаются по RequestSQLStats самого HTTP-запроса (заголовок
+Server-Timing), поэтому фоновые задачи в счёт не попадают. Авторизация
+прогревается повторным запросом и тоже не учитывается.
+
+ВНИМАНИЕ: скрипт создаёт пользователя, треки и плейлисты, используйте отдельную БД.
+
+    python -m benchmarks.playlist_queries --database-url postgresql://.../soulsync_bench
+"""
+import argparse
+import os
+import re
+import sys
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+API = "/api/v1"
+
+# Страница плейлистов, число треков, обложки; плейлист, число треков,
+# обложка, страница треков; проверка доступа к плейлисту, страница треков
+EXPECTED = {
+    "GET /playlists/": 3,
+    "GET /playlists/{id}": 4,
+    "GET /playlists/{id}/tracks": 2,
+}
+
+_SERVER_TIMING_DB = re.compile(r'(?:^|,)\s*db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Число SQL-запросов чтения плейлистов")
+    parser.add_argument("--database-url", required=True, help="URL отдельной БД для проверки")
+    parser.add_argument("--playlists", type=int, default=50, help="Наибольшее количество плейлистов на странице")
+    parser.add_argument("--tracks", type=int, default=200, help="Наибольшее количество треков в плейлисте")
+    args = parser.parse_args()
+
+    # Настройки читаются при импорте приложения
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["SQL_INSTRUMENTATION"] = "true"
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    # Контекстный менеджер держит один event loop на весь прогон
+    with TestClient(app) as client:
+        sys.exit(0 if run(client, args) else 1)
+
+
+def run(client, args) -> bool:
+    username, password = f"bench-{uuid.uuid4().hex[:8]}", "bench-password"
+    client.post(f"{API}/auth/register", json={"username": username, "password": password})
+    token = client.post(
+        f"{API}/auth/token", data={"username": username, "password": password}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    track_ids = []
+    for i in range(args.tracks):
+        response = client.post(
+            f"{API}/tracks/",
+            json={
+                "url": f"https://soundcloud.com/bench/{uuid.uuid4().hex}",
+                "title": f"Bench {i}",
+                "artist": "Bench",
+                "artwork_url": f"https://example.com/artwork/{i}.jpg",
+            },
+            headers=headers,
+        )
+        track_ids.append(response.json()["id"])
+
+    # Плейлисты разного размера: от одного трека до --tracks
+    playlist_ids = []
+    for i in range(args.playlists):
+        playlist_id = client.post(f"{API}/playlists/", json={"name": f"Bench {i}"}, headers=headers).json()["id"]
+        size = max(1, args.tracks * (i + 1) // args.playlists)
+        client.post(f"{API}/playlists/{playlist_id}/tracks", json={"track_ids": track_ids[:size]}, headers=headers)
+        playlist_ids.append(playlist_id)
+
+    def measure(url, params=None):
+        client.get(url, params=params, headers=headers)  # прогрев кэша авторизации
+        response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        match = _SERVER_TIMING_DB.search(response.headers.get("server-timing", ""))
+        return int(match.group(1)) if match else 0
+
+    checks = {
+        "GET /playlists/": [
+            (f"limit={limit}", measure(f"{API}/playlists/", {"limit": limit}))
+            for limit in sorted({1, 10, args.playlists})
+        ],
+        "GET /playlists/{id}": [
+            (f"{i + 1} of {args.playlists}", measure(f"{API}/playlists/{playlist_ids[i]}", {"limit": 500}))
+            for i in sorted({0, args.playlists // 2, args.playlists - 1})
+        ],
+        "GET /playlists/{id}/tracks": [
+            (f"limit={limit}", measure(f"{API}/playlists/{playlist_ids[-1]}/tracks", {"limit": limit}))
+            for limit in sorted({1, 50, min(500, args.tracks)})
+        ],
+    }
+
+    ok = True
+    print(f"{'endpoint':<28} {'case':>14} {'queries':>8} {'expected':>8}")
+    for endpoint, results in checks.items():
+        for case, count in results:
+            print(f"{endpoint:<28} {case:>14} {count:>8} {EXPECTED[endpoint]:>8}")
+        if len({count for _, count in results}) > 1:
+            print(f"ОШИБКА: число запросов {endpoint} зависит от размера данных")
+            ok = False
+        elif results[0][1] != EXPECTED[endpoint]:
+            print(f"ОШИБКА: {endpoint} выполняет {results[0][1]} запросов вместо {EXPECTED[endpoint]}")
+            ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    main()
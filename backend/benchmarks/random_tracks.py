@@ -0,0 +1,89 @@
+"""
+Бенчмарк стратегий выборки случайных треков (app/core/sampler.py).
+
+Заполняет таблицу tracks синтетическими треками до каждого из заданных
+размеров и замеряет время одного вызова sample() для каждой стратегии.
+
+ВНИМАНИЕ: скрипт пишет в таблицу tracks, используйте отдельную БД.
+
+    python -m benchmarks.random_tracks --database-url postgresql://.../soulsync_bench
+    python -m benchmarks.random_tracks --database-url ... --sizes 10000,1000000,5000000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base, get_async_url
+from app.core.sampler import SAMPLERS, IdPoolSampler, RandomKeySampler, TableSampleSampler
+from app.models import Track  # noqa: F401 - регистрирует модели в метаданных
+from benchmarks.seed import seed_tracks
+from benchmarks.stats import percentile
+
+
+def seed(engine, size: int) -> None:
+    seed_tracks(engine, size)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE tracks"))
+
+
+def make_samplers(session_factory):
+    samplers = {name: cls() for name, cls in SAMPLERS.items()}
+    samplers[RandomKeySampler.name] = RandomKeySampler(run_length=4)
+    samplers[TableSampleSampler.name] = TableSampleSampler(oversample=4.0)
+    samplers[IdPoolSampler.name] = IdPoolSampler(session_factory=session_factory)
+    return samplers
+
+
+async def time_sampler(sampler, session_factory, limit: int, repeat: int) -> list:
+    timings = []
+    async with session_factory() as db:
+        await sampler.sample(db, limit)  # прогрев
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await sampler.sample(db, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+            await db.rollback()
+    return timings
+
+
+async def run(args):
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(get_async_url(args.database_url))
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+
+    print(f"{'rows':>10} {'strategy':>16} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        seed(engine, size)
+        samplers = make_samplers(session_factory)
+        for name in strategies:
+            timings = await time_sampler(samplers[name], session_factory, args.limit, args.repeat)
+            print(
+                f"{size:>10} {name:>16} {statistics.mean(timings):>9.2f} "
+                f"{percentile(timings, 50):>9.2f} {percentile(timings, 95):>9.2f}"
+            )
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк стратегий /tracks/random")
+    parser.add_argument("--database-url", required=True, help="URL отдельной БД для бенчмарка")
+    parser.add_argument("--sizes", default="10000,1000000,5000000", help="Размеры каталога через запятую")
+    parser.add_argument("--limit", type=int, default=20, help="Сколько треков выбирать за вызов")
+    parser.add_argument("--repeat", type=int, default=50, help="Количество замеров на стратегию")
+    parser.add_argument("--strategies", default=",".join(SAMPLERS), help="Стратегии через запятую")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Сценарии нагрузки для benchmarks.loadgen.
+
+Сценарий - корутина, выполняющая одну итерацию действий пользователя
+через bench.call(name, method, url, ...). name - шаблон эндпоинта, по
+которому группируются замеры (без конкретных ID в пути).
+"""
+from benchmarks.data import BENCH_PASSWORD, WORDS
+
+API = "/api/v1"
+
+
+async def home(bench):
+    """
+    Главная: случайные треки и статус их лайков.
+    """
+    response = await bench.call("GET /tracks/random", "GET", f"{API}/tracks/random", params={"limit": 20})
+    if response is None or response.status_code != 200:
+        return
+    track_ids = [track["id"] for track in response.json()]
+    await bench.call(
+        "POST /likes/check", "POST", f"{API}/likes/check",
+        json={"track_ids": track_ids}, headers=bench.auth(),
+    )
+
+
+async def search(bench):
+    """
+    Поиск по мере ввода: запрос на каждый следующий префикс слова.
+    """
+    word = bench.rng.choice(WORDS)
+    for length in range(2, len(word) + 1):
+        await bench.call(
+            "GET /tracks/search", "GET", f"{API}/tracks/search",
+            params={"query": word[:length], "limit": 20},
+        )
+
+
+async def likes(bench):
+    """
+    Переключение лайка: поставить и снять. Параллельные воркеры могут
+    работать с одной парой пользователь-трек, поэтому 400 и 404 не ошибки.
+    """
+    headers = bench.auth()
+    track_id = bench.rng.choice(bench.track_ids)
+    await bench.call(
+        "POST /likes/", "POST", f"{API}/likes/",
+        ok=(201, 400), json={"track_id": track_id}, headers=headers,
+    )
+    await bench.call(
+        "DELETE /likes/{track_id}", "DELETE", f"{API}/likes/{track_id}",
+        ok=(204, 404), headers=headers,
+    )
+
+
+async def login(bench):
+    """
+    Шторм логинов: вход случайного пользователя bench-user-*. Отказы 429
+    (ограничение попыток) и 503 (перегрузка) - ожидаемое поведение под
+    штормом, их доля видна в statuses.
+    """
+    username = f"bench-user-{bench.rng.randint(1, bench.users)}"
+    await bench.call(
+        "POST /auth/token", "POST", f"{API}/auth/token",
+        ok=(200, 429, 503), data={"username": username, "password": BENCH_PASSWORD},
+    )
+
+
+SCENARIOS = {
+    "home": home,
+    "search": search,
+    "likes": likes,
+    "login": login,
+}
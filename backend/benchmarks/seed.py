@@ -0,0 +1,157 @@
+"""
+Генератор синтетического каталога для бенчмарков: треки, пользователи и
+граф лайков заданного размера (от 10k до 5M треков, до 100k пользователей).
+
+Строки создаются на стороне PostgreSQL (generate_series) пачками, поэтому
+5M треков заполняются за минуты. Повторный запуск дозаполняет данные до
+заданных размеров, уже созданные строки не меняются.
+
+- Названия треков собираются из небольшого словаря (WORDS), чтобы поиск
+  по префиксу находил совпадения, как в настоящем каталоге.
+- Пользователи bench-user-1..N с паролем BENCH_PASSWORD (хеш вычисляется
+  один раз и общий для всех).
+- Каждый пользователь лайкает likes_per_user треков; номер трека
+  выбирается как N * random()^skew, поэтому популярность треков
+  распределена неравномерно (чем больше skew, тем сильнее).
+
+ВНИМАНИЕ: скрипт пишет в таблицы, используйте отдельную БД.
+
+    python -m benchmarks.seed --database-url postgresql://.../soulsync_bench --tracks 1000000 --users 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from app.core.database import Base
+from app.models import Like, Track, User  # noqa: F401 - регистрирует модели в метаданных
+from benchmarks.data import BENCH_PASSWORD, BENCH_URL_PREFIX, WORDS
+
+ARTISTS = 5000
+
+
+def seed_tracks(engine, size: int, users: int = 0, chunk: int = 200_000) -> None:
+    """
+    Добавить в tracks недостающие синтетические строки до размера size.
+    Владельцы треков - пользователи bench-user-1..users по кругу
+    (при users=0 владельца нет).
+    """
+    with engine.connect() as conn:
+        current = conn.execute(text("SELECT count(*) FROM tracks")).scalar()
+    if current >= size:
+        return
+    print(f"  Добавляем {size - current} треков...")
+    words = "(ARRAY[" + ", ".join(f"'{word}'" for word in WORDS) + "])"
+    statement = text(
+        "INSERT INTO tracks (id, url, title, artist, user_id, created_at, updated_at) "
+        "SELECT gen_random_uuid(), "
+        f"       '{BENCH_URL_PREFIX}' || g, "
+        f"       initcap({words}[1 + g % {len(WORDS)}] || ' ' || {words}[1 + (g / 7) % {len(WORDS)}]) || ' ' || g, "
+        f"       'Bench Artist ' || (g % {ARTISTS}), "
+        "       u.id, now(), now() "
+        "FROM generate_series(:start, :stop) AS g "
+        "LEFT JOIN users AS u ON :users > 0 AND u.username = 'bench-user-' || (1 + g % greatest(:users, 1)) "
+        "ON CONFLICT (url) DO NOTHING"
+    )
+    for start in range(current + 1, size + 1, chunk):
+        with engine.begin() as conn:
+            conn.execute(statement, {"start": start, "stop": min(size, start + chunk - 1), "users": users})
+
+
+def seed_users(engine, count: int, chunk: int = 50_000) -> None:
+    """
+    Создать пользователей bench-user-1..count с паролем BENCH_PASSWORD.
+    """
+    from app.core.security import get_password_hash
+
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    statement = text(
+        "INSERT INTO users (id, username, password_hash, created_at, updated_at, is_active) "
+        "SELECT gen_random_uuid(), 'bench-user-' || g, :password_hash, now(), now(), true "
+        "FROM generate_series(:start, :stop) AS g "
+        "ON CONFLICT (username) DO NOTHING"
+    )
+    for start in range(1, count + 1, chunk):
+        with engine.begin() as conn:
+            conn.execute(
+                statement,
+                {"password_hash": password_hash, "start": start, "stop": min(count, start + chunk - 1)},
+            )
+
+
+def seed_likes(engine, tracks: int, likes_per_user: int, skew: float, chunk: int = 5_000) -> None:
+    """
+    Лайки для пользователей bench-user-*, у которых их ещё нет.
+    """
+    if likes_per_user <= 0:
+        return
+    # Подзапрос pick ссылается на u.id, чтобы random() вычислялся для каждого пользователя
+    statement = text(
+        "INSERT INTO likes (id, user_id, track_id, created_at, artwork_url) "
+        "SELECT gen_random_uuid(), u.id, t.id, now(), t.artwork_url "
+        "FROM ("
+        "    SELECT id FROM users "
+        "    WHERE username LIKE 'bench-user-%' "
+        "      AND NOT EXISTS (SELECT 1 FROM likes WHERE likes.user_id = users.id) "
+        "    LIMIT :chunk"
+        ") AS u "
+        "CROSS JOIN LATERAL ("
+        "    SELECT 1 + floor(:tracks * power(random(), :skew))::bigint AS k "
+        "    FROM generate_series(1, :per_user) WHERE u.id IS NOT NULL"
+        ") AS pick "
+        f"JOIN tracks AS t ON t.url = '{BENCH_URL_PREFIX}' || pick.k "
+        "ON CONFLICT (user_id, track_id) DO NOTHING"
+    )
+    params = {"chunk": chunk, "tracks": tracks, "skew": skew, "per_user": likes_per_user}
+    while True:
+        with engine.begin() as conn:
+            if conn.execute(statement, params).rowcount == 0:
+                break
+
+
+def catalog_size(conn) -> dict:
+    return {
+        table: conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+        for table in ("tracks", "users", "likes")
+    }
+
+
+def seed(database_url: str, tracks: int, users: int, likes_per_user: int, skew: float) -> dict:
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+
+    for name, step in (
+        ("пользователи", lambda: seed_users(engine, users)),
+        ("треки", lambda: seed_tracks(engine, tracks, users)),
+        ("лайки", lambda: seed_likes(engine, tracks, likes_per_user, skew)),
+    ):
+        started = time.perf_counter()
+        step()
+        print(f"{name}: {time.perf_counter() - started:.1f} с")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE tracks, users, likes"))
+        size = catalog_size(conn)
+    engine.dispose()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетический каталог и граф лайков для бенчмарков")
+    parser.add_argument("--database-url", required=True, help="URL отдельной БД для бенчмарка")
+    parser.add_argument("--tracks", type=int, default=100_000, help="Количество треков")
+    parser.add_argument("--users", type=int, default=10_000, help="Количество пользователей bench-user-*")
+    parser.add_argument("--likes-per-user", type=int, default=20, help="Лайков на пользователя")
+    parser.add_argument("--skew", type=float, default=3.0, help="Неравномерность популярности треков")
+    args = parser.parse_args()
+
+    size = seed(args.database_url, args.tracks, args.users, args.likes_per_user, args.skew)
+    print(", ".join(f"{table}: {count}" for table, count in size.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Общие функции статистики для бенчмарков.
+"""
+import statistics
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(timings: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Сводка по замерам в миллисекундах за время elapsed (секунды).
+    """
+    if not timings:
+        return {"count": 0, "rps": 0.0}
+    return {
+        "count": len(timings),
+        "rps": round(len(timings) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(max(timings), 3),
+    }
@@ -1,22 +1,20 @@
 import os
 import sys
 import uuid
-import csv
-import json
-from datetime import datetime
+import argparse
 
 # Добавляем корневую директорию проекта в sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy.orm import Session
-from app.models.track import Track
-from app.core.database import SessionLocal
+from app.core.cache import bump_catalog_version
+from app.utils.importer import ImportOptions, add_cli_arguments, import_paths, options_from_args
 
 
-def import_tracks_from_json(json_file_path: str, user_id: str = None):
+def import_tracks(paths, file_type: str = None, user_id: str = None, workers: int = 1, **options):
     """
-    Импортирует треки из JSON файла в базу данных.
-    
+    Импортирует треки из файлов JSON, NDJSON или CSV (или директорий с ними)
+    в базу данных. Треки с уже существующим URL пропускаются.
+
     Формат JSON:
     [
         {
@@ -26,116 +24,60 @@ def import_tracks_from_json(json_file_path: str, user_id: str = None):
         },
         ...
     ]
-    
+
+    Формат NDJSON - по одному такому объекту на строку.
+
+    Формат CSV:
+    url,title,artist,artwork_url
+    https://soundcloud.com/artist/track,Track Title,Artist Name,https://example.com/artwork.jpg
+    ...
+
     Поле artwork_url является необязательным.
     """
-    if not os.path.exists(json_file_path):
-        print(f"Файл {json_file_path} не найден.")
-        return
-    
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            tracks_data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Файл {json_file_path} содержит некорректный JSON.")
-        return
-    
-    db = SessionLocal()
-    try:
-        added_count = 0
-        for track_data in tracks_data:
-            # Проверяем наличие обязательных полей
-            if not all(k in track_data for k in ["url", "title", "artist"]):
-                print(f"Пропускаем трек: отсутствуют обязательные поля (url, title, artist)")
-                continue
-                
-            # Проверяем, существует ли трек с таким URL
-            if db.query(Track).filter(Track.url == track_data["url"]).first():
-                print(f"Трек с URL {track_data['url']} уже существует. Пропускаем.")
-                continue
-            
-            # Создаем новый трек
-            track = Track(
-                url=track_data["url"],
-                title=track_data["title"],
-                artist=track_data["artist"],
-                artwork_url=track_data.get("artwork_url"),  # artwork_url может отсутствовать
-                user_id=uuid.UUID(user_id) if user_id else None
-            )
-            
-            db.add(track)
-            added_count += 1
-            print(f"Добавлен трек: {track.title} - {track.artist}")
-        
-        db.commit()
-        print(f"Импорт завершен. Добавлено {added_count} треков.")
-    except Exception as e:
-        db.rollback()
-        print(f"Ошибка при импорте треков: {e}")
-    finally:
-        db.close()
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"Файл {missing[0]} не найден.")
+        return 0
+
+    stats = import_paths(
+        paths,
+        ImportOptions(user_id=uuid.UUID(user_id) if user_id else None, **options),
+        workers=workers,
+        fmt=file_type,
+    )
+
+    if stats.inserted or stats.updated:
+        # Сбрасываем кэш каталога API
+        bump_catalog_version()
+    return stats.inserted
+
+
+def import_tracks_from_json(json_file_path: str, user_id: str = None):
+    """
+    Импортирует треки из JSON файла в базу данных.
+    """
+    return import_tracks([json_file_path], "json", user_id)
 
 
 def import_tracks_from_csv(csv_file_path: str, user_id: str = None):
     """
     Импортирует треки из CSV файла в базу данных.
-    
-    Формат CSV:
-    url,title,artist,artwork_url
-    https://soundcloud.com/artist/track,Track Title,Artist Name,https://example.com/artwork.jpg
-    ...
     """
-    if not os.path.exists(csv_file_path):
-        print(f"Файл {csv_file_path} не найден.")
-        return
-    
-    db = SessionLocal()
-    try:
-        with open(csv_file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            count = 0
-            
-            for row in reader:
-                # Проверяем, существует ли трек с таким URL
-                if db.query(Track).filter(Track.url == row["url"]).first():
-                    print(f"Трек с URL {row['url']} уже существует. Пропускаем.")
-                    continue
-                
-                # Создаем новый трек
-                track = Track(
-                    url=row["url"],
-                    title=row["title"],
-                    artist=row["artist"],
-                    artwork_url=row.get("artwork_url"),
-                    user_id=uuid.UUID(user_id) if user_id else None
-                )
-                
-                db.add(track)
-                count += 1
-                print(f"Добавлен трек: {track.title} - {track.artist}")
-            
-            db.commit()
-            print(f"Импорт завершен. Добавлено {count} треков.")
-    except Exception as e:
-        db.rollback()
-        print(f"Ошибка при импорте треков: {e}")
-    finally:
-        db.close()
+    return import_tracks([csv_file_path], "csv", user_id)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Использование: python import_tracks.py [json|csv] <file_path> [user_id]")
-        sys.exit(1)
-    
-    file_type = sys.argv[1].lower()
-    file_path = sys.argv[2]
-    user_id = sys.argv[3] if len(sys.argv) > 3 else None
-    
-    if file_type == "json":
-        import_tracks_from_json(file_path, user_id)
-    elif file_type == "csv":
-        import_tracks_from_csv(file_path, user_id)
-    else:
-        print(f"Неподдерживаемый тип файла: {file_type}. Используйте json или csv.")
-        sys.exit(1) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Импорт треков из JSON, NDJSON или CSV")
+    parser.add_argument("file_type", choices=["json", "ndjson", "csv"], help="Формат файлов")
+    parser.add_argument("file_path", help="Путь к файлу или директории с файлами")
+    parser.add_argument("user_id", nargs="?", default=None, help="ID владельца треков")
+    add_cli_arguments(parser)
+    args = parser.parse_args()
+
+    import_tracks(
+        [args.file_path],
+        args.file_type,
+        args.user_id,
+        workers=args.workers,
+        **options_from_args(args),
+    )
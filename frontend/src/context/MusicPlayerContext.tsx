@@ -129,6 +129,8 @@ export const MusicPlayerProvider: React.FC<{ children: React.ReactNode }> = ({ c
   const [flowHistory, setFlowHistory] = useState<number[]>([]);
   const [loading, setLoading] = useState(false);
   const [isLiked, setIsLiked] = useState(false);
+  // Статусы лайков треков очереди: { [trackId]: поставлен ли лайк }
+  const likedTracksRef = useRef<Record<string, boolean>>({});
   const { isAuthenticated } = useAuth();
   
   // Кэшированные данные
@@ -197,23 +199,33 @@ export const MusicPlayerProvider: React.FC<{ children: React.ReactNode }> = ({ c
   
   // Проверка статуса лайка при смене трека
   useEffect(() => {
-    // При смене трека проверяем, лайкнул ли пользователь этот трек
+    // Статусы лайков всей очереди загружаются одним запросом и кэшируются,
+    // поэтому при переключении треков запросов к серверу нет
     const checkTrackLikeStatus = async () => {
+      if (!isAuthenticated) {
+        likedTracksRef.current = {};
+      }
+      
       if (currentTrackIndex === null || !tracks[currentTrackIndex] || !isAuthenticated) {
         setIsLiked(false);
         return;
       }
       
-      const track = tracks[currentTrackIndex];
-      if (track.id) {
+      const uncheckedIds = tracks
+        .map(track => track.id)
+        .filter((id): id is string => !!id && !(id in likedTracksRef.current));
+      
+      if (uncheckedIds.length > 0) {
         try {
-          const liked = await LikeService.checkLike(track.id);
-          setIsLiked(liked);
+          const statuses = await LikeService.checkLikes(uncheckedIds);
+          likedTracksRef.current = { ...likedTracksRef.current, ...statuses };
         } catch (error) {
           console.error("Ошибка проверки статуса лайка:", error);
-          setIsLiked(false);
         }
       }
+      
+      const track = tracks[currentTrackIndex];
+      setIsLiked(!!(track.id && likedTracksRef.current[track.id]));
     };
     
     checkTrackLikeStatus();
@@ -667,12 +679,14 @@ export const MusicPlayerProvider: React.FC<{ children: React.ReactNode }> = ({ c
       if (isLiked) {
         // Если трек уже лайкнут - удаляем лайк
         await LikeService.unlikeTrack(track.id);
+        likedTracksRef.current[track.id] = false;
         setIsLiked(false);
       } else {
         // Если трек не лайкнут - добавляем лайк с URL обложки
         // Используем artwork_url из трека, обложку из кэша или дефолтную обложку
         const artworkUrl = track.artwork_url || trackArtworks[currentTrackIndex] || getDefaultArtwork(currentTrackIndex);
         await LikeService.likeTrack(track.id, artworkUrl);
+        likedTracksRef.current[track.id] = true;
         setIsLiked(true);
       }
     } catch (error) {
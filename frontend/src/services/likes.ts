@@ -76,6 +76,27 @@ export class LikeService {
     }
   }
 
+  // Максимальный размер пакета для POST /likes/check (LIKE_CHECK_MAX_BATCH на сервере)
+  static readonly CHECK_BATCH_SIZE = 200;
+
+  /**
+   * Проверить статус лайков сразу для нескольких треков.
+   * Возвращает словарь { [trackId]: поставлен ли лайк }
+   */
+  static async checkLikes(trackIds: string[]): Promise<Record<string, boolean>> {
+    const statuses: Record<string, boolean> = {};
+    try {
+      for (let i = 0; i < trackIds.length; i += LikeService.CHECK_BATCH_SIZE) {
+        const chunk = trackIds.slice(i, i + LikeService.CHECK_BATCH_SIZE);
+        const result = await ApiService.post<Record<string, boolean>>('/likes/check', { track_ids: chunk });
+        Object.assign(statuses, result);
+      }
+    } catch (error) {
+      console.error('Ошибка при проверке лайков:', error);
+    }
+    return statuses;
+  }
+
   /**
    * Поиск среди лайкнутых треков
    */